@@ -49,6 +49,13 @@ var (
 	spuProtocol    string
 	containerNames []string
 	outputDir      string
+	statsSource    string
+	sampleInterval time.Duration
+	repeat         int
+	// executions of queries so far, query i of repeat n is execution
+	// n*len(queries)+i and writes its stats to query_{execution}, which is
+	// also how get_op.py and result_store.py number the sessions
+	executions int
 )
 
 type QueryInfo struct {
@@ -65,9 +72,15 @@ func TestMain(m *testing.M) {
 	spuP := flag.String("spu_protocol", "SEMI2K", "spu protocol")
 	containerNameStr := flag.String("container_names", "", "container names")
 	outputDirStr := flag.String("output_dir", "/tmp", "output dir")
+	statsSourceStr := flag.String("stats_source", "cgroup", "cgroup or docker, cgroup falls back to docker if the cgroup v2 files are not readable")
+	sampleIntervalFlag := flag.Duration("sample_interval", 50*time.Millisecond, "interval of the cgroup stats sampler")
+	repeatFlag := flag.Int("repeat", 1, "times every query runs, all within one benchmark iteration")
 	flag.Parse()
 	spuProtocol = *spuP
 	outputDir = *outputDirStr
+	statsSource = *statsSourceStr
+	sampleInterval = *sampleIntervalFlag
+	repeat = *repeatFlag
 	var err error
 	testConf, err = p2p.ReadConf(*confFile)
 	if err != nil {
@@ -207,14 +220,17 @@ func BenchmarkRunQuery(b *testing.B) {
 		r.NoError(p2p.CreateProjectTableAndCcl(testConf.ProjectConf, cclList, testConf.SkipCreateTableCCL))
 	}
 	b.ResetTimer()
-	for n := 0; n < b.N; n++ {
+	// -benchtime=Nx runs the benchmark once with b.N=1 and again with b.N=N,
+	// so repeats are run by --repeat in a single iteration instead
+	for n := 0; n < b.N*repeat; n++ {
 		fmt.Println("run query")
-		for i, query := range queries.Queries {
+		for _, query := range queries.Queries {
 			closeCh := make(chan bool, 1)
 			outputCh := make(chan bool, len(containerNames))
-			tmpDir := filepath.Join(outputDir, fmt.Sprintf("query_%d", i))
+			tmpDir := filepath.Join(outputDir, fmt.Sprintf("query_%d", executions))
+			executions++
 			for _, name := range containerNames {
-				go GetDockerStats(name, 10*time.Second, closeCh, outputCh, tmpDir)
+				go CollectStats(name, closeCh, outputCh, tmpDir)
 			}
 			// test rr22
 			jobConf := scql.JobConfig{
@@ -0,0 +1,343 @@
+// Copyright 2025 Ant Group Co., Ltd.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//   http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+package benchmark_test
+
+import (
+	"bytes"
+	"context"
+	"encoding/csv"
+	"fmt"
+	"io"
+	"log"
+	"os"
+	"path/filepath"
+	"strconv"
+	"strings"
+	"time"
+
+	"github.com/docker/docker/client"
+)
+
+const cgroupRoot = "/sys/fs/cgroup"
+
+// cgroupSamples keeps the raw counters of a container column by column, so
+// sampling only appends integers and nothing is written until the query ends.
+type cgroupSamples struct {
+	timeNs       []int64
+	cpuUsec      []uint64
+	memCurrent   []uint64
+	memInactive  []uint64
+	memPeak      []uint64
+	ioReadBytes  []uint64
+	ioWriteBytes []uint64
+	netRxBytes   []uint64
+	netTxBytes   []uint64
+}
+
+func newCgroupSamples(capacity int) *cgroupSamples {
+	return &cgroupSamples{
+		timeNs:       make([]int64, 0, capacity),
+		cpuUsec:      make([]uint64, 0, capacity),
+		memCurrent:   make([]uint64, 0, capacity),
+		memInactive:  make([]uint64, 0, capacity),
+		memPeak:      make([]uint64, 0, capacity),
+		ioReadBytes:  make([]uint64, 0, capacity),
+		ioWriteBytes: make([]uint64, 0, capacity),
+		netRxBytes:   make([]uint64, 0, capacity),
+		netTxBytes:   make([]uint64, 0, capacity),
+	}
+}
+
+// cgroupSampler reads the cgroup v2 files of a container and the network
+// counters of its netns, the files stay open and are re-read from offset 0.
+type cgroupSampler struct {
+	cpuStat    *os.File
+	memCurrent *os.File
+	memStat    *os.File
+	// memory.peak needs linux 5.19, nil if missing
+	memPeak *os.File
+	ioStat  *os.File
+	netDev  *os.File
+	buf     []byte
+}
+
+func newCgroupSampler(containerName string) (*cgroupSampler, error) {
+	cli, err := client.NewClientWithOpts(client.FromEnv, client.WithAPIVersionNegotiation())
+	if err != nil {
+		return nil, err
+	}
+	defer cli.Close()
+	info, err := cli.ContainerInspect(context.Background(), containerName)
+	if err != nil {
+		return nil, err
+	}
+	if info.State == nil || info.State.Pid == 0 {
+		return nil, fmt.Errorf("container %s is not running", containerName)
+	}
+	pid := info.State.Pid
+	content, err := os.ReadFile(fmt.Sprintf("/proc/%d/cgroup", pid))
+	if err != nil {
+		return nil, err
+	}
+	// on cgroup v2 the file holds the single line 0::/path
+	dir := ""
+	for _, line := range strings.Split(string(content), "\n") {
+		if strings.HasPrefix(line, "0::") {
+			dir = filepath.Join(cgroupRoot, strings.TrimPrefix(line, "0::"))
+		}
+	}
+	if dir == "" {
+		return nil, fmt.Errorf("no cgroup v2 path found for container %s", containerName)
+	}
+	s := &cgroupSampler{buf: make([]byte, 16*1024)}
+	for _, f := range []struct {
+		file **os.File
+		path string
+	}{
+		{&s.cpuStat, filepath.Join(dir, "cpu.stat")},
+		{&s.memCurrent, filepath.Join(dir, "memory.current")},
+		{&s.memStat, filepath.Join(dir, "memory.stat")},
+		{&s.ioStat, filepath.Join(dir, "io.stat")},
+		// /proc/<pid>/net shows the network namespace of the process
+		{&s.netDev, fmt.Sprintf("/proc/%d/net/dev", pid)},
+	} {
+		if *f.file, err = os.Open(f.path); err != nil {
+			s.Close()
+			return nil, err
+		}
+	}
+	// writing to memory.peak resets the peak seen through this fd (linux 6.12),
+	// so the peak is measured per query where the kernel supports it
+	if s.memPeak, err = os.OpenFile(filepath.Join(dir, "memory.peak"), os.O_RDWR, 0); err == nil {
+		s.memPeak.WriteString("reset")
+	} else {
+		s.memPeak, _ = os.Open(filepath.Join(dir, "memory.peak"))
+	}
+	return s, nil
+}
+
+func (s *cgroupSampler) read(f *os.File) ([]byte, error) {
+	n, err := f.ReadAt(s.buf, 0)
+	if err != nil && err != io.EOF {
+		return nil, err
+	}
+	return s.buf[:n], nil
+}
+
+func (s *cgroupSampler) Sample(samples *cgroupSamples) error {
+	now := time.Now().UnixNano()
+	data, err := s.read(s.cpuStat)
+	if err != nil {
+		return err
+	}
+	cpuUsec := parseKeyValue(data, "usage_usec")
+	if data, err = s.read(s.memCurrent); err != nil {
+		return err
+	}
+	memCurrent := parseUint(data)
+	if data, err = s.read(s.memStat); err != nil {
+		return err
+	}
+	memInactive := parseKeyValue(data, "inactive_file")
+	memPeak := memCurrent
+	if s.memPeak != nil {
+		if data, err = s.read(s.memPeak); err != nil {
+			return err
+		}
+		memPeak = parseUint(data)
+	}
+	if data, err = s.read(s.ioStat); err != nil {
+		return err
+	}
+	ioRead, ioWrite := parseIOStat(data)
+	if data, err = s.read(s.netDev); err != nil {
+		return err
+	}
+	netRx, netTx := parseNetDev(data)
+
+	samples.timeNs = append(samples.timeNs, now)
+	samples.cpuUsec = append(samples.cpuUsec, cpuUsec)
+	samples.memCurrent = append(samples.memCurrent, memCurrent)
+	samples.memInactive = append(samples.memInactive, memInactive)
+	samples.memPeak = append(samples.memPeak, memPeak)
+	samples.ioReadBytes = append(samples.ioReadBytes, ioRead)
+	samples.ioWriteBytes = append(samples.ioWriteBytes, ioWrite)
+	samples.netRxBytes = append(samples.netRxBytes, netRx)
+	samples.netTxBytes = append(samples.netTxBytes, netTx)
+	return nil
+}
+
+func (s *cgroupSampler) Close() {
+	for _, f := range []*os.File{s.cpuStat, s.memCurrent, s.memStat, s.memPeak, s.ioStat, s.netDev} {
+		if f != nil {
+			f.Close()
+		}
+	}
+}
+
+// parseUint parses single value files like memory.current
+func parseUint(data []byte) uint64 {
+	v, _ := strconv.ParseUint(string(bytes.TrimSpace(data)), 10, 64)
+	return v
+}
+
+// parseKeyValue finds `key value` lines of flat keyed files like cpu.stat
+func parseKeyValue(data []byte, key string) uint64 {
+	for len(data) > 0 {
+		line := data
+		if i := bytes.IndexByte(data, '\n'); i >= 0 {
+			line, data = data[:i], data[i+1:]
+		} else {
+			data = nil
+		}
+		if len(line) > len(key) && line[len(key)] == ' ' && string(line[:len(key)]) == key {
+			return parseUint(line[len(key)+1:])
+		}
+	}
+	return 0
+}
+
+// parseIOStat sums the bytes read and written on all devices, lines look like
+// `8:0 rbytes=1 wbytes=2 rios=3 wios=4 dbytes=0 dios=0`
+func parseIOStat(data []byte) (read uint64, write uint64) {
+	for _, field := range bytes.Fields(data) {
+		if v, ok := bytes.CutPrefix(field, []byte("rbytes=")); ok {
+			read += parseUint(v)
+		} else if v, ok := bytes.CutPrefix(field, []byte("wbytes=")); ok {
+			write += parseUint(v)
+		}
+	}
+	return read, write
+}
+
+// parseNetDev sums the bytes received and sent on all interfaces but lo, after
+// two header lines every line is `name: rx_bytes <7 rx fields> tx_bytes ...`
+func parseNetDev(data []byte) (rx uint64, tx uint64) {
+	for i, line := range bytes.Split(data, []byte("\n")) {
+		name, counters, ok := bytes.Cut(line, []byte(":"))
+		if i < 2 || !ok || string(bytes.TrimSpace(name)) == "lo" {
+			continue
+		}
+		fields := bytes.Fields(counters)
+		if len(fields) < 9 {
+			continue
+		}
+		rx += parseUint(fields[0])
+		tx += parseUint(fields[8])
+	}
+	return rx, tx
+}
+
+// delta of a counter, 0 if it went backwards e.g. after a device was removed
+func delta(prev uint64, cur uint64) uint64 {
+	if cur < prev {
+		return 0
+	}
+	return cur - prev
+}
+
+// writeCsv writes the samples in the columns of GetDockerStats, so the
+// analysis scripts read both, followed by the columns only cgroups provide.
+// Network columns are b/s over the time since the previous sample, io columns
+// are bytes since the previous sample
+func (samples *cgroupSamples) writeCsv(filePath string) error {
+	file, err := os.Create(filePath)
+	if err != nil {
+		return err
+	}
+	defer file.Close()
+	writer := csv.NewWriter(file)
+	defer writer.Flush()
+	writer.Write([]string{"timestamp", "cpu_usage", "mem_usage", "network_tx", "network_rx", "running_time_s", "mem_peak", "io_read", "io_write"})
+	for i := range samples.timeNs {
+		prev := i
+		if i > 0 {
+			prev = i - 1
+		}
+		cpuUsage, netTx, netRx := 0.0, 0.0, 0.0
+		if elapsedNs := samples.timeNs[i] - samples.timeNs[prev]; elapsedNs > 0 {
+			// percent of one core, like the docker stats
+			cpuUsage = float64(delta(samples.cpuUsec[prev], samples.cpuUsec[i])) * 1000 / float64(elapsedNs) * 100
+			netTx = float64(delta(samples.netTxBytes[prev], samples.netTxBytes[i])*8) * 1e9 / float64(elapsedNs)
+			netRx = float64(delta(samples.netRxBytes[prev], samples.netRxBytes[i])*8) * 1e9 / float64(elapsedNs)
+		}
+		memUsage := samples.memCurrent[i] - min(samples.memInactive[i], samples.memCurrent[i])
+		writer.Write([]string{
+			fmt.Sprintf("%.3f", float64(samples.timeNs[i])/1e9),
+			fmt.Sprintf("%.2f", cpuUsage),
+			fmt.Sprintf("%d", memUsage/1024/1024),
+			fmt.Sprintf("%.0f", netTx),
+			fmt.Sprintf("%.0f", netRx),
+			fmt.Sprintf("%.3f", float64(samples.timeNs[i]-samples.timeNs[0])/1e9),
+			fmt.Sprintf("%d", samples.memPeak[i]/1024/1024),
+			fmt.Sprintf("%d", delta(samples.ioReadBytes[prev], samples.ioReadBytes[i])),
+			fmt.Sprintf("%d", delta(samples.ioWriteBytes[prev], samples.ioWriteBytes[i])),
+		})
+	}
+	return writer.Error()
+}
+
+// GetCgroupStats samples the container every interval until closeCh is closed
+// and then writes {dir}/{containerName}.csv
+func GetCgroupStats(sampler *cgroupSampler, containerName string, interval time.Duration, closeCh chan bool, waitCh chan bool, dir string) {
+	defer func() { waitCh <- true }()
+	defer sampler.Close()
+	// an hour at 50ms
+	samples := newCgroupSamples(72000)
+	failed := false
+	sample := func() {
+		if failed {
+			return
+		}
+		if err := sampler.Sample(samples); err != nil {
+			// keep what was sampled so far
+			log.Printf("sample cgroup of %s failed: %v", containerName, err)
+			failed = true
+		}
+	}
+	ticker := time.NewTicker(interval)
+	defer ticker.Stop()
+	sample()
+	for {
+		select {
+		case <-ticker.C:
+			sample()
+		case <-closeCh:
+			sample()
+			if err := os.MkdirAll(dir, os.FileMode(0777)); err != nil {
+				log.Printf("create %s failed: %v", dir, err)
+				return
+			}
+			if err := samples.writeCsv(filepath.Join(dir, fmt.Sprintf("%s.csv", containerName))); err != nil {
+				log.Printf("write cgroup stats of %s failed: %v", containerName, err)
+			}
+			return
+		}
+	}
+}
+
+// CollectStats samples the container with GetCgroupStats if its cgroup v2
+// files are readable from here, otherwise with the docker stats api
+func CollectStats(containerName string, closeCh chan bool, waitCh chan bool, dir string) {
+	if statsSource == "cgroup" {
+		sampler, err := newCgroupSampler(containerName)
+		if err == nil {
+			GetCgroupStats(sampler, containerName, sampleInterval, closeCh, waitCh, dir)
+			return
+		}
+		log.Printf("cgroup stats of %s unavailable, use docker stats: %v", containerName, err)
+	}
+	GetDockerStats(containerName, 10*time.Second, closeCh, waitCh, dir)
+}
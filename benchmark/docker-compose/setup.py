@@ -40,6 +40,7 @@ BOB_CPU_ENV_NAME = "BOB_CPU_LIMIT"
 CAROL_CPU_ENV_NAME = "CAROL_CPU_LIMIT"
 PSI_TYPE_ENV_NAME = "PSI_TYPE"
 STREAMING_ENV_NAME = "STREAMING"
+MOCK_DATA_FORMAT_ENV_NAME = "MOCK_DATA_FORMAT"
 
 
 DOCKER_COMPOSE_YAML_FILE = os.path.join(CUR_PATH, "docker-compose.yml")
@@ -78,6 +79,14 @@ def create_csv_conn_str(source_file: str, party: str):
         "float64": "FLOAT64",
         "string": "STRING",
     }
+    # mock data format -> csvdb table format
+    table_format_map = {
+        "csv": "CSV",
+        "parquet": "PARQUET",
+    }
+    data_format = os.getenv(MOCK_DATA_FORMAT_ENV_NAME, "csv")
+    if data_format not in table_format_map:
+        raise Exception(f"CSVDB can not read mock data in format: {data_format}")
     result["tables"] = []
     for table_file in info.get("table_files"):
         table_info = parse_json(f"{os.path.dirname(source_file)}/{table_file}")
@@ -85,7 +94,13 @@ def create_csv_conn_str(source_file: str, party: str):
             if table_info[table_name]["db_name"] == party:
                 table_schema = dict()
                 table_schema["tableName"] = table_name
-                table_schema["dataPath"] = f"/data/{party}_{table_name}.csv"
+                data_file = f"{party}_{table_name}.{data_format}"
+                if os.path.isdir(os.path.join(CUR_PATH, "csv", data_file)):
+                    # table split into part files, let duckdb scan them all
+                    table_schema["dataPath"] = f"/data/{data_file}/*.{data_format}"
+                else:
+                    table_schema["dataPath"] = f"/data/{data_file}"
+                table_schema["format"] = table_format_map[data_format]
                 table_schema["columns"] = []
                 for column_info in table_info[table_name]["columns"]:
                     column_schema = dict()
@@ -33,6 +33,14 @@ docker cp ${project_name}-engine-alice-1:/logs/scqlengine.log ${output_logs}/ali
 docker cp ${project_name}-engine-bob-1:/logs/scqlengine.log ${output_logs}/bob_scqlengine.log
 docker cp ${project_name}-engine-carol-1:/logs/scqlengine.log ${output_logs}/carol_scqlengine.log
 # read log
-python ${SCRIPT_DIR}/get_op.py ${output_logs}/alice_scqlengine.log ${output_logs} alice_op.csv
-python ${SCRIPT_DIR}/get_op.py ${output_logs}/bob_scqlengine.log ${output_logs} bob_op.csv
-python ${SCRIPT_DIR}/get_op.py ${output_logs}/carol_scqlengine.log ${output_logs} carol_op.csv
\ No newline at end of file
+python ${SCRIPT_DIR}/get_op.py ${output_logs}/alice_scqlengine.log ${output_logs} alice_op.csv --spans ${output_logs}/alice_spans.parquet --party alice
+python ${SCRIPT_DIR}/get_op.py ${output_logs}/bob_scqlengine.log ${output_logs} bob_op.csv --spans ${output_logs}/bob_spans.parquet --party bob
+python ${SCRIPT_DIR}/get_op.py ${output_logs}/carol_scqlengine.log ${output_logs} carol_op.csv --spans ${output_logs}/carol_spans.parquet --party carol
+# line up the parties and find which one bounds every query
+python ${SCRIPT_DIR}/critical_path.py alice=${output_logs}/alice_spans.parquet bob=${output_logs}/bob_spans.parquet carol=${output_logs}/carol_spans.parquet -o ${output_logs}
+# open logs/trace.json.gz in ui.perfetto.dev or chrome://tracing
+python ${SCRIPT_DIR}/trace_export.py alice=${output_logs}/alice_spans.parquet bob=${output_logs}/bob_spans.parquet carol=${output_logs}/carol_spans.parquet --stats_dir ${output_logs} -o ${output_logs}/trace.json.gz
+# per pipeline and batch time of streaming runs
+python ${SCRIPT_DIR}/batch_breakdown.py alice=${output_logs}/alice_spans.parquet bob=${output_logs}/bob_spans.parquet carol=${output_logs}/carol_spans.parquet -o ${output_logs}
+# cpu, memory and network usage attributed to ops, ranked by network share
+python ${SCRIPT_DIR}/op_resources.py alice=${output_logs}/alice_spans.parquet bob=${output_logs}/bob_spans.parquet carol=${output_logs}/carol_spans.parquet --stats_dir ${output_logs} -o ${output_logs}
@@ -0,0 +1,136 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+
+import pandas as pd
+
+from critical_path import load_spans, parse_input
+
+BATCH_KEYS = ["party", "query", "session", "pipeline", "batch"]
+PIPELINE_KEYS = ["party", "query", "session", "pipeline"]
+
+
+def batch_table(spans: pd.DataFrame):
+    """One row per executed batch, its wall time and the part of it not
+    spent inside nodes (tensor table updates, barriers, scheduling)."""
+    batches = spans.groupby(BATCH_KEYS, sort=True).agg(
+        nodes=("node", "size"),
+        start_s=("start_s", "min"),
+        end_s=("end_s", "max"),
+        node_ms=("duration_ms", "sum"),
+    )
+    batches["wall_ms"] = (batches["end_s"] - batches["start_s"]) * 1000
+    batches["overhead_ms"] = (batches["wall_ms"] - batches["node_ms"]).clip(lower=0)
+    return batches.reset_index()
+
+
+def variation(values: pd.Series, keys: list):
+    # warm-up is how much longer the first batch ran than a typical later one
+    grouped = values.groupby(keys)
+    result = pd.DataFrame(
+        {
+            "batches": grouped.size(),
+            "total_ms": grouped.sum(),
+            "mean_ms": grouped.mean(),
+            "std_ms": grouped.std(ddof=0),
+            "min_ms": grouped.min(),
+            "p50_ms": grouped.median(),
+            "max_ms": grouped.max(),
+            "first_batch_ms": grouped.first(),
+            "rest_p50_ms": grouped.apply(
+                lambda s: s.iloc[1:].median() if len(s) > 1 else float("nan")
+            ),
+        }
+    )
+    result["cv"] = result["std_ms"] / result["mean_ms"]
+    result["warmup_ms"] = result["first_batch_ms"] - result["rest_p50_ms"]
+    return result
+
+
+def pipeline_table(batches: pd.DataFrame):
+    summary = variation(batches.set_index(BATCH_KEYS)["wall_ms"], PIPELINE_KEYS)
+    slowest = batches.loc[batches.groupby(PIPELINE_KEYS)["wall_ms"].idxmax()]
+    summary["slowest_batch"] = slowest.set_index(PIPELINE_KEYS)["batch"]
+    summary["overhead_ms"] = batches.groupby(PIPELINE_KEYS)["overhead_ms"].sum()
+    return summary.reset_index()
+
+
+def op_table(spans: pd.DataFrame):
+    # time of every op type summed within a batch, then compared across batches
+    per_batch = spans.groupby(BATCH_KEYS + ["op"], sort=True)["duration_ms"].sum()
+    per_batch = per_batch.reset_index().sort_values(BATCH_KEYS)
+    summary = variation(
+        per_batch.set_index(PIPELINE_KEYS + ["op", "batch"])["duration_ms"],
+        PIPELINE_KEYS + ["op"],
+    )
+    return summary.reset_index().sort_values(
+        PIPELINE_KEYS + ["total_ms"], ascending=[True] * 4 + [False]
+    )
+
+
+def main(inputs: dict, output_dir: str):
+    spans = pd.concat(
+        [pd.DataFrame(load_spans(party, path)) for party, path in inputs.items()],
+        ignore_index=True,
+    )
+    if spans.empty:
+        print("no spans found")
+        return
+    batches = batch_table(spans)
+    pipelines = pipeline_table(batches)
+    ops = op_table(spans)
+    os.makedirs(output_dir, exist_ok=True)
+    batches.to_csv(
+        os.path.join(output_dir, "batch_breakdown.csv"),
+        index=False,
+        float_format="%.3f",
+    )
+    pipelines.to_csv(
+        os.path.join(output_dir, "pipeline_summary.csv"),
+        index=False,
+        float_format="%.3f",
+    )
+    ops.to_csv(
+        os.path.join(output_dir, "batch_op_summary.csv"),
+        index=False,
+        float_format="%.3f",
+    )
+    for row in pipelines.itertuples():
+        if row.batches < 2:
+            continue
+        print(
+            f"{row.party} query_{row.query} pipeline({row.pipeline}): "
+            f"{row.batches} batches, mean {row.mean_ms:.0f}ms, cv {row.cv:.2f}, "
+            f"first batch warm-up {row.warmup_ms:.0f}ms, "
+            f"slowest batch({row.slowest_batch}) {row.max_ms:.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="break streaming runs down by pipeline and batch"
+    )
+    parser.add_argument(
+        "inputs",
+        type=parse_input,
+        nargs="+",
+        help="party=path of a span table (.parquet/.arrow) or scqlengine.log",
+    )
+    parser.add_argument(
+        "--output_dir", "-o", type=str, help="dir of the csv reports", default="."
+    )
+    args = parser.parse_args()
+    main(dict(args.inputs), args.output_dir)
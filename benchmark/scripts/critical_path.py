@@ -0,0 +1,250 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import csv
+import os
+import statistics
+from collections import defaultdict
+
+from get_op import Span, iter_spans, read_spans
+
+# critical time that is not spent inside a node, e.g. scheduling between
+# nodes or waiting for the first party to start
+GAP = "(gap)"
+
+
+def load_spans(party: str, file_path: str, tz_offset_hours: float = 0):
+    if file_path.endswith(".log"):
+        return list(iter_spans(file_path, party, tz_offset_hours))
+    table = read_spans(file_path)
+    spans = [Span(**row) for row in table.to_pylist()]
+    return [span._replace(party=party) for span in spans]
+
+
+def span_key(span: Span):
+    # in streaming mode a node runs once per pipeline batch
+    return (span.session, span.node, span.pipeline, span.batch)
+
+
+def estimate_offsets(spans_by_party: dict, reference: str):
+    """Returns seconds to subtract from every party's timestamps.
+
+    Collaborative nodes end at nearly the same moment on all parties since
+    the last message of the op has to arrive, so the median difference of
+    their end times measures how far a party's clock is off the reference."""
+    reference_ends = {span_key(s): s.end_s for s in spans_by_party[reference]}
+    offsets = {}
+    for party, spans in spans_by_party.items():
+        diffs = [
+            s.end_s - reference_ends[span_key(s)]
+            for s in spans
+            if span_key(s) in reference_ends
+        ]
+        offsets[party] = statistics.median(diffs) if diffs and party != reference else 0
+    return offsets
+
+
+class SessionGraph:
+    """Spans of one session on all parties, with clock offsets removed."""
+
+    def __init__(self, session: str, spans: list):
+        self.session = session
+        self.timelines = defaultdict(list)
+        self.nodes = defaultdict(dict)
+        for span in sorted(spans, key=lambda s: s.start_s):
+            self.timelines[span.party].append(span)
+            self.nodes[span_key(span)][span.party] = span
+        self.positions = {
+            (party, span_key(span)): i
+            for party, timeline in self.timelines.items()
+            for i, span in enumerate(timeline)
+        }
+        self.start_s = min(span.start_s for span in spans)
+        self.end_s = max(span.end_s for span in spans)
+
+    def last_arrival(self, key):
+        spans = self.nodes[key]
+        return max(spans.values(), key=lambda s: s.start_s)
+
+    def node_rows(self):
+        # a party waits at a collaborative node until the last peer arrives,
+        # the rest of the node's time is spent computing or communicating
+        for key, spans in self.nodes.items():
+            last_start = self.last_arrival(key).start_s
+            for party, span in spans.items():
+                wait_s = max(last_start - span.start_s, 0)
+                yield {
+                    "session": self.session,
+                    "node": span.node,
+                    "op": span.op,
+                    "pipeline": span.pipeline,
+                    "batch": span.batch,
+                    "party": party,
+                    "parties": len(spans),
+                    "start_s": span.start_s,
+                    "end_s": span.end_s,
+                    "wait_ms": wait_s * 1000,
+                    "compute_ms": max(span.end_s - span.start_s - wait_s, 0) * 1000,
+                }
+
+    def critical_path(self):
+        """Walks back from the node finishing last and returns a list of
+        (party, span or None, critical seconds) that adds up to the wall time.
+
+        At a collaborative node the path continues on the party that arrived
+        last, because every other party was waiting for it; otherwise it
+        follows the party's own previous node."""
+        path = []
+        party, span = max(
+            ((s.party, s) for spans in self.nodes.values() for s in spans.values()),
+            key=lambda item: item[1].end_s,
+        )
+        t = span.end_s
+        visited = set()
+        while span is not None:
+            last = self.last_arrival(span_key(span))
+            party, span = last.party, last
+            # skewed clocks could otherwise lead the walk in circles
+            if (party, span_key(span)) in visited:
+                break
+            visited.add((party, span_key(span)))
+            path.append((party, span, max(t - span.start_s, 0)))
+            t = min(t, span.start_s)
+            pos = self.positions[(party, span_key(span))]
+            span = self.timelines[party][pos - 1] if pos > 0 else None
+            prev_end = span.end_s if span is not None else self.start_s
+            path.append((party, None, max(t - prev_end, 0)))
+            t = min(t, prev_end)
+        return path
+
+
+def summarize(graph: SessionGraph, query: int):
+    path = graph.critical_path()
+    by_party = defaultdict(float)
+    by_node = defaultdict(float)
+    for party, span, seconds in path:
+        by_party[party] += seconds
+        node = (party, span.node, span.op) if span else (party, GAP, GAP)
+        by_node[node] += seconds
+    bound_party = max(by_party, key=by_party.get)
+    bound_node = max(by_node, key=by_node.get)
+    summary = {
+        "query": query,
+        "session": graph.session,
+        "wall_ms": (graph.end_s - graph.start_s) * 1000,
+        "critical_ms": sum(by_party.values()) * 1000,
+        "bound_party": bound_party,
+        "bound_party_ms": by_party[bound_party] * 1000,
+        "bound_node": bound_node[1],
+        "bound_op": bound_node[2],
+        "bound_node_party": bound_node[0],
+        "bound_node_ms": by_node[bound_node] * 1000,
+    }
+    for party in sorted(graph.timelines):
+        summary[f"{party}_critical_ms"] = by_party.get(party, 0) * 1000
+    critical = {(p, s.node, s.pipeline, s.batch) for p, s, _ in path if s}
+    return summary, critical
+
+
+def write_csv(file_path: str, rows: list):
+    if not rows:
+        return
+    fields = list(rows[0].keys())
+    for row in rows:
+        fields += [k for k in row if k not in fields]
+    with open(file_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(inputs: dict, output_dir: str, reference: str, tz_offset_hours: float):
+    spans_by_party = {
+        party: load_spans(party, path, tz_offset_hours)
+        for party, path in inputs.items()
+    }
+    offsets = estimate_offsets(spans_by_party, reference or next(iter(inputs)))
+    sessions = defaultdict(list)
+    for party, spans in spans_by_party.items():
+        print(f"{party} clock offset {offsets[party] * 1000:.1f}ms")
+        for span in spans:
+            sessions[span.session].append(
+                span._replace(
+                    start_s=span.start_s - offsets[party],
+                    end_s=span.end_s - offsets[party],
+                )
+            )
+    graphs = sorted(
+        (SessionGraph(session, spans) for session, spans in sessions.items()),
+        key=lambda g: g.start_s,
+    )
+    summaries = []
+    node_rows = []
+    for query, graph in enumerate(graphs):
+        summary, critical = summarize(graph, query)
+        summaries.append(summary)
+        for row in graph.node_rows():
+            row["query"] = query
+            row["critical"] = (
+                row["party"],
+                row["node"],
+                row["pipeline"],
+                row["batch"],
+            ) in critical
+            node_rows.append(row)
+        print(
+            "query_{query} wall {wall_ms:.0f}ms bound by {bound_party} "
+            "({bound_party_ms:.0f}ms), slowest critical op {bound_node} "
+            "{bound_op} on {bound_node_party} ({bound_node_ms:.0f}ms)".format(**summary)
+        )
+    os.makedirs(output_dir, exist_ok=True)
+    write_csv(os.path.join(output_dir, "critical_path_summary.csv"), summaries)
+    write_csv(os.path.join(output_dir, "critical_path_nodes.csv"), node_rows)
+
+
+def parse_input(value: str):
+    party, sep, path = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expect party=path, got {value}")
+    return party, path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="merge engine spans of all parties and find the critical path"
+    )
+    parser.add_argument(
+        "inputs",
+        type=parse_input,
+        nargs="+",
+        help="party=path of a span table (.parquet/.arrow) or scqlengine.log",
+    )
+    parser.add_argument(
+        "--output_dir", "-o", type=str, help="dir of the csv reports", default="."
+    )
+    parser.add_argument(
+        "--reference",
+        type=str,
+        help="party whose clock the others are aligned to, default the first one",
+        default=None,
+    )
+    parser.add_argument(
+        "--tz_offset_hours",
+        type=float,
+        help="hours the log timestamps are ahead of UTC, only used for .log inputs",
+        default=0,
+    )
+    args = parser.parse_args()
+    main(dict(args.inputs), args.output_dir, args.reference, args.tz_offset_hours)
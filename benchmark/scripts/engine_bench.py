@@ -0,0 +1,354 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import csv
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from result_store import CUR_PATH, DEFAULT_DB, connect, git_revision
+
+ROOT_PATH = os.path.join(CUR_PATH, "..", "..")
+# the micro benchmarks are cc_binary targets tagged "benchmark"
+QUERY = 'attr(tags, "\\bbenchmark\\b", kind(cc_binary, //engine/...))'
+TIME_UNITS = {"ns": 1, "us": 1e3, "ms": 1e6, "s": 1e9}
+# keys of a google benchmark result that are not user counters
+RESULT_KEYS = {
+    "name",
+    "family_index",
+    "per_family_instance_index",
+    "run_name",
+    "run_type",
+    "repetitions",
+    "repetition_index",
+    "threads",
+    "iterations",
+    "real_time",
+    "cpu_time",
+    "time_unit",
+    "aggregate_name",
+    "aggregate_unit",
+    "error_occurred",
+    "error_message",
+}
+CONTEXT_KEYS = [
+    "host_name",
+    "num_cpus",
+    "mhz_per_cpu",
+    "cpu_scaling_enabled",
+    "library_build_type",
+]
+
+
+def bazel(args: list, bazel_bin: str = "bazel"):
+    return subprocess.check_output([bazel_bin] + args, cwd=ROOT_PATH, text=True).strip()
+
+
+def find_targets(bazel_bin: str):
+    return bazel(["query", QUERY], bazel_bin).split()
+
+
+def target_path(bin_dir: str, target: str):
+    # //engine/operator:bucket_bench -> bazel-bin/engine/operator/bucket_bench
+    package, _, name = target.lstrip("@").lstrip("/").partition(":")
+    return os.path.join(bin_dir, package, name or os.path.basename(package))
+
+
+def parse_cpus(value: str):
+    """2,3 or 4-7 style cpu list, as taskset -c takes it."""
+    cpus = set()
+    for part in value.split(","):
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def run_target(path: str, output: str, cpus: set, args):
+    command = [
+        path,
+        f"--benchmark_out={output}",
+        "--benchmark_out_format=json",
+        f"--benchmark_repetitions={args.repetitions}",
+    ]
+    if args.filter:
+        command.append(f"--benchmark_filter={args.filter}")
+    if args.min_time:
+        command.append(f"--benchmark_min_time={args.min_time}")
+
+    def pin():
+        os.sched_setaffinity(0, cpus)
+
+    print(" ".join(command), flush=True)
+    subprocess.run(
+        command, check=True, preexec_fn=pin if cpus else None, cwd=tempfile.gettempdir()
+    )
+
+
+def load_results(file_path: str):
+    with open(file_path) as f:
+        data = json.load(f)
+    context = data.get("context", {})
+    if context.get("library_build_type") == "debug":
+        print(f"warning: {file_path} comes from a debug build of google benchmark")
+    if context.get("cpu_scaling_enabled"):
+        print(f"warning: cpu frequency scaling was enabled for {file_path}")
+    results = []
+    for bench in data.get("benchmarks", []):
+        # means and medians are computed from the stored repetitions instead
+        if bench.get("run_type") == "aggregate":
+            continue
+        if bench.get("error_occurred"):
+            print(f"skip {bench['name']}: {bench.get('error_message')}")
+            continue
+        scale = TIME_UNITS[bench.get("time_unit", "ns")]
+        results.append(
+            {
+                "name": bench.get("run_name", bench["name"]),
+                "repetition": bench.get("repetition_index", 0),
+                "iterations": bench["iterations"],
+                "real_time_ns": bench["real_time"] * scale,
+                "cpu_time_ns": bench["cpu_time"] * scale,
+                "counters": {k: v for k, v in bench.items() if k not in RESULT_KEYS},
+            }
+        )
+    return {k: context.get(k) for k in CONTEXT_KEYS}, results
+
+
+def record(conn, files: dict, params: dict, label: str, rev: str):
+    detected, dirty = git_revision()
+    rev = rev or detected
+    contexts = {}
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (created_at, git_rev, dirty, label, params) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (time.time(), rev, int(dirty), label, "{}"),
+        )
+        run_id = cur.lastrowid
+        count = 0
+        for target, file_path in files.items():
+            context, results = load_results(file_path)
+            contexts[target] = context
+            conn.executemany(
+                "INSERT INTO micro VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        target,
+                        r["name"],
+                        r["repetition"],
+                        r["iterations"],
+                        r["real_time_ns"],
+                        r["cpu_time_ns"],
+                        json.dumps(r["counters"]),
+                    )
+                    for r in results
+                ],
+            )
+            count += len(results)
+        params["context"] = contexts
+        conn.execute(
+            "UPDATE runs SET params = ? WHERE run_id = ?",
+            (json.dumps(params), run_id),
+        )
+    print(f"recorded run {run_id}: {count} results at {rev[:12]}")
+
+
+def run(args):
+    targets = args.targets or find_targets(args.bazel)
+    if not targets:
+        raise Exception("no benchmark targets found")
+    if not args.no_build:
+        subprocess.run(
+            [args.bazel, "build", "--config=bench"] + targets,
+            cwd=ROOT_PATH,
+            check=True,
+        )
+    bin_dir = bazel(["info", "--config=bench", "bazel-bin"], args.bazel)
+    cpus = parse_cpus(args.cpus) if args.cpus else set()
+    if cpus and not hasattr(os, "sched_setaffinity"):
+        print("warning: cpu pinning is not supported here, run unpinned")
+        cpus = set()
+    out_dir = args.out_dir or tempfile.mkdtemp(prefix="engine_bench_")
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for target in targets:
+        output = os.path.join(out_dir, target.split(":")[-1] + ".json")
+        run_target(target_path(bin_dir, target), output, cpus, args)
+        files[target] = output
+    params = {
+        "cpus": args.cpus,
+        "repetitions": args.repetitions,
+        "filter": args.filter,
+        "min_time": args.min_time,
+    }
+    record(connect(args.db), files, params, args.label, args.rev)
+
+
+def series(conn, pattern: str, metric: str):
+    """{(target, name): {rev: [ns]}} and the revisions in recording order."""
+    revs = []
+    values = defaultdict(lambda: defaultdict(list))
+    for rev, target, name, ns in conn.execute(
+        f"SELECT r.git_rev, m.target, m.name, m.{metric}_time_ns "
+        "FROM micro m JOIN runs r ON m.run_id = r.run_id ORDER BY r.run_id"
+    ):
+        if pattern and not re.search(pattern, f"{target} {name}"):
+            continue
+        if rev not in revs:
+            revs.append(rev)
+        values[(target, name)][rev].append(ns)
+    return values, revs
+
+
+def format_ns(ns: float):
+    for unit in ["s", "ms", "us"]:
+        if ns >= TIME_UNITS[unit]:
+            return f"{ns / TIME_UNITS[unit]:.3g}{unit}"
+    return f"{ns:.3g}ns"
+
+
+def trend(args):
+    """Median time of every benchmark at the last revisions, a change of more
+    than the threshold against the previous revision is marked with !"""
+    values, revs = series(connect(args.db), args.filter, args.metric)
+    revs = revs[-args.last :]
+    header = ["benchmark"] + [rev[:8] for rev in revs]
+    rows = []
+    regressions = 0
+    for (target, name), by_rev in sorted(values.items()):
+        row = [f"{target.split(':')[-1]} {name}"]
+        prev = None
+        for rev in revs:
+            if rev not in by_rev:
+                row.append("-")
+                continue
+            median = float(np.median(by_rev[rev]))
+            cell = format_ns(median)
+            if prev:
+                change = median / prev - 1
+                cell += f" {change:+.0%}"
+                if change > args.threshold:
+                    cell += "!"
+                    regressions += rev == revs[-1]
+            row.append(cell)
+            prev = median
+        rows.append(row)
+    widths = [max(len(r[i]) for r in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print(
+            "  ".join(
+                cell.ljust(w) if i == 0 else cell.rjust(w)
+                for i, (cell, w) in enumerate(zip(row, widths))
+            )
+        )
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["target", "name", "git_rev", f"{args.metric}_time_ns"])
+            for (target, name), by_rev in sorted(values.items()):
+                for rev in revs:
+                    if rev in by_rev:
+                        writer.writerow([target, name, rev, np.median(by_rev[rev])])
+    if regressions:
+        print(
+            f"{regressions} benchmark(s) slower than {args.threshold:.0%} at {revs[-1][:12]}"
+        )
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def import_files(args):
+    files = dict(value.split("=", 1) for value in args.inputs)
+    record(connect(args.db), files, {"imported": True}, args.label, args.rev)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="run the engine's google benchmark targets and track their history"
+    )
+    parser.add_argument("--db", type=str, help="sqlite file", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="build, run and record the benchmarks")
+    run_parser.add_argument(
+        "--targets",
+        type=str,
+        nargs="*",
+        help="bazel targets, default all cc_binary targets tagged benchmark",
+    )
+    run_parser.add_argument(
+        "--cpus", type=str, help="pin the benchmarks to these cpus, e.g. 2-3"
+    )
+    run_parser.add_argument("--repetitions", type=int, default=3)
+    run_parser.add_argument("--filter", type=str, help="--benchmark_filter regex")
+    run_parser.add_argument(
+        "--min_time", type=str, help="--benchmark_min_time, e.g. 1s or 10x"
+    )
+    run_parser.add_argument(
+        "--out_dir", type=str, help="keep the google benchmark json files here"
+    )
+    run_parser.add_argument("--bazel", type=str, default="bazel")
+    run_parser.add_argument(
+        "--no_build", action="store_true", help="run the binaries already built"
+    )
+    run_parser.add_argument("--label", type=str, default="engine_bench")
+    run_parser.add_argument(
+        "--rev", type=str, help="override the detected git revision", default=None
+    )
+
+    import_parser = sub.add_parser(
+        "import", help="record google benchmark json files run elsewhere"
+    )
+    import_parser.add_argument(
+        "inputs", type=str, nargs="+", help="target=path of a --benchmark_out file"
+    )
+    import_parser.add_argument("--label", type=str, default="engine_bench")
+    import_parser.add_argument("--rev", type=str, default=None)
+
+    trend_parser = sub.add_parser("trend", help="median time per git revision")
+    trend_parser.add_argument("--last", type=int, help="revisions shown", default=8)
+    trend_parser.add_argument(
+        "--filter", type=str, help="regex on target and benchmark name"
+    )
+    trend_parser.add_argument(
+        "--metric", type=str, choices=["real", "cpu"], default="real"
+    )
+    trend_parser.add_argument(
+        "--threshold",
+        type=float,
+        help="relative slowdown marked as a regression",
+        default=0.1,
+    )
+    trend_parser.add_argument(
+        "--fail_on_regression",
+        action="store_true",
+        help="exit non-zero if the latest revision regressed",
+    )
+    trend_parser.add_argument("--csv", type=str, help="also write the series here")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "import":
+        import_files(args)
+    else:
+        sys.exit(trend(args))
@@ -12,93 +12,311 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
+import calendar
+import mmap
 import os
 import pathlib
-import datetime
-import sys
 import re
+import sys
+import time
+from typing import NamedTuple
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
 
 CUR_PATH = pathlib.Path(__file__).parent.resolve()
 
+# engine log lines look like
+# 2024-06-06 10:10:10.123 [info] [file.cc:func:42] [logger] session(id) ...
+NODE_EVENT = re.compile(
+    rb"(?P<day>\d{4}-\d\d-\d\d) (?P<h>\d\d):(?P<m>\d\d):(?P<s>\d\d)\.(?P<ms>\d{3}) "
+    rb"\[\w+\] \[[^\]\n]*\] \[[^\]\n]*\] session\((?P<session>[^)\n]*)\) (?:"
+    rb"start to execute node\((?P<start>[^)\n]*)\) op\((?P<op>[^)\n]*)\)"
+    rb"(?: pipeline\((?P<pipeline>\d+)\) batch\((?P<batch>\d+)\))?"
+    rb"|finished executing node\((?P<end>[^)\n]*)\), op\([^)\n]*\), cost\((?P<cost>\d+)\)ms)"
+)
+# a literal prefix lets the regex engine skip to candidate lines at memchr
+# speed, only those lines are matched against NODE_EVENT
+NODE_MARKER = re.compile(rb"execut(?:e|ing) node\(")
+# spans are flushed to the columnar writer in batches of this many rows
+SPAN_BATCH_SIZE = 65536
+SPAN_SCHEMA = pa.schema(
+    [
+        ("party", pa.string()),
+        ("session", pa.string()),
+        ("query", pa.int32()),
+        ("node", pa.string()),
+        ("op", pa.string()),
+        ("pipeline", pa.int32()),
+        ("batch", pa.int32()),
+        ("start_s", pa.float64()),
+        ("end_s", pa.float64()),
+        ("duration_ms", pa.float64()),
+        ("cost_ms", pa.int64()),
+        ("running_time_s", pa.float64()),
+    ]
+)
+
+
+class Span(NamedTuple):
+    party: str
+    session: str
+    query: int
+    node: str
+    op: str
+    pipeline: int
+    batch: int
+    start_s: float
+    end_s: float
+    duration_ms: float
+    cost_ms: int
+    running_time_s: float
+
+
+class TimeParser:
+    """Converts log timestamps to unix seconds, the log is written in the
+    container's local time which is tz_offset_hours ahead of UTC."""
+
+    def __init__(self, tz_offset_hours: float = 0):
+        self.offset = tz_offset_hours * 3600
+        self.days = {}
+
+    def __call__(self, m: re.Match):
+        day = self.days.get(m["day"])
+        if day is None:
+            day = (
+                calendar.timegm(time.strptime(m["day"].decode(), "%Y-%m-%d"))
+                - self.offset
+            )
+            self.days[m["day"]] = day
+        return (
+            day
+            + int(m["h"]) * 3600
+            + int(m["m"]) * 60
+            + int(m["s"])
+            + int(m["ms"]) / 1000
+        )
+
+
+def iter_chunks(file, chunk_size: int = 64 << 20):
+    # mmap lets the regex scan the whole log without copying it, pipes and
+    # other unmappable files are read in chunks cut at line boundaries
+    try:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+            return
+    except (ValueError, OSError):
+        pass
+    rest = b""
+    while True:
+        data = file.read(chunk_size)
+        if not data:
+            break
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        rest = data[cut:]
+        yield data[:cut]
+    if rest:
+        yield rest
+
+
+def iter_node_events(chunk):
+    line_end = 0
+    for marker in NODE_MARKER.finditer(chunk):
+        if marker.start() < line_end:
+            continue
+        line_start = chunk.rfind(b"\n", 0, marker.start()) + 1
+        line_end = chunk.find(b"\n", marker.end())
+        if line_end < 0:
+            line_end = len(chunk)
+        m = NODE_EVENT.match(chunk, line_start, line_end)
+        if m:
+            yield m
+
+
+class SpanBuilder:
+    """Pairs start and finish events by session and node name, so logs of
+    concurrent sessions may interleave freely. Queries are numbered in the
+    order their sessions start executing nodes, which matches the query_{n}
+    stats dirs of the benchmark, repeats included."""
+
+    def __init__(self, party: str = "", tz_offset_hours: float = 0):
+        self.party = party
+        self.parse_time = TimeParser(tz_offset_hours)
+        self.queries = {}
+        self.session_starts = {}
+        self.running = {}
+        self.unfinished = 0
+
+    def feed(self, m: re.Match):
+        """Returns the finished Span for a finish event, None otherwise."""
+        ts = self.parse_time(m)
+        session = m["session"].decode()
+        if m["start"] is not None:
+            if session not in self.queries:
+                self.queries[session] = len(self.queries)
+                self.session_starts[session] = ts
+            key = (session, m["start"])
+            if key in self.running:
+                self.unfinished += 1
+            self.running[key] = (
+                ts,
+                m["op"].decode(),
+                int(m["pipeline"]) if m["pipeline"] is not None else -1,
+                int(m["batch"]) if m["batch"] is not None else -1,
+            )
+            return None
+        start = self.running.pop((session, m["end"]), None)
+        if start is None:
+            # the start line was rotated away or never written
+            return None
+        start_s, op, pipeline, batch = start
+        return Span(
+            self.party,
+            session,
+            self.queries[session],
+            m["end"].decode(),
+            op,
+            pipeline,
+            batch,
+            start_s,
+            ts,
+            (ts - start_s) * 1000,
+            int(m["cost"]),
+            start_s - self.session_starts[session],
+        )
 
-def get_time(str):
-    return (
-        datetime.datetime.strptime(str, "%Y-%m-%d %H:%M:%S.%f").timestamp() + 8 * 3600
-    )
 
+def iter_spans(file_path: str, party: str = "", tz_offset_hours: float = 0):
+    """Yields a Span for every executed node in the log in finishing order."""
+    builder = SpanBuilder(party, tz_offset_hours)
+    with open(file_path, "rb") as f:
+        for chunk in iter_chunks(f):
+            for m in iter_node_events(chunk):
+                span = builder.feed(m)
+                if span is not None:
+                    yield span
+    unfinished = builder.unfinished + len(builder.running)
+    if unfinished:
+        print(f"{file_path}: {unfinished} node(s) never finished", file=sys.stderr)
 
-def dump_csv(inputs, dump_dir, file_name):
-    for i, query_input in enumerate(inputs):
-        dump_file = os.path.join(os.path.join(dump_dir, f"query_{i}"), file_name)
-        with open(dump_file, "w") as f:
+
+def read_spans(file_path: str):
+    # the span table may be written as parquet or arrow ipc
+    if file_path.endswith(".parquet"):
+        return pq.read_table(file_path)
+    with pa.memory_map(file_path) as source:
+        return ipc.open_file(source).read_all()
+
+
+class SpanWriter:
+    """Writes spans to a parquet or arrow ipc file, picked by extension."""
+
+    def __init__(self, file_path: str):
+        if file_path.endswith(".parquet"):
+            self.writer = pq.ParquetWriter(file_path, SPAN_SCHEMA)
+        else:
+            self.writer = ipc.new_file(file_path, SPAN_SCHEMA)
+        self.rows = []
+
+    def write(self, span: Span):
+        self.rows.append(span)
+        if len(self.rows) >= SPAN_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        columns = [list(column) for column in zip(*self.rows)]
+        self.writer.write_table(pa.Table.from_arrays(columns, schema=SPAN_SCHEMA))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+class CsvDumper:
+    """Writes {dump_dir}/query_{i}/{file_name} the way plot_csv_data.py reads it."""
+
+    def __init__(self, dump_dir: str, file_name: str):
+        self.dump_dir = dump_dir
+        self.file_name = file_name
+        self.files = {}
+
+    def write(self, span: Span):
+        f = self.files.get(span.query)
+        if f is None:
+            query_dir = os.path.join(self.dump_dir, f"query_{span.query}")
+            os.makedirs(query_dir, exist_ok=True)
+            f = open(os.path.join(query_dir, self.file_name), "w")
             f.write("op,duration_ms,start_time_s,running_time_s\n")
-            for p in query_input:
-                f.write(
-                    "{}, {:.2f}, {:.0f}, {:.0f}\n".format(p[0], p[1] * 1000, p[2], p[3])
-                )
-
-
-def get_time_list(file):
-    start = []
-    end = []
-    split_start = []
-    split_end = []
-    with open(file, "r") as f:
-        line = f.readline()
-        while line:
-            if "report success" in line:
-                start.append(split_start)
-                end.append(split_end)
-                split_start = []
-                split_end = []
-                line = f.readline()
-                continue
-            times = line.split(" [info]")
-            if len(times) > 1:
-                times[0] = times[0].strip("\n").strip(" ")
-                # match start
-                matchObj = re.match(
-                    r".* start to execute node\((.*?)\) op(\(.*?\))",
-                    line,
-                    re.M | re.I,
-                )
-                if matchObj:
-                    split_start.append(
-                        (get_time(times[0].strip("\n").strip(" ")), matchObj.group(1))
-                    )
-
-                # match end
-                matchObj = re.match(
-                    r".* finished executing node\((.*?)\), op(\(.*?\))",
-                    line,
-                    re.M | re.I,
-                )
-                if matchObj:
-                    split_end.append(
-                        (get_time(times[0].strip("\n").strip(" ")), matchObj.group(1))
-                    )
-            line = f.readline()
-    return start, end
-
-
-def main(file, dump_dir, file_name):
-    start, end = get_time_list(file)
-    cost = []
-    for i, split_start in enumerate(start):
-        split_cost = []
-        for j, _ in enumerate(split_start):
-            assert start[i][j][1] == end[i][j][1]
-            split_cost.append(
-                (
-                    start[i][j][1],
-                    end[i][j][0] - start[i][j][0],
-                    start[i][j][0],
-                    start[i][j][0] - start[i][0][0],
-                )
+            self.files[span.query] = f
+        f.write(
+            "{}, {:.2f}, {:.0f}, {:.0f}\n".format(
+                span.node, span.duration_ms, span.start_s, span.running_time_s
             )
-        cost.append(split_cost)
-    dump_csv(cost, dump_dir, file_name)
+        )
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+def main(
+    file,
+    dump_dir=None,
+    file_name=None,
+    spans_path=None,
+    party="",
+    tz_offset_hours=0,
+):
+    sinks = []
+    if dump_dir and file_name:
+        sinks.append(CsvDumper(dump_dir, file_name))
+    if spans_path:
+        sinks.append(SpanWriter(spans_path))
+    try:
+        for span in iter_spans(file, party, tz_offset_hours):
+            for sink in sinks:
+                sink.write(span)
+    finally:
+        for sink in sinks:
+            sink.close()
 
 
 if __name__ == "__main__":
-    main(sys.argv[1], sys.argv[2], sys.argv[3])
+    parser = argparse.ArgumentParser(description="parse op spans from engine log")
+    parser.add_argument("log", type=str, help="scqlengine.log path")
+    parser.add_argument(
+        "dump_dir", type=str, nargs="?", help="dir of per query op csv files"
+    )
+    parser.add_argument("file_name", type=str, nargs="?", help="op csv file name")
+    parser.add_argument(
+        "--spans",
+        type=str,
+        help="write all spans to this .parquet or .arrow file",
+        default=None,
+    )
+    parser.add_argument(
+        "--party", type=str, help="party recorded in the span table", default=""
+    )
+    parser.add_argument(
+        "--tz_offset_hours",
+        type=float,
+        help="hours the log timestamps are ahead of UTC",
+        default=0,
+    )
+    args = parser.parse_args()
+    if not args.spans and not (args.dump_dir and args.file_name):
+        parser.error("nothing to write, give dump_dir and file_name or --spans")
+    main(
+        args.log,
+        args.dump_dir,
+        args.file_name,
+        args.spans,
+        args.party,
+        args.tz_offset_hours,
+    )
@@ -12,13 +12,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import json
+import math
 import os
 import re
 import argparse
+import shutil
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import random
 
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 CUR_PATH = Path(__file__).parent.resolve()
 
@@ -30,142 +38,1019 @@ RANDOM_MOCK = "random"
 RANGE_MOCK = "random_range"
 RANDOM_POOL = "random_pool"
 INCREMENT_MOCK = "increment"
+JOIN_KEY_MOCK = "join_key"
+DISTINCT_MOCK = "distinct"
 
 # key word
 MOCK_TYPE_KEY = "mock_type"
 RANGE_KEY = "range"
 RANDOM_POOL_KEY = "pool"
 STRING_LEN = "str_len"
+# join key options
+OVERLAP_KEY = "overlap"
+MULTIPLICITY_KEY = "multiplicity"
+DISTINCT_KEYS_KEY = "distinct_keys"
+DISTRIBUTION_KEY = "distribution"
+ZIPF_S_KEY = "zipf_s"
+HOT_KEYS_KEY = "hot_keys"
+HOT_RATIO_KEY = "hot_ratio"
+# distinct options
+DISTINCT_COUNT_KEY = "distinct_count"
+NULL_RATIO_KEY = "null_ratio"
+# filled by resolve_columns, not meant to be set in table json
+PRIVATE_KEY_BASE_KEY = "private_key_base"
+DISTINCT_STRIDE_KEY = "distinct_stride"
+NULL_START_KEY = "null_start"
+NULL_ROW_RATIO_KEY = "null_row_ratio"
 
+# join key distribution
+UNIFORM_DISTRIBUTION = "uniform"
+ZIPF_DISTRIBUTION = "zipf"
+HEAVY_HITTER_DISTRIBUTION = "heavy_hitter"
 
-def bench_mock_int(column: map, row_num: int, cur_pos: int):
+# keys not shared with other parties live in [base * slot, base * (slot + 1)),
+# the slot is picked by hashing db.table.column
+PRIVATE_KEY_BASE = 10**12
+PRIVATE_KEY_SLOTS = 10**6
+GOLDEN_RATIO = (5**0.5 - 1) / 2
+# null rows use another irrational so that they do not line up with join keys
+NULL_SEQUENCE_RATIO = 2**0.5 - 1
+# stride used to visit distinct values out of order, adjusted to be coprime
+DISTINCT_STRIDE = 2654435761
+NULL_CHARS = b"NULL"
+# realized distinct counts above this are not tracked in the table summary
+SUMMARY_DISTINCT_LIMIT = 1 << 24
+
+BATCH_SIZE = 100000
+# tables are generated in shards of SHARD_ROWS rows, each with its own random
+# state, changing it changes the generated data
+SHARD_ROWS = 1000000
+DEFAULT_SEED = 0
+# bump it whenever the same schema and seed would give different data
+GENERATOR_VERSION = 1
+MANIFEST_FILE = "mock_data_manifest.json"
+COPY_BUFFER_SIZE = 16 * 1024 * 1024
+CSV_SEPARATOR = ", "
+
+# output file format
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+ARROW_FORMAT = "arrow"
+FILE_FORMATS = [CSV_FORMAT, PARQUET_FORMAT, ARROW_FORMAT]
+# same as the row group size of duckdb, which scans one row group per thread
+DEFAULT_ROW_GROUP_SIZE = 122880
+
+NUMPY_TYPES = {
+    "int": np.int64,
+    "float": np.float64,
+    "float64": np.float64,
+    "string": np.bytes_,
+}
+ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "float64": pa.float64(),
+    "string": pa.string(),
+}
+# floats are written in their shortest decimal form when they have at most this
+# many fraction digits, which covers every value the generators below produce
+MAX_FLOAT_DECIMALS = 6
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+CHUNK_DIGITS = 4
+CHUNK_BASE = 10**CHUNK_DIGITS
+# the ascii digits of 0000 to 9999, one uint32 word each
+DIGIT_CHUNKS = (
+    np.frombuffer(
+        "".join(f"{i:04d}" for i in range(CHUNK_BASE)).encode(), dtype=np.uint8
+    )
+    .copy()
+    .view(np.uint32)
+)
+
+
+def int_to_chars(values: np.ndarray, zero_pad: int = 0):
+    """render integers as a (rows, width) uint8 matrix of ascii digits.
+
+    Digits are right aligned, unused leading cells are 0 (NUL) so that callers
+    can drop them with a single mask.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    low, high = int(values.min(initial=0)), int(values.max(initial=0))
+    if high - low < len(values) // 4:
+        # few distinct values, each is rendered once and looked up; the table
+        # holds low and high, so it has the width of the values
+        table = render_ints(np.arange(low, high + 1, dtype=np.int64), zero_pad)
+        return np.take(table, values - low, axis=0)
+    return render_ints(values, zero_pad)
+
+
+def render_ints(values: np.ndarray, zero_pad: int):
+    negative = values < 0
+    magnitude = np.abs(values)
+    digit_num = np.searchsorted(POWERS_OF_TEN, magnitude, side="right")
+    max_digits = int(digit_num.max(initial=1))
+    digit_num = np.maximum(digit_num, max(zero_pad, 1))
+    width = int(digit_num.max(initial=1)) + int(negative.any())
+    # digits are looked up CHUNK_DIGITS at a time, as uint32 words
+    chunk_num = -(-max_digits // CHUNK_DIGITS)
+    words = np.empty((len(values), chunk_num), dtype=np.uint32)
+    for pos in range(chunk_num - 1, -1, -1):
+        words[:, pos] = DIGIT_CHUNKS[magnitude % CHUNK_BASE]
+        magnitude //= CHUNK_BASE
+    digits = words.view(np.uint8)
+    pad = width - digits.shape[1]
+    if pad > 0:
+        chars = np.empty((len(values), width), dtype=np.uint8)
+        chars[:, :pad] = ord("0")
+        chars[:, pad:] = digits
+    else:
+        chars = np.ascontiguousarray(digits[:, -pad:])
+    lead = width - digit_num
+    # only the first width - min(digit_num) cells can be leading
+    cells = int(lead.max(initial=0))
+    chars[:, :cells] *= np.arange(cells) >= lead[:, None]
+    if negative.any():
+        chars[np.nonzero(negative)[0], lead[negative] - 1] = ord("-")
+    return chars
+
+
+def left_align(chars: np.ndarray):
+    """move NUL padding of a right aligned char matrix to the end of each row"""
+    if chars[:, 0].all():
+        return chars
+    lead = np.argmax(chars != 0, axis=1)
+    cols = np.arange(chars.shape[1]) + lead[:, None]
+    valid = cols < chars.shape[1]
+    aligned = np.take_along_axis(chars, np.minimum(cols, chars.shape[1] - 1), axis=1)
+    aligned[~valid] = 0
+    return aligned
+
+
+def float_to_chars(values: np.ndarray):
+    """render floats like python str() does, for values with few decimals"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0 or np.abs(values).max() >= 1e15:
+        return str_to_chars(values.astype(str))
+    for decimals in range(MAX_FLOAT_DECIMALS + 1):
+        scaled = np.round(values * 10**decimals)
+        if np.array_equal(scaled / 10**decimals, values):
+            break
+    else:
+        return str_to_chars(values.astype(str))
+    scaled = scaled.astype(np.int64)
+    int_part = np.abs(scaled) // 10**decimals
+    int_part[values < 0] *= -1
+    int_chars = int_to_chars(int_part)
+    # -0.5 has an integer part of 0, so the sign has to be put back by hand
+    lost_sign = (values < 0) & (int_part == 0)
+    if lost_sign.any():
+        int_chars = np.hstack([np.zeros((len(values), 1), np.uint8), int_chars])
+        int_chars[lost_sign, -2] = ord("-")
+    if decimals == 0:
+        frac_chars = np.full((len(values), 1), ord("0"), dtype=np.uint8)
+    else:
+        frac_chars = int_to_chars(np.abs(scaled) % 10**decimals, zero_pad=decimals)
+        # strip trailing zeros but keep at least one fraction digit
+        nonzero = np.flip(
+            np.logical_or.accumulate(np.flip(frac_chars != ord("0"), axis=1), axis=1),
+            axis=1,
+        )
+        nonzero[:, 0] = True
+        frac_chars[~nonzero] = 0
+    dot = np.full((len(values), 1), ord("."), dtype=np.uint8)
+    return np.hstack([int_chars, dot, frac_chars])
+
+
+def str_to_chars(values: np.ndarray):
+    values = np.asarray(values)
+    if values.dtype.kind == "U":
+        values = np.char.encode(values, "utf-8")
+    values = np.ascontiguousarray(values)
+    return values.view(np.uint8).reshape(len(values), values.dtype.itemsize)
+
+
+def column_to_chars(values: np.ndarray):
+    if np.ma.isMaskedArray(values):
+        return masked_to_chars(values)
+    values = np.asarray(values)
+    if values.dtype.kind in "iu":
+        return int_to_chars(values)
+    elif values.dtype.kind == "f":
+        return float_to_chars(values)
+    elif values.dtype.kind in "SU":
+        return str_to_chars(values)
+    else:
+        raise Exception(f"unsupported column dtype: {values.dtype}")
+
+
+def masked_to_chars(values: np.ma.MaskedArray):
+    """render a masked column, masked rows become NULL"""
+    chars = column_to_chars(values.data)
+    mask = np.ma.getmaskarray(values)
+    if chars.shape[1] < len(NULL_CHARS):
+        pad = np.zeros((len(chars), len(NULL_CHARS) - chars.shape[1]), np.uint8)
+        chars = np.hstack([pad, chars])
+    chars[mask] = 0
+    chars[mask, : len(NULL_CHARS)] = np.frombuffer(NULL_CHARS, dtype=np.uint8)
+    return chars
+
+
+def format_csv_batch(column_datas: list):
+    """format a batch of columns into csv bytes, one line per row.
+
+    Every column is rendered into a NUL padded char matrix, the matrices are
+    laid out side by side with separator and newline fields of one structured
+    row and the padding is dropped, so no python string is created per value.
+    """
+    row_num = len(column_datas[0])
+    fields = []
+    for i, data in enumerate(column_datas):
+        if i > 0:
+            fields.append(np.void(CSV_SEPARATOR.encode()))
+        chars = np.ascontiguousarray(column_to_chars(data))
+        fields.append(chars.view(f"V{chars.shape[1]}").ravel())
+    fields.append(np.void(b"\n"))
+    # copying a whole field per row is much faster than a narrow 2d slice
+    offsets = np.cumsum([0] + [field.dtype.itemsize for field in fields])
+    names = [f"f{i}" for i in range(len(fields))]
+    line = np.dtype(
+        {
+            "names": names,
+            "formats": [field.dtype for field in fields],
+            "offsets": offsets[:-1].tolist(),
+            "itemsize": int(offsets[-1]),
+        }
+    )
+    lines = np.empty(row_num, dtype=line)
+    for name, field in zip(names, fields):
+        lines[name] = field
+    chars = lines.view(np.uint8)
+    return chars[chars != 0].tobytes()
+
+
+def mock_from_pool(column: map, row_num: int, rng: np.random.Generator):
+    assert RANDOM_POOL_KEY in column
+    assert len(column[RANDOM_POOL_KEY]) > 1
+    pool = np.asarray(column[RANDOM_POOL_KEY], dtype=NUMPY_TYPES[column["dtype"]])
+    return pool[rng.integers(0, len(pool), size=row_num)]
+
+
+def int_to_str(values: np.ndarray, str_len: int):
+    """zero padded decimal strings of values as a numpy bytes array"""
+    chars = left_align(int_to_chars(values, zero_pad=str_len))
+    return chars.view(f"S{chars.shape[1]}").ravel()
+
+
+def bounded_zipf(n: int, s: float, size: int, rng: np.random.Generator):
+    """draw indexes in [0, n) where index k has weight about 1 / (k + 1) ** s.
+
+    Uses the inverse cdf of the continuous approximation, so no table of
+    n weights is needed.
+    """
+    u = rng.random(size)
+    if s == 1:
+        x = np.power(n + 1.0, u)
+    else:
+        x = np.power((np.power(n + 1.0, 1 - s) - 1) * u + 1, 1 / (1 - s))
+    return np.clip(np.floor(x).astype(np.int64) - 1, 0, n - 1)
+
+
+def join_key_index(column: map, row_num: int, cur_pos: int, rng: np.random.Generator):
+    """pick the distinct key index of every row"""
+    distinct_keys = column[DISTINCT_KEYS_KEY]
+    distribution = column.get(DISTRIBUTION_KEY, UNIFORM_DISTRIBUTION)
+    if distribution == UNIFORM_DISTRIBUTION:
+        # every key repeats multiplicity times in a row, like increment
+        rows = np.arange(cur_pos, cur_pos + row_num, dtype=np.int64)
+        return rows // column.get(MULTIPLICITY_KEY, 1) % distinct_keys
+    elif distribution == ZIPF_DISTRIBUTION:
+        return bounded_zipf(distinct_keys, column.get(ZIPF_S_KEY, 1.0), row_num, rng)
+    elif distribution == HEAVY_HITTER_DISTRIBUTION:
+        hot_keys = min(column.get(HOT_KEYS_KEY, 1), distinct_keys)
+        hot = rng.random(row_num) < column.get(HOT_RATIO_KEY, 0.5)
+        index = rng.integers(0, distinct_keys, size=row_num)
+        index[hot] = rng.integers(0, hot_keys, size=int(hot.sum()))
+        return index
+    else:
+        raise Exception("unknown join key distribution: " + distribution)
+
+
+def bench_mock_join_key(
+    column: map, row_num: int, cur_pos: int, rng: np.random.Generator
+):
+    """generate join keys with a controllable overlap between parties.
+
+    Key index k is shared when frac((k + 1) * golden ratio) < overlap, shared
+    keys are k itself and are the same for every table, other keys are moved
+    into the private range of this column. The low discrepancy sequence makes
+    the shared part hit the overlap ratio within a few keys, and two columns
+    with overlap a and b intersect on min(a, b) of the smaller key set,
+    without ever holding a key set in memory.
+    """
+    index = join_key_index(column, row_num, cur_pos, rng)
+    overlap = column.get(OVERLAP_KEY, 1.0)
+    shared = np.modf((index + 1) * GOLDEN_RATIO)[0] < overlap
+    return np.where(shared, index, index + column[PRIVATE_KEY_BASE_KEY])
+
+
+def bench_mock_distinct(
+    column: map, row_num: int, cur_pos: int, rng: np.random.Generator
+):
+    """generate values with exactly distinct_count distinct values.
+
+    The first distinct_count rows of the table visit every value once in a
+    strided order, later rows pick values by the column distribution. Returns
+    the value index, typed values are made by distinct_values.
+    """
+    distinct_count = column[DISTINCT_COUNT_KEY]
+    rows = np.arange(cur_pos, cur_pos + row_num, dtype=np.int64)
+    index = np.empty(row_num, dtype=np.int64)
+    first = rows < distinct_count
+    index[first] = rows[first] * column[DISTINCT_STRIDE_KEY] % distinct_count
+    rest = int(row_num - first.sum())
+    distribution = column.get(DISTRIBUTION_KEY, UNIFORM_DISTRIBUTION)
+    if distribution == UNIFORM_DISTRIBUTION:
+        index[~first] = rng.integers(0, distinct_count, size=rest)
+    elif distribution == ZIPF_DISTRIBUTION:
+        index[~first] = bounded_zipf(
+            distinct_count, column.get(ZIPF_S_KEY, 1.0), rest, rng
+        )
+    else:
+        raise Exception("unknown distinct distribution: " + distribution)
+    return distinct_values(column, index)
+
+
+def distinct_values(column: map, index: np.ndarray):
+    """map value indexes to distinct values of the column type"""
+    distinct_count = column[DISTINCT_COUNT_KEY]
+    data_type = column["dtype"]
+    if data_type == "int":
+        if RANGE_KEY not in column:
+            return index
+        low, high = column[RANGE_KEY]
+        assert high - low + 1 >= distinct_count
+        return low + index * ((high - low + 1) // distinct_count)
+    elif data_type == "float" or data_type == "float64":
+        # same 0.001 resolution as random_range
+        low, high = column.get(RANGE_KEY, [0, distinct_count / 1000])
+        step = max((high - low) * 1000 // distinct_count, 1)
+        return (low * 1000 + index * step) / 1000
+    elif data_type == "string":
+        return int_to_str(index, column.get(STRING_LEN, 0))
+    else:
+        raise Exception("unknown mock type")
+
+
+def null_mask(column: map, row_num: int, cur_pos: int):
+    """rows of the batch that are null.
+
+    Rows after null_start are null when a low discrepancy sequence falls
+    under null_row_ratio, which keeps the realized null ratio exact within a
+    few rows.
+    """
+    rows = np.arange(cur_pos, cur_pos + row_num, dtype=np.int64)
+    null_start = column.get(NULL_START_KEY, 0)
+    sequence = np.modf((rows - null_start + 1) * NULL_SEQUENCE_RATIO)[0]
+    return (rows >= null_start) & (sequence < column[NULL_ROW_RATIO_KEY])
+
+
+def resolve_columns(db_name: str, table_name: str, columns: list, row_num: int):
+    """fill the per table defaults of columns, returns copies of the columns"""
+    resolved = []
+    for column in columns:
+        column = dict(column)
+        if column.get(MOCK_TYPE_KEY) == JOIN_KEY_MOCK:
+            assert 0 <= column.get(OVERLAP_KEY, 1.0) <= 1
+            assert column.get(MULTIPLICITY_KEY, 1) >= 1
+            column.setdefault(
+                DISTINCT_KEYS_KEY,
+                max(row_num // column.get(MULTIPLICITY_KEY, 1), 1),
+            )
+            assert column[DISTINCT_KEYS_KEY] < PRIVATE_KEY_BASE
+            owner = f"{db_name}.{table_name}.{column['column_name']}"
+            slot = zlib.crc32(owner.encode()) % PRIVATE_KEY_SLOTS
+            column[PRIVATE_KEY_BASE_KEY] = PRIVATE_KEY_BASE * (slot + 1)
+        null_start = 0
+        if column.get(MOCK_TYPE_KEY) == DISTINCT_MOCK:
+            distinct_count = column[DISTINCT_COUNT_KEY]
+            assert 0 < distinct_count <= row_num
+            stride = DISTINCT_STRIDE % distinct_count or 1
+            while math.gcd(stride, distinct_count) != 1:
+                stride += 1
+            column[DISTINCT_STRIDE_KEY] = stride
+            # nulls must not hide the rows that carry every distinct value
+            null_start = distinct_count
+        if column.get(NULL_RATIO_KEY, 0) > 0:
+            null_rows = column[NULL_RATIO_KEY] * row_num
+            assert null_rows <= row_num - null_start, (
+                f"null_ratio of {column['column_name']} leaves too few rows "
+                "for its distinct_count"
+            )
+            column[NULL_START_KEY] = null_start
+            column[NULL_ROW_RATIO_KEY] = null_rows / (row_num - null_start)
+        resolved.append(column)
+    return resolved
+
+
+def bench_mock_int(column: map, row_num: int, cur_pos: int, rng: np.random.Generator):
     if not MOCK_TYPE_KEY in column:
         column[MOCK_TYPE_KEY] = RANDOM_MOCK
     mock_type = column[MOCK_TYPE_KEY]
-    result = []
     if mock_type == RANDOM_MOCK:
-        result = [str(random.randint(-100, 100)) for i in range(row_num)]
+        return rng.integers(-100, 100, size=row_num, endpoint=True)
     elif mock_type == RANGE_MOCK:
         assert RANGE_KEY in column
         assert len(column[RANGE_KEY]) == 2
-        result = [
-            str(random.randint(column[RANGE_KEY][0], column[RANGE_KEY][1]))
-            for i in range(row_num)
-        ]
+        return rng.integers(
+            column[RANGE_KEY][0], column[RANGE_KEY][1], size=row_num, endpoint=True
+        )
     elif mock_type == RANDOM_POOL:
-        assert RANDOM_POOL_KEY in column
-        assert len(column[RANDOM_POOL_KEY]) > 1
-        index = [
-            random.randint(0, len(column[RANDOM_POOL_KEY]) - 1) for i in range(row_num)
-        ]
-        for i in index:
-            result.append(str(column[RANDOM_POOL_KEY][i]))
+        return mock_from_pool(column, row_num, rng)
     elif mock_type == INCREMENT_MOCK:
-        result = [str(i + cur_pos) for i in range(row_num)]
+        return np.arange(cur_pos, cur_pos + row_num, dtype=np.int64)
+    elif mock_type == JOIN_KEY_MOCK:
+        return bench_mock_join_key(column, row_num, cur_pos, rng)
     else:
         raise Exception("unknown mock type for int: " + mock_type)
-    return result
 
 
-def bench_mock_float(column: map, row_num: int, cur_pos: int):
+def bench_mock_float(column: map, row_num: int, cur_pos: int, rng: np.random.Generator):
     if not MOCK_TYPE_KEY in column:
         column[MOCK_TYPE_KEY] = RANDOM_MOCK
     mock_type = column[MOCK_TYPE_KEY]
-    result = []
     if mock_type == RANDOM_MOCK:
-        result = [str(random.randint(-10000, 10000) / 100) for i in range(row_num)]
+        return rng.integers(-10000, 10000, size=row_num, endpoint=True) / 100
     elif mock_type == RANGE_MOCK:
         assert RANGE_KEY in column
         assert len(column[RANGE_KEY]) == 2
-        result = [
-            str(
-                random.randint(column[RANGE_KEY][0] * 1000, column[RANGE_KEY][1] * 1000)
-                / 1000
+        return (
+            rng.integers(
+                column[RANGE_KEY][0] * 1000,
+                column[RANGE_KEY][1] * 1000,
+                size=row_num,
+                endpoint=True,
             )
-            for i in range(row_num)
-        ]
+            / 1000
+        )
     elif mock_type == RANDOM_POOL:
-        assert RANDOM_POOL_KEY in column
-        assert len(column[RANDOM_POOL_KEY]) > 1
-        index = [
-            random.randint(0, len(column[RANDOM_POOL_KEY]) - 1) for i in range(row_num)
-        ]
-        for i in index:
-            result.append(str(column[RANDOM_POOL_KEY][i]))
+        return mock_from_pool(column, row_num, rng)
     else:
         raise Exception("unknown mock type for float: " + mock_type)
-    return result
 
 
-def bench_mock_str(column: map, row_num: int, cur_pos: int):
+def bench_mock_str(column: map, row_num: int, cur_pos: int, rng: np.random.Generator):
+    """string columns are returned as utf-8 encoded numpy bytes arrays"""
     if not MOCK_TYPE_KEY in column:
         column[MOCK_TYPE_KEY] = RANDOM_MOCK
     mock_type = column[MOCK_TYPE_KEY]
-    result = []
     str_len = 0
     if STRING_LEN in column:
         str_len = column[STRING_LEN]
     if mock_type == RANDOM_MOCK:
-        index = [
-            random.randint(0, len(Default_STRING_POOL) - 1) for i in range(row_num)
-        ]
-        for i in index:
-            result.append(Default_STRING_POOL[i])
+        pool = np.asarray(Default_STRING_POOL, dtype=np.bytes_)
+        return pool[rng.integers(0, len(pool), size=row_num)]
     elif mock_type == RANDOM_POOL:
-        assert RANDOM_POOL_KEY in column
-        assert len(column[RANDOM_POOL_KEY]) > 1
-        index = [
-            random.randint(0, len(column[RANDOM_POOL_KEY]) - 1) for i in range(row_num)
-        ]
-        for i in index:
-            result.append(column[RANDOM_POOL_KEY][i])
+        return mock_from_pool(column, row_num, rng)
     elif mock_type == INCREMENT_MOCK:
-        result = [str(i + cur_pos).zfill(str_len) for i in range(row_num)]
+        ids = np.arange(cur_pos, cur_pos + row_num, dtype=np.int64)
+        return int_to_str(ids, str_len)
+    elif mock_type == JOIN_KEY_MOCK:
+        return int_to_str(bench_mock_join_key(column, row_num, cur_pos, rng), str_len)
     else:
         raise Exception("unknown mock type for string: " + mock_type)
-    return result
 
 
-def create_bench_data(column: map, row_num: int, cur_pos: int):
+def create_bench_data(
+    column: map, row_num: int, cur_pos: int, rng: np.random.Generator
+):
+    """generate one typed column of row_num values as a numpy array.
+
+    Columns with null_ratio are returned as masked arrays, masked rows are null.
+    """
     data_type = column["dtype"]
-    if data_type == "int":
-        return bench_mock_int(column, row_num, cur_pos)
+    if column.get(MOCK_TYPE_KEY) == DISTINCT_MOCK:
+        data = bench_mock_distinct(column, row_num, cur_pos, rng)
+    elif data_type == "int":
+        data = bench_mock_int(column, row_num, cur_pos, rng)
     elif data_type == "float" or data_type == "float64":
-        return bench_mock_float(column, row_num, cur_pos)
+        data = bench_mock_float(column, row_num, cur_pos, rng)
     elif data_type == "string":
-        return bench_mock_str(column, row_num, cur_pos)
+        data = bench_mock_str(column, row_num, cur_pos, rng)
     else:
         raise Exception("unknown mock type")
+    if column.get(NULL_RATIO_KEY, 0) > 0:
+        data = np.ma.masked_array(data, mask=null_mask(column, row_num, cur_pos))
+    return data
+
+
+def shard_seed(seed: int, db_name: str, table_name: str, shard_index: int):
+    """derive the random state of one shard.
+
+    The state only depends on the global seed, the table and the shard index,
+    so the generated data does not change with the number of workers.
+    """
+    table_key = zlib.crc32(f"{db_name}.{table_name}".encode())
+    return np.random.SeedSequence(seed, spawn_key=(table_key, shard_index))
+
+
+def split_shards(row_num: int):
+    """split [0, row_num) into (start, rows) ranges of SHARD_ROWS rows"""
+    return [
+        (start, min(SHARD_ROWS, row_num - start))
+        for start in range(0, row_num, SHARD_ROWS)
+    ]
+
+
+def csv_header(columns):
+    column_strs = []
+    for column in columns:
+        assert "dtype" in column
+        column_strs.append(column["column_name"])
+    return (CSV_SEPARATOR.join(column_strs) + "\n").encode()
+
+
+def arrow_schema(columns):
+    fields = []
+    for column in columns:
+        assert "dtype" in column
+        fields.append(pa.field(column["column_name"], ARROW_TYPES[column["dtype"]]))
+    return pa.schema(fields)
+
+
+def to_record_batch(column_datas: list, schema: pa.Schema):
+    arrays = []
+    for data, field in zip(column_datas, schema):
+        # string columns are utf-8 bytes, arrow takes them as binary first
+        if np.ma.isMaskedArray(data):
+            array = pa.array(data.data, mask=np.ma.getmaskarray(data))
+        else:
+            array = pa.array(data)
+        arrays.append(array.cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ColumnarSink:
+    """write record batches to a parquet or arrow ipc file.
 
+    Batches are regrouped so every row group (parquet) or record batch
+    (arrow) except the last one has exactly row_group_size rows.
+    """
 
-def create_csv(table_name, columns, row_num, file_path):
+    def __init__(
+        self, file_format: str, file_path, schema: pa.Schema, row_group_size: int
+    ):
+        self.file_format = file_format
+        self.file_path = file_path
+        self.row_group_size = row_group_size
+        self.pending = []
+        self.pending_rows = 0
+        if file_format == PARQUET_FORMAT:
+            self.writer = pq.ParquetWriter(file_path, schema)
+        elif file_format == ARROW_FORMAT:
+            self.writer = pa.ipc.new_file(file_path, schema)
+        else:
+            raise Exception(f"unsupported columnar format: {file_format}")
+
+    def write(self, batch: pa.RecordBatch):
+        self.pending.append(batch)
+        self.pending_rows += batch.num_rows
+        if self.pending_rows >= self.row_group_size:
+            self.flush(self.pending_rows // self.row_group_size * self.row_group_size)
+
+    def flush(self, row_num: int):
+        table = pa.Table.from_batches(self.pending).combine_chunks()
+        if self.file_format == PARQUET_FORMAT:
+            self.writer.write_table(
+                table.slice(0, row_num), row_group_size=self.row_group_size
+            )
+        else:
+            self.writer.write_table(
+                table.slice(0, row_num), max_chunksize=self.row_group_size
+            )
+        self.pending = table.slice(row_num).to_batches()
+        self.pending_rows -= row_num
+
+    def written_size(self):
+        """bytes written to the file so far, pending rows are not counted"""
+        return os.path.getsize(self.file_path)
+
+    def close(self):
+        if self.pending_rows > 0:
+            self.flush(self.pending_rows)
+        self.writer.close()
+
+
+def sorted_unique(values: np.ndarray):
+    # np.unique hashes bytes values one by one, sorting is much faster
+    values = np.sort(values)
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return values[keep]
+
+
+def spec_distinct(column: map, row_num: int):
+    """distinct count of a column that follows from its spec, None if it has to
+    be counted from the data"""
+    mock_type = column.get(MOCK_TYPE_KEY, RANDOM_MOCK)
+    if mock_type == DISTINCT_MOCK:
+        # nulls start after the rows that carry every value
+        return column[DISTINCT_COUNT_KEY]
+    if column.get(NULL_RATIO_KEY, 0) > 0:
+        return None
+    if mock_type == INCREMENT_MOCK:
+        return row_num
+    distribution = column.get(DISTRIBUTION_KEY, UNIFORM_DISTRIBUTION)
+    if mock_type == JOIN_KEY_MOCK and distribution == UNIFORM_DISTRIBUTION:
+        multiplicity = column.get(MULTIPLICITY_KEY, 1)
+        return min(column[DISTINCT_KEYS_KEY], -(-row_num // multiplicity))
+    return None
+
+
+class ColumnSummary:
+    """realized null count and distinct values of a column"""
+
+    def __init__(self, count_distinct: bool = True):
+        self.row_num = 0
+        self.null_count = 0
+        # None once there are more than SUMMARY_DISTINCT_LIMIT distinct values,
+        # or when the distinct count is known from the column spec
+        self.distinct = np.array([], dtype=np.int64) if count_distinct else None
+        # values not deduplicated into distinct yet
+        self.pending = []
+        self.pending_num = 0
+
+    def add(self, data: np.ndarray):
+        self.row_num += len(data)
+        if np.ma.isMaskedArray(data):
+            self.null_count += int(np.ma.count_masked(data))
+            data = data.compressed()
+        self.add_values(data)
+
+    def merge(self, other):
+        self.row_num += other.row_num
+        self.null_count += other.null_count
+        other.compact()
+        if other.distinct is None:
+            self.distinct = None
+        else:
+            self.add_values(other.distinct)
+
+    def add_values(self, values: np.ndarray):
+        if self.distinct is None:
+            return
+        self.pending.append(values)
+        self.pending_num += len(values)
+        if self.pending_num >= SHARD_ROWS:
+            self.compact()
+
+    def compact(self):
+        if self.distinct is not None and self.pending:
+            values = np.concatenate(self.pending)
+            if len(self.distinct) > 0:
+                values = np.concatenate([self.distinct, values])
+            self.distinct = sorted_unique(values)
+            if len(self.distinct) > SUMMARY_DISTINCT_LIMIT:
+                self.distinct = None
+        self.pending = []
+        self.pending_num = 0
+
+    def to_json(self, column: map):
+        self.compact()
+        distinct_count = spec_distinct(column, self.row_num)
+        if distinct_count is None and self.distinct is not None:
+            distinct_count = len(self.distinct)
+        result = {
+            "null_count": self.null_count,
+            "null_ratio": self.null_count / self.row_num if self.row_num else 0,
+            "distinct_count": distinct_count,
+        }
+        if DISTINCT_COUNT_KEY in column:
+            result["target_distinct_count"] = column[DISTINCT_COUNT_KEY]
+        if NULL_RATIO_KEY in column:
+            result["target_null_ratio"] = column[NULL_RATIO_KEY]
+        return result
+
+
+def write_summary(file_path, columns: list, summaries: list, row_num: int):
+    """dump the realized cardinalities of a table next to its data file"""
+    summary = {"row_num": row_num, "columns": {}}
+    for column, column_summary in zip(columns, summaries):
+        summary["columns"][column["column_name"]] = column_summary.to_json(column)
     with open(file_path, "w") as f:
-        column_strs = []
-        for column in columns:
-            assert "dtype" in column
-            column_strs.append(column["column_name"])
-        f.write(", ".join(column_strs) + "\n")
+        json.dump(summary, f, indent=2)
+
+
+def create_shard(
+    columns,
+    start: int,
+    row_num: int,
+    seed: np.random.SeedSequence,
+    file_path,
+    file_format: str = CSV_FORMAT,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+):
+    """write rows [start, start + row_num) of a table, csv is written without header.
+
+    Returns the shard path and the ColumnSummary of every column.
+    """
+    rng = np.random.default_rng(seed)
+    # sorting out the distinct values is the most expensive part of a shard,
+    # it is skipped for columns whose distinct count is known anyway
+    summaries = [
+        ColumnSummary(spec_distinct(column, row_num) is None) for column in columns
+    ]
+    if file_format == CSV_FORMAT:
+        f = open(file_path, "wb")
+    else:
+        schema = arrow_schema(columns)
+        sink = ColumnarSink(file_format, file_path, schema, row_group_size)
+    cur_pos = start
+    while cur_pos < start + row_num:
+        tmp_num = min(BATCH_SIZE, start + row_num - cur_pos)
         column_datas = []
-        batch_size = 100000
-        cur_pos = 0
-        while cur_pos < row_num:
-            tmp_num = min(batch_size, row_num - cur_pos)
-            column_datas = []
-            for column in columns:
-                column_datas.append(create_bench_data(column, tmp_num, cur_pos))
-            for i in range(tmp_num):
-                t_data = [column_datas[j][i] for j in range(len(column_datas))]
-                f.write(", ".join(t_data) + "\n")
-            cur_pos += tmp_num
-            print(f"create {cur_pos} rows")
-    return
-
-
-def create_mock_data(source: dict, rows: int, dest_dir: str):
+        for column in columns:
+            column_datas.append(create_bench_data(column, tmp_num, cur_pos, rng))
+        for summary, data in zip(summaries, column_datas):
+            summary.add(data)
+        if file_format == CSV_FORMAT:
+            f.write(format_csv_batch(column_datas))
+        else:
+            sink.write(to_record_batch(column_datas, schema))
+        cur_pos += tmp_num
+    if file_format == CSV_FORMAT:
+        f.close()
+    else:
+        sink.close()
+    for summary in summaries:
+        summary.compact()
+    return file_path, summaries
+
+
+class TableFiles:
+    """write the rows of a table into one file, or into part files.
+
+    With rows_per_file or bytes_per_file set, file_path becomes a directory
+    of part-00000.{format}, part-00001.{format}, ... and a new part starts once
+    the current one has rows_per_file rows or at least bytes_per_file bytes.
+    Every csv part has its own header.
+    """
+
+    def __init__(
+        self,
+        file_path,
+        columns: list,
+        file_format: str,
+        row_group_size: int,
+        rows_per_file: int = 0,
+        bytes_per_file: int = 0,
+    ):
+        self.columns = columns
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+        self.bytes_per_file = bytes_per_file
+        self.file_paths = []
+        self.file = None
+        # file_path may be left as a file or a directory by a previous run
+        remove_path(file_path)
+        if self.is_split():
+            self.file_dir = file_path
+            os.makedirs(self.file_dir)
+        else:
+            self.file_paths.append(file_path)
+            self.open(file_path)
+
+    def is_split(self):
+        return self.rows_per_file > 0 or self.bytes_per_file > 0
+
+    def open(self, file_path):
+        self.file_rows = 0
+        self.file_bytes = 0
+        if self.file_format == CSV_FORMAT:
+            self.file = open(file_path, "wb")
+            self.file.write(csv_header(self.columns))
+        else:
+            self.file = ColumnarSink(
+                self.file_format,
+                file_path,
+                arrow_schema(self.columns),
+                self.row_group_size,
+            )
+
+    def next_file(self):
+        if self.file is not None:
+            self.file.close()
+        file_path = os.path.join(
+            self.file_dir, f"part-{len(self.file_paths):05d}.{self.file_format}"
+        )
+        self.file_paths.append(file_path)
+        self.open(file_path)
+
+    def is_full(self):
+        if self.rows_per_file > 0:
+            return self.file_rows >= self.rows_per_file
+        return self.bytes_per_file > 0 and self.file_bytes >= self.bytes_per_file
+
+    def write_csv(self, data: bytes):
+        """write csv lines, a part may end in any line of data"""
+        while len(data) > 0:
+            if self.file is None or (self.is_split() and self.is_full()):
+                self.next_file()
+            cut = self.csv_cut(data)
+            self.file.write(data[:cut])
+            if self.rows_per_file > 0:
+                self.file_rows += data.count(b"\n", 0, cut)
+            self.file_bytes += cut
+            data = data[cut:]
+
+    def csv_cut(self, data: bytes):
+        """length of the head of data that still belongs to the current file"""
+        if self.rows_per_file > 0:
+            newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)
+            remain = self.rows_per_file - self.file_rows
+            if len(newlines) >= remain:
+                return int(newlines[remain - 1]) + 1
+        elif self.bytes_per_file > 0:
+            remain = self.bytes_per_file - self.file_bytes
+            if len(data) >= remain:
+                # finish the line that crosses the size limit
+                newline = data.find(b"\n", max(remain - 1, 0))
+                if newline >= 0:
+                    return newline + 1
+        return len(data)
+
+    def write_batch(self, batch: pa.RecordBatch):
+        while batch.num_rows > 0:
+            if self.file is None or (self.is_split() and self.is_full()):
+                self.next_file()
+            take = batch.num_rows
+            if self.rows_per_file > 0:
+                take = min(take, self.rows_per_file - self.file_rows)
+            self.file.write(batch.slice(0, take))
+            self.file_rows += take
+            if self.bytes_per_file > 0:
+                self.file_bytes = self.file.written_size()
+            batch = batch.slice(take)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        return self.file_paths
+
+
+def remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def merge_shards(shard_paths, table_files: TableFiles):
+    """write shard files in order into the table files and remove them.
+
+    shard_paths is an iterator, each shard is merged as soon as it is ready.
+    csv shards are copied in chunks, columnar shards are arrow ipc files
+    whose batches are rewritten into the target format.
+    """
+    for shard_path in shard_paths:
+        if table_files.file_format == CSV_FORMAT:
+            with open(shard_path, "rb") as shard:
+                while chunk := shard.read(COPY_BUFFER_SIZE):
+                    table_files.write_csv(chunk)
+        else:
+            with pa.memory_map(shard_path) as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    table_files.write_batch(reader.get_batch(i))
+        os.remove(shard_path)
+    return table_files.close()
+
+
+def shard_paths(results, shard_num: int, summaries: list):
+    """take the next shard_num results of run_tasks, merge their summaries into
+    summaries and yield their paths"""
+    for _ in range(shard_num):
+        shard_path, shard_summaries = next(results)
+        for summary, shard_summary in zip(summaries, shard_summaries):
+            summary.merge(shard_summary)
+        yield shard_path
+
+
+def run_tasks(func, tasks: list, workers: int):
+    """run func over tasks in order, in a process pool if workers > 1.
+
+    At most 2 * workers tasks are in flight, so results waiting for an
+    earlier task do not pile up.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield func(*task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = deque()
+        for task in tasks:
+            if len(window) >= 2 * workers:
+                yield window.popleft().result()
+            window.append(executor.submit(func, *task))
+        while window:
+            yield window.popleft().result()
+
+
+def table_cache_key(
+    db_name: str,
+    table_name: str,
+    columns: list,
+    row_num: int,
+    seed: int,
+    file_format: str,
+    row_group_size: int,
+    file_num: int,
+    file_size_mb: int,
+):
+    """hash everything that decides the content of a generated table"""
+    key = {
+        "version": GENERATOR_VERSION,
+        "db_name": db_name,
+        "table_name": table_name,
+        "columns": columns,
+        "row_num": row_num,
+        "seed": seed,
+        "format": file_format,
+        "row_group_size": row_group_size,
+        "file_num": file_num,
+        "file_size_mb": file_size_mb,
+        "batch_size": BATCH_SIZE,
+        "shard_rows": SHARD_ROWS,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(dest_dir: str):
+    manifest_path = os.path.join(dest_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    return parse_json(manifest_path)
+
+
+def save_manifest(dest_dir: str, manifest: dict):
+    # write then rename, an interrupted run never leaves a broken manifest
+    manifest_path = os.path.join(dest_dir, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def is_cached(manifest: dict, file_name: str, cache_key: str, dest_dir: str):
+    """whether the files of a table were generated with the same cache key"""
+    entry = manifest.get(file_name)
+    if entry is None or entry["key"] != cache_key:
+        return False
+    for name, size in entry["files"].items():
+        path = os.path.join(dest_dir, name)
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            return False
+    return True
+
+
+def cache_entry(cache_key: str, dest_dir: str, file_paths: list):
+    return {
+        "key": cache_key,
+        "files": {os.path.relpath(p, dest_dir): os.path.getsize(p) for p in file_paths},
+    }
+
+
+def create_mock_data(
+    source: dict,
+    rows: int,
+    dest_dir: str,
+    seed: int = DEFAULT_SEED,
+    workers: int = 1,
+    file_format: str = CSV_FORMAT,
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    force: bool = False,
+    file_num: int = 1,
+    file_size_mb: int = 0,
+):
+    """generate the tables of source into dest_dir.
+
+    Tables whose schema, rows, seed and output settings match the manifest in
+    dest_dir are reused, unless force is set. With file_num > 1 or
+    file_size_mb > 0 every table is split into part files, see TableFiles.
+    """
+    assert file_num <= 1 or file_size_mb <= 0, "set either file_num or file_size_mb"
     if not os.path.exists(dest_dir):
         os.makedirs(dest_dir)
+    if workers <= 0:
+        workers = os.cpu_count()
+    assert file_format in FILE_FORMATS
+    # columnar shards are kept as arrow ipc, they are cheap to read back
+    shard_format = CSV_FORMAT if file_format == CSV_FORMAT else ARROW_FORMAT
     db_infos = get_db_from_json(source)
-    tmp_rows = rows
+    manifest = {} if force else load_manifest(dest_dir)
+    # (table file, columns, shard num, cache key, rows per file) in the same
+    # order as the shard tasks
+    outputs = []
+    tasks = []
     for db_name in db_infos:
         schema_info = db_infos.get(db_name)
         assert "table_info" in schema_info
@@ -173,15 +1058,67 @@ def create_mock_data(source: dict, rows: int, dest_dir: str):
         for table_name in tables:
             table = tables.get(table_name)
             assert "columns" in table
-            columns = table.get("columns")
-            if "row_num" in table:
-                tmp_rows = table.get("row_num")
-            create_csv(
+            tmp_rows = table.get("row_num", rows)
+            columns = resolve_columns(
+                db_name, table_name, table.get("columns"), tmp_rows
+            )
+            file_path = os.path.join(dest_dir, f"{db_name}_{table_name}.{file_format}")
+            cache_key = table_cache_key(
+                db_name,
                 table_name,
                 columns,
                 tmp_rows,
-                os.path.join(dest_dir, f"{db_name}_{table_name}.csv"),
+                seed,
+                file_format,
+                row_group_size,
+                file_num,
+                file_size_mb,
             )
+            if is_cached(manifest, os.path.basename(file_path), cache_key, dest_dir):
+                print(f"{file_path}: unchanged, skip")
+                continue
+            shards = split_shards(tmp_rows)
+            rows_per_file = math.ceil(tmp_rows / file_num) if file_num > 1 else 0
+            outputs.append((file_path, columns, len(shards), cache_key, rows_per_file))
+            for i, (start, shard_rows) in enumerate(shards):
+                seed_seq = shard_seed(seed, db_name, table_name, i)
+                tasks.append(
+                    (
+                        columns,
+                        start,
+                        shard_rows,
+                        seed_seq,
+                        f"{file_path}.part{i}",
+                        shard_format,
+                        BATCH_SIZE,
+                    )
+                )
+    results = run_tasks(create_shard, tasks, workers)
+    for file_path, columns, shard_num, cache_key, rows_per_file in outputs:
+        summaries = [ColumnSummary() for _ in columns]
+        table_files = TableFiles(
+            file_path,
+            columns,
+            file_format,
+            row_group_size,
+            rows_per_file,
+            file_size_mb * 1024 * 1024,
+        )
+        file_paths = merge_shards(
+            shard_paths(results, shard_num, summaries), table_files
+        )
+        summary_path = f"{os.path.splitext(file_path)[0]}.summary.json"
+        write_summary(
+            summary_path,
+            columns,
+            summaries,
+            summaries[0].row_num if summaries else 0,
+        )
+        manifest[os.path.basename(file_path)] = cache_entry(
+            cache_key, dest_dir, file_paths + [summary_path]
+        )
+        save_manifest(dest_dir, manifest)
+        print(f"{file_path}: create {shard_num} shards in {len(file_paths)} files")
 
 
 def parse_json(source_file: str):
@@ -224,8 +1161,63 @@ if __name__ == "__main__":
         default="testdata/db.json",
     )
     parser.add_argument("--rows", "-r", type=int, help="rows of table", default=600)
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="random seed, same seed gives byte-identical data",
+        default=DEFAULT_SEED,
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        help="processes used to generate data, 0 means one per cpu",
+        default=1,
+    )
+    parser.add_argument(
+        "--format",
+        "-f",
+        type=str,
+        choices=FILE_FORMATS,
+        help="output file format",
+        default=CSV_FORMAT,
+    )
+    parser.add_argument(
+        "--row_group_size",
+        type=int,
+        help="rows per parquet row group or arrow record batch",
+        default=DEFAULT_ROW_GROUP_SIZE,
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="regenerate all tables even if they are unchanged",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        help="split every table into this many part files",
+        default=1,
+    )
+    parser.add_argument(
+        "--file_size_mb",
+        type=int,
+        help="split every table into part files of about this size",
+        default=0,
+    )
     args = vars(parser.parse_args())
     source = args["source"]
     rows = args["rows"]
     data_dest = args["dest_data"]
-    create_mock_data(source, rows, data_dest)
+    create_mock_data(
+        source,
+        rows,
+        data_dest,
+        args["seed"],
+        args["workers"],
+        args["format"],
+        args["row_group_size"],
+        args["force"],
+        args["files"],
+        args["file_size_mb"],
+    )
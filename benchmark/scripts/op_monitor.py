@@ -0,0 +1,307 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from get_op import NODE_EVENT, SpanBuilder
+
+# ops listed in the terminal table
+TABLE_OPS = 20
+
+
+class LogFollower:
+    """Yields the complete lines appended to a log, like tail -F.
+
+    The engine's rotating sink renames the full log and starts a new file
+    under the same name, so when the inode changes or the file shrinks the
+    rest of the old file is drained and the new one is read from the start."""
+
+    def __init__(self, file_path: str, from_start: bool = False):
+        self.file_path = file_path
+        self.f = None
+        self.rest = b""
+        self._open(from_start)
+
+    def _open(self, from_start: bool):
+        try:
+            self.f = open(self.file_path, "rb")
+        except FileNotFoundError:
+            self.f = None
+            return
+        if not from_start:
+            self.f.seek(0, os.SEEK_END)
+
+    def _rotated(self):
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return False
+        if self.f is None:
+            return True
+        return (
+            stat.st_ino != os.fstat(self.f.fileno()).st_ino
+            or stat.st_size < self.f.tell()
+        )
+
+    def read_lines(self):
+        lines = []
+        if self.f is not None:
+            lines += self._read()
+        if self._rotated():
+            if self.f is not None:
+                lines += self._read()
+                self.f.close()
+            self.rest = b""
+            self._open(from_start=True)
+            if self.f is not None:
+                lines += self._read()
+        return lines
+
+    def _read(self):
+        data = self.f.read()
+        if not data:
+            return []
+        data = self.rest + data
+        lines = data.split(b"\n")
+        self.rest = lines.pop()
+        return lines
+
+
+class OpStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def add(self, duration_ms: float):
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.last_ms = duration_ms
+
+    def to_dict(self, op: str):
+        return {
+            "op": op,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3),
+            "max_ms": round(self.max_ms, 3),
+            "last_ms": round(self.last_ms, 3),
+        }
+
+
+class OpMonitor:
+    """Running per-op statistics and the nodes currently executing."""
+
+    def __init__(self, party: str, tz_offset_hours: float, alert_ms: float = 0):
+        self.builder = SpanBuilder(party, tz_offset_hours)
+        self.alert_ms = alert_ms
+        self.alerted = set()
+        self.ops = {}
+        self.lines = 0
+        self.spans = 0
+        self.lock = threading.Lock()
+
+    def feed(self, lines: list):
+        with self.lock:
+            for line in lines:
+                self.lines += 1
+                m = NODE_EVENT.match(line)
+                if m is None:
+                    continue
+                span = self.builder.feed(m)
+                if span is None:
+                    continue
+                self.spans += 1
+                self.ops.setdefault(span.op, OpStats()).add(span.duration_ms)
+                self.alerted.discard((span.session, span.node))
+
+    def running(self, now: float):
+        result = []
+        for (session, node), (start_s, op, pipeline, batch) in list(
+            self.builder.running.items()
+        ):
+            result.append(
+                {
+                    "session": session,
+                    "node": node.decode(),
+                    "op": op,
+                    "pipeline": pipeline,
+                    "batch": batch,
+                    "elapsed_ms": round(max(now - start_s, 0) * 1000, 3),
+                }
+            )
+        return sorted(result, key=lambda r: -r["elapsed_ms"])
+
+    def snapshot(self):
+        now = time.time()
+        with self.lock:
+            ops = [stats.to_dict(op) for op, stats in self.ops.items()]
+            snapshot = {
+                "party": self.builder.party,
+                "updated_at": now,
+                "lines": self.lines,
+                "spans": self.spans,
+                "running": self.running(now),
+                "ops": sorted(ops, key=lambda r: -r["total_ms"]),
+            }
+        return snapshot
+
+    def slow_nodes(self):
+        # every node is reported once, when it first runs longer than alert_ms
+        if not self.alert_ms:
+            return []
+        slow = []
+        for node in self.snapshot()["running"]:
+            key = (node["session"], node["node"].encode())
+            if node["elapsed_ms"] >= self.alert_ms and key not in self.alerted:
+                self.alerted.add(key)
+                slow.append(node)
+        return slow
+
+
+def render_table(snapshot: dict):
+    out = [
+        f"party {snapshot['party'] or '-'}  lines {snapshot['lines']}  "
+        f"finished nodes {snapshot['spans']}  "
+        f"{time.strftime('%H:%M:%S', time.localtime(snapshot['updated_at']))}",
+        "",
+        "running:",
+    ]
+    for node in snapshot["running"]:
+        out.append(
+            "  {session} {node} op({op}) pipeline({pipeline}) batch({batch}) "
+            "{elapsed_ms:.0f}ms".format(**node)
+        )
+    if not snapshot["running"]:
+        out.append("  -")
+    out += [
+        "",
+        f"{'op':<24}{'count':>8}{'total_ms':>14}{'mean_ms':>12}{'max_ms':>12}{'last_ms':>12}",
+    ]
+    for op in snapshot["ops"][:TABLE_OPS]:
+        out.append(
+            "{op:<24}{count:>8}{total_ms:>14.0f}{mean_ms:>12.1f}"
+            "{max_ms:>12.1f}{last_ms:>12.1f}".format(**op)
+        )
+    return "\n".join(out)
+
+
+def serve(monitor: OpMonitor, port: int):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(monitor.snapshot()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"serving op stats on http://0.0.0.0:{port}/", file=sys.stderr)
+    return server
+
+
+def stdin_lines(monitor: OpMonitor):
+    # e.g. docker exec engine tail -F -n +1 /logs/scqlengine.log | op_monitor.py -
+    for line in sys.stdin.buffer:
+        monitor.feed([line.rstrip(b"\n")])
+
+
+def main(args):
+    monitor = OpMonitor(args.party, args.tz_offset_hours, args.alert_ms)
+    if args.http_port:
+        serve(monitor, args.http_port)
+    reader = follower = None
+    if args.log == "-":
+        reader = threading.Thread(target=stdin_lines, args=(monitor,), daemon=True)
+        reader.start()
+    else:
+        follower = LogFollower(args.log, args.from_start)
+    try:
+        while True:
+            # stdin is done once the reader thread ends, the last lines it
+            # fed are still drawn before leaving
+            done = reader is not None and not reader.is_alive()
+            if follower is not None:
+                monitor.feed(follower.read_lines())
+            for node in monitor.slow_nodes():
+                print(
+                    "slow node {session} {node} op({op}) running for "
+                    "{elapsed_ms:.0f}ms".format(**node),
+                    file=sys.stderr,
+                )
+            if not args.quiet:
+                # clear the screen and redraw the table in place
+                sys.stdout.write("\033[H\033[2J" + render_table(monitor.snapshot()))
+                sys.stdout.write("\n")
+                sys.stdout.flush()
+            if done:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="follow an engine log and show running op statistics"
+    )
+    parser.add_argument(
+        "log",
+        type=str,
+        help="scqlengine.log path, or - to read lines from stdin until it ends",
+    )
+    parser.add_argument(
+        "--from_start",
+        action="store_true",
+        help="read the existing log first instead of starting at its end",
+    )
+    parser.add_argument(
+        "--interval", type=float, help="seconds between refreshes", default=1
+    )
+    parser.add_argument(
+        "--http_port",
+        type=int,
+        help="serve the statistics as json on this port",
+        default=0,
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="do not draw the terminal table"
+    )
+    parser.add_argument(
+        "--alert_ms",
+        type=float,
+        help="warn on stderr when a node runs longer than this",
+        default=0,
+    )
+    parser.add_argument("--party", type=str, help="party name to show", default="")
+    parser.add_argument(
+        "--tz_offset_hours",
+        type=float,
+        help="hours the log timestamps are ahead of UTC",
+        default=0,
+    )
+    main(parser.parse_args())
@@ -0,0 +1,283 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from critical_path import load_spans, parse_input
+from trace_export import find_stats
+
+# resources that add up over time and are split between the ops running
+# while they were sampled
+TOTALS = ["cpu_s", "tx_bytes", "rx_bytes"]
+# the time of a party covered by no op, e.g. between queries
+IDLE = "(idle)"
+
+
+def load_stats(files: list):
+    """Sample intervals of a party from its docker stats csv files.
+
+    Every row covers the time since the previous row of the same file, the
+    first row of a file is dropped since its cpu and network values are
+    counted from the start of the container."""
+    frames = []
+    for file_path in files:
+        df = pd.read_csv(file_path)
+        # the docker stats have whole second timestamps and every row holds
+        # about one second of traffic, rows of the same second are merged
+        # into one; cgroup samples have millisecond timestamps
+        df = df.groupby("timestamp", sort=True).agg(
+            cpu_usage=("cpu_usage", "mean"),
+            mem_usage=("mem_usage", "last"),
+            network_tx=("network_tx", "sum"),
+            network_rx=("network_rx", "sum"),
+        )
+        df = df.reset_index()
+        df["begin_s"] = df["timestamp"].shift(1)
+        df = df.iloc[1:]
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(
+            columns=["begin_s", "end_s", "mem_mb"] + TOTALS, dtype=float
+        )
+    df = pd.concat(frames, ignore_index=True)
+    stats = pd.DataFrame(
+        {
+            "begin_s": df["begin_s"].astype(float),
+            "end_s": df["timestamp"].astype(float),
+            "mem_mb": df["mem_usage"].astype(float),
+            "cpu_s": df["cpu_usage"] / 100 * (df["timestamp"] - df["begin_s"]),
+            # network columns are b/s over the time since the previous sample
+            "tx_bytes": df["network_tx"] / 8 * (df["timestamp"] - df["begin_s"]),
+            "rx_bytes": df["network_rx"] / 8 * (df["timestamp"] - df["begin_s"]),
+        }
+    )
+    return stats.sort_values("end_s", ignore_index=True)
+
+
+def attribute(spans: pd.DataFrame, stats: pd.DataFrame):
+    """Adds the resources used during every span.
+
+    A sample is split by how much of its interval each span overlaps. When
+    concurrent sessions overlap the same interval by more than its length,
+    the shares are scaled down so that nothing is counted twice. Memory is
+    read from the samples at the span's ends and the peak in between."""
+    start = spans["start_s"].to_numpy(dtype=float)
+    end = np.maximum(spans["end_s"].to_numpy(dtype=float), start)
+    begin_s = stats["begin_s"].to_numpy()
+    end_s = stats["end_s"].to_numpy()
+    length = end_s - begin_s
+    # intervals [first, last) of the samples every span overlaps
+    first = np.searchsorted(end_s, start, side="right")
+    last = np.searchsorted(begin_s, end, side="left")
+
+    counts = np.maximum(last - first, 0)
+    span_idx = np.repeat(np.arange(len(spans)), counts)
+    offsets = np.cumsum(counts) - counts
+    sample_idx = first[span_idx] + np.arange(len(span_idx)) - offsets[span_idx]
+    overlap = np.minimum(end[span_idx], end_s[sample_idx]) - np.maximum(
+        start[span_idx], begin_s[sample_idx]
+    )
+    overlap = np.clip(overlap, 0, None)
+    covered = np.zeros(len(stats))
+    np.add.at(covered, sample_idx, overlap)
+    share = overlap / np.maximum(np.maximum(covered, length)[sample_idx], 1e-9)
+
+    result = spans.copy()
+    for column in TOTALS:
+        values = np.zeros(len(spans))
+        np.add.at(values, span_idx, share * stats[column].to_numpy()[sample_idx])
+        result[column] = values
+
+    mem = stats["mem_mb"].to_numpy()
+    mem_start = np.interp(start, end_s, mem)
+    mem_end = np.interp(end, end_s, mem)
+    peak = np.maximum(mem_start, mem_end)
+    np.maximum.at(peak, span_idx, mem[sample_idx])
+    result["mem_start_mb"] = mem_start
+    result["mem_delta_mb"] = mem_end - mem_start
+    result["mem_peak_mb"] = peak
+
+    idle = {column: stats[column].sum() - result[column].sum() for column in TOTALS}
+    return result, idle
+
+
+def op_runs(spans: pd.DataFrame):
+    """Groups consecutive nodes of the same op type in a session into runs,
+    e.g. the shuffles t_35..t_39, summed over streaming batches."""
+    spans = spans.sort_values(["party", "session", "start_s"])
+    changed = (
+        (spans["op"] != spans["op"].shift())
+        | (spans["session"] != spans["session"].shift())
+        | (spans["party"] != spans["party"].shift())
+        | (spans["batch"] != spans["batch"].shift())
+    )
+    spans = spans.assign(run=changed.cumsum())
+    runs = spans.groupby("run", sort=False).agg(
+        party=("party", "first"),
+        query=("query", "first"),
+        op=("op", "first"),
+        first_node=("node", "first"),
+        last_node=("node", "last"),
+        nodes=("node", "size"),
+        duration_ms=("duration_ms", "sum"),
+        mem_peak_mb=("mem_peak_mb", "max"),
+        **{column: (column, "sum") for column in TOTALS},
+    )
+    runs = runs.groupby(
+        ["party", "query", "op", "first_node", "last_node"], sort=False
+    ).agg(
+        batches=("nodes", "size"),
+        nodes=("nodes", "sum"),
+        duration_ms=("duration_ms", "sum"),
+        mem_peak_mb=("mem_peak_mb", "max"),
+        **{column: (column, "sum") for column in TOTALS},
+    )
+    return runs.reset_index()
+
+
+def add_shares(table: pd.DataFrame, party_totals: pd.DataFrame):
+    totals = party_totals.loc[table["party"]].reset_index(drop=True)
+    table = table.reset_index(drop=True)
+    table["net_bytes"] = table["tx_bytes"] + table["rx_bytes"]
+    table["cpu_share"] = table["cpu_s"] / totals["cpu_s"].replace(0, np.nan)
+    table["net_share"] = table["net_bytes"] / totals["net_bytes"].replace(0, np.nan)
+    return table
+
+
+def run_name(run):
+    if run.first_node == run.last_node:
+        return f"{run.op} {run.first_node}"
+    return f"{run.op} {run.first_node}..{run.last_node}"
+
+
+def main(
+    inputs: dict,
+    stats_dir: str,
+    output_dir: str,
+    top: int = 20,
+    tz_offset_hours: float = 0,
+):
+    frames = []
+    idle_rows = []
+    for party, path in inputs.items():
+        spans = pd.DataFrame(load_spans(party, path, tz_offset_hours))
+        stats = load_stats(find_stats(stats_dir, party))
+        if spans.empty or stats.empty:
+            print(f"skip {party}: no spans or docker stats found")
+            continue
+        spans, idle = attribute(spans, stats)
+        frames.append(spans)
+        idle_rows.append({"party": party, "op": IDLE, **idle})
+    if not frames:
+        return
+    spans = pd.concat(frames, ignore_index=True)
+    idle = pd.DataFrame(idle_rows)
+
+    party_totals = pd.concat([spans[["party"] + TOTALS], idle[["party"] + TOTALS]])
+    party_totals = party_totals.groupby("party").sum()
+    party_totals["net_bytes"] = party_totals["tx_bytes"] + party_totals["rx_bytes"]
+
+    op_types = spans.groupby(["party", "op"]).agg(
+        count=("node", "size"),
+        duration_ms=("duration_ms", "sum"),
+        mem_delta_mb=("mem_delta_mb", "sum"),
+        mem_peak_mb=("mem_peak_mb", "max"),
+        **{column: (column, "sum") for column in TOTALS},
+    )
+    op_types = pd.concat([op_types.reset_index(), idle], ignore_index=True)
+    op_types["count"] = op_types["count"].astype("Int64")
+    op_types = add_shares(op_types, party_totals).sort_values(
+        ["party", "net_bytes"], ascending=[True, False]
+    )
+    runs = add_shares(op_runs(spans), party_totals).sort_values(
+        "net_share", ascending=False
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    columns = [
+        "party",
+        "query",
+        "session",
+        "node",
+        "op",
+        "pipeline",
+        "batch",
+        "start_s",
+        "end_s",
+        "duration_ms",
+        "mem_start_mb",
+        "mem_delta_mb",
+        "mem_peak_mb",
+    ] + TOTALS
+    spans[columns].to_csv(
+        os.path.join(output_dir, "op_resources.csv"), index=False, float_format="%.3f"
+    )
+    runs.to_csv(
+        os.path.join(output_dir, "op_resource_ranking.csv"),
+        index=False,
+        float_format="%.4f",
+    )
+    op_types.to_csv(
+        os.path.join(output_dir, "op_type_resources.csv"),
+        index=False,
+        float_format="%.4f",
+    )
+    for run in runs.head(top).itertuples():
+        print(
+            f"query_{run.query} {run_name(run)}: {run.net_share:.0%} of "
+            f"{run.party}'s network bytes ({run.net_bytes / 1e6:.1f}MB), "
+            f"{run.cpu_share:.0%} of its cpu time ({run.cpu_s:.1f}s)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="attribute cpu, memory and network usage of every party to ops"
+    )
+    parser.add_argument(
+        "inputs",
+        type=parse_input,
+        nargs="+",
+        help="party=path of a span table (.parquet/.arrow) or scqlengine.log",
+    )
+    parser.add_argument(
+        "--stats_dir",
+        type=str,
+        help="benchmark output dir holding query_*/ docker stats csv files",
+        required=True,
+    )
+    parser.add_argument(
+        "--output_dir", "-o", type=str, help="dir of the csv reports", default="."
+    )
+    parser.add_argument(
+        "--top", type=int, help="op runs printed, by network share", default=20
+    )
+    parser.add_argument(
+        "--tz_offset_hours",
+        type=float,
+        help="hours the log timestamps are ahead of UTC, only used for .log inputs",
+        default=0,
+    )
+    args = parser.parse_args()
+    main(
+        dict(args.inputs),
+        args.stats_dir,
+        args.output_dir,
+        args.top,
+        args.tz_offset_hours,
+    )
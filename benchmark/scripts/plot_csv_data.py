@@ -12,118 +12,317 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import sys
+import argparse
+import glob
+import html
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# never open a window, figures are only written to files
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from op_resources import load_stats
+
+# (title, y label, [(column, color, label)])
+METRICS = [
+    ("cpu", "cpu %", [("cpu_usage", "tab:blue", None)]),
+    ("mem", "mem MB", [("mem_usage", "tab:blue", None)]),
+    (
+        "network",
+        "network b/s",
+        [("network_tx", "tab:blue", "tx"), ("network_rx", "tab:red", "rx")],
+    ),
+]
+
+plt.rcParams["svg.fonttype"] = "none"
 
 
 def get_subdir(dir):
-    return [name for name in os.listdir(dir) if os.path.isdir(os.path.join(dir, name))]
-
-
-def plot_cpu(op_csv_path, docker_csv_path, output_path):
-    df1 = pd.read_csv(docker_csv_path)
-    df2 = pd.read_csv(op_csv_path)
-
-    df1.set_index("running_time_s", inplace=True)
-
-    plt.figure(figsize=(10, 6))
-    plt.plot(df1.index, df1["cpu_usage"], marker="o", linestyle="-", color="b")
-    zeros = [0 for _ in range(len(df2))]
-    plt.scatter(df2["running_time_s"], zeros, color="r", marker="*", label="op")
-    for i, row in df2.iterrows():
-        plt.text(
-            row["running_time_s"],
-            0,
-            str(row["op"]),
-            fontsize=9,
-            ha="right",
-            rotation=45,
+    def order(name):
+        # query_2 before query_10
+        return [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", name)]
+
+    return sorted(
+        (name for name in os.listdir(dir) if os.path.isdir(os.path.join(dir, name))),
+        key=order,
+    )
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int):
+    """Largest-Triangle-Three-Buckets downsampling, keeps the peaks and the
+    shape of a long series with at most max_points points."""
+    n = len(x)
+    if max_points < 3 or n <= max_points:
+        return x, y
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    keep = np.empty(max_points, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # the next bucket is represented by its average point
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
         )
-    plt.title("cpu over Time")
-    plt.xlabel("running time sec")
-    plt.ylabel("cpu")
-    plt.grid(True)
-    plt.xticks(rotation=45)
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
 
-    plt.savefig(output_path)
-    print(f"save to {output_path}")
-    plt.show()
-
-
-def plot_mem(op_csv_path, docker_csv_path, output_path):
-    df1 = pd.read_csv(docker_csv_path)
-    df2 = pd.read_csv(op_csv_path)
-
-    df1.set_index("running_time_s", inplace=True)
-
-    plt.figure(figsize=(10, 6))
-    plt.plot(df1.index, df1["mem_usage"], marker="o", linestyle="-", color="b")
-    zeros = [0 for _ in range(len(df2))]
-    plt.scatter(df2["running_time_s"], zeros, color="r", marker="*", label="op")
-    for i, row in df2.iterrows():
-        plt.text(
-            row["running_time_s"],
-            0,
-            str(row["op"]),
-            fontsize=9,
-            ha="right",
-            rotation=45,
+
+def op_bands(ops: pd.DataFrame, max_bands: int):
+    """Collapses op spans into at most about max_bands shaded bands. A band
+    starts every 1/max_bands of the time range and is named after the op
+    that ran longest in it."""
+    if ops.empty:
+        return []
+    ops = ops.sort_values("running_time_s")
+    start = ops["running_time_s"].to_numpy(dtype=float)
+    end = start + ops["duration_ms"].to_numpy(dtype=float) / 1000
+    names = ops["op"].astype(str).to_numpy()
+    durations = ops["duration_ms"].to_numpy(dtype=float)
+    min_width = max((end.max() - start.min()) / max_bands, 1e-9)
+    bands = []
+    first = 0
+    for i in range(1, len(start) + 1):
+        if i < len(start) and start[i] - start[first] < min_width:
+            continue
+        longest = first + int(np.argmax(durations[first:i]))
+        bands.append(
+            {
+                "start": start[first],
+                "end": max(end[first:i].max(), start[first]),
+                "op": names[longest],
+                "ops": i - first,
+            }
         )
-    plt.title("mem over Time")
-    plt.xlabel("running time sec")
-    plt.ylabel("mem MB")
-    plt.grid(True)
-    plt.xticks(rotation=45)
+        first = i
+    return bands
 
-    plt.savefig(output_path)
-    print(f"save to {output_path}")
-    plt.show()
 
+def draw_bands(ax, bands: list, label: bool):
+    span = ax.get_xlim()[1] - ax.get_xlim()[0]
+    for i, band in enumerate(bands):
+        ax.axvspan(
+            band["start"],
+            band["end"],
+            color="tab:orange" if i % 2 else "tab:green",
+            alpha=0.15,
+            linewidth=0,
+        )
+        # only name bands wide enough to hold a label
+        if label and band["end"] - band["start"] > span / 80:
+            text = (
+                band["op"] if band["ops"] == 1 else f"{band['op']} +{band['ops'] - 1}"
+            )
+            ax.text(
+                (band["start"] + band["end"]) / 2,
+                1,
+                text,
+                transform=ax.get_xaxis_transform(),
+                fontsize=7,
+                ha="center",
+                va="top",
+                rotation=90,
+                clip_on=True,
+            )
 
-def plot_net(op_csv_path, docker_csv_path, output_path):
-    df1 = pd.read_csv(docker_csv_path)
-    df2 = pd.read_csv(op_csv_path)
-    df1.set_index("running_time_s", inplace=True)
-    plt.figure(figsize=(10, 6))
-    plt.plot(
-        df1.index, df1["network_tx"], marker="o", linestyle="-", color="b", label="tx"
-    )
-    plt.plot(
-        df1.index, df1["network_rx"], marker="o", linestyle="--", color="b", label="rx"
+
+def summarize(
+    party: str, stats: pd.DataFrame, intervals: pd.DataFrame, ops: pd.DataFrame
+):
+    summary = {"party": party, "samples": len(stats), "ops": len(ops)}
+    if not stats.empty:
+        summary["peak_cpu"] = stats["cpu_usage"].max()
+        summary["peak_mem_mb"] = stats["mem_usage"].max()
+        summary["tx_mb"] = intervals["tx_bytes"].sum() / 1e6
+        summary["rx_mb"] = intervals["rx_bytes"].sum() / 1e6
+        summary["duration_s"] = stats["running_time_s"].max()
+    if not ops.empty:
+        summary["op_ms"] = ops["duration_ms"].sum()
+    return summary
+
+
+def plot_query(
+    query_dir: str,
+    parties: list,
+    op_file: str,
+    stats_file: str,
+    max_points: int,
+    max_bands: int,
+):
+    """Draws every metric of every party of one query into query_dir/report.svg,
+    one column per party, and returns the per party summaries."""
+    data = []
+    for party in parties:
+        op_paths = glob.glob(os.path.join(query_dir, op_file.format(party=party)))
+        stats_paths = glob.glob(os.path.join(query_dir, stats_file.format(party=party)))
+        if not op_paths or not stats_paths:
+            continue
+        stats = pd.read_csv(stats_paths[0]).sort_values("running_time_s")
+        ops = pd.read_csv(op_paths[0], skipinitialspace=True)
+        # the network columns are b/s, load_stats turns them into bytes
+        data.append((party, stats, load_stats(stats_paths[:1]), ops))
+    if not data:
+        return query_dir, None, []
+
+    fig, axes = plt.subplots(
+        len(METRICS),
+        len(data),
+        figsize=(6 * len(data), 2.8 * len(METRICS)),
+        sharex="col",
+        squeeze=False,
     )
-    zeros = [0 for _ in range(len(df2))]
-    plt.scatter(df2["running_time_s"], zeros, color="r", marker="*", label="op")
-    for i, row in df2.iterrows():
-        plt.text(
-            row["running_time_s"],
-            0,
-            str(row["op"]),
-            fontsize=9,
-            ha="right",
-            rotation=45,
+    summaries = []
+    for col, (party, stats, intervals, ops) in enumerate(data):
+        bands = op_bands(ops, max_bands)
+        x = stats["running_time_s"].to_numpy(dtype=float)
+        for row, (title, ylabel, columns) in enumerate(METRICS):
+            ax = axes[row][col]
+            for column, color, label in columns:
+                px, py = lttb(x, stats[column].to_numpy(dtype=float), max_points)
+                ax.plot(px, py, color=color, linewidth=1, label=label)
+            if any(label for _, _, label in columns):
+                ax.legend(loc="upper right", fontsize=8)
+            draw_bands(ax, bands, label=row == 0)
+            ax.set_title(f"{party} {title}" if row else f"{party}\n{title}")
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3)
+        axes[-1][col].set_xlabel("running time sec")
+        summaries.append(summarize(party, stats, intervals, ops))
+    fig.tight_layout()
+    output_path = os.path.join(query_dir, "report.svg")
+    fig.savefig(output_path)
+    plt.close(fig)
+    return query_dir, output_path, summaries
+
+
+SUMMARY_COLUMNS = [
+    ("party", "party", "{}"),
+    ("duration_s", "duration s", "{:.0f}"),
+    ("ops", "ops", "{}"),
+    ("op_ms", "op time ms", "{:.0f}"),
+    ("peak_cpu", "peak cpu %", "{:.1f}"),
+    ("peak_mem_mb", "peak mem MB", "{:.0f}"),
+    ("tx_mb", "tx MB", "{:.1f}"),
+    ("rx_mb", "rx MB", "{:.1f}"),
+]
+
+
+def summary_table(summaries: list):
+    out = ["<table>", "<tr>"]
+    out += [f"<th>{html.escape(title)}</th>" for _, title, _ in SUMMARY_COLUMNS]
+    out.append("</tr>")
+    for summary in summaries:
+        out.append("<tr>")
+        for key, _, fmt in SUMMARY_COLUMNS:
+            value = summary.get(key)
+            text = "-" if value is None else fmt.format(value)
+            out.append(f"<td>{html.escape(text)}</td>")
+        out.append("</tr>")
+    out.append("</table>")
+    return "".join(out)
+
+
+def write_report(output_path: str, results: list):
+    # the svg files are inlined so the report is a single self-contained file
+    with open(output_path, "w") as f:
+        f.write(
+            "<!DOCTYPE html>\n<html><head><meta charset='utf-8'>"
+            "<title>benchmark report</title><style>"
+            "body{font-family:sans-serif}table{border-collapse:collapse}"
+            "td,th{border:1px solid #ccc;padding:2px 8px;text-align:right}"
+            "svg{max-width:100%;height:auto}"
+            "</style></head><body>\n<h1>benchmark report</h1>\n"
         )
-    plt.legend()
-    plt.title("network")
-    plt.xlabel("running time sec")
-    plt.ylabel("network b/s")
-    plt.grid(True)
-    plt.xticks(rotation=45)
-    plt.savefig(output_path)
+        for query_dir, svg_path, summaries in results:
+            name = os.path.basename(query_dir)
+            f.write(f"<h2 id='{html.escape(name)}'>{html.escape(name)}</h2>\n")
+            f.write(summary_table(summaries) + "\n")
+            with open(svg_path) as svg:
+                content = svg.read()
+            f.write(content[content.index("<svg") :] + "\n")
+        f.write("</body></html>\n")
+
+
+def main(args):
+    query_dirs = [os.path.join(args.logs_dir, d) for d in get_subdir(args.logs_dir)]
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as pool:
+        futures = [
+            pool.submit(
+                plot_query,
+                query_dir,
+                args.parties,
+                args.op_file,
+                args.stats_file,
+                args.max_points,
+                args.max_bands,
+            )
+            for query_dir in query_dirs
+        ]
+        results = [future.result() for future in futures]
+    results = [r for r in results if r[1] is not None]
+    for _, svg_path, _ in results:
+        print(f"save to {svg_path}")
+    if not results:
+        print("no op and docker stats csv files found")
+        return
+    output_path = args.output or os.path.join(args.logs_dir, "report.html")
+    write_report(output_path, results)
     print(f"save to {output_path}")
-    plt.show()
 
 
 if __name__ == "__main__":
-    for i, subdir in enumerate(get_subdir(sys.argv[1])):
-        subdir_path = os.path.join(sys.argv[1], subdir)
-        write_dir = os.path.join(subdir_path, sys.argv[2])
-        if not os.path.exists(write_dir):
-            os.makedirs(write_dir)
-        op_path = os.path.join(subdir_path, sys.argv[3])
-        docker_path = os.path.join(subdir_path, sys.argv[4])
-        if os.path.exists(op_path) and os.path.exists(docker_path):
-            plot_cpu(op_path, docker_path, os.path.join(write_dir, "cpu.png"))
-            plot_mem(op_path, docker_path, os.path.join(write_dir, "mem.png"))
-            plot_net(op_path, docker_path, os.path.join(write_dir, "net.png"))
+    parser = argparse.ArgumentParser(
+        description="plot docker stats and op spans of every query into one html report"
+    )
+    parser.add_argument(
+        "logs_dir", type=str, help="benchmark output dir holding query_*/ csv files"
+    )
+    parser.add_argument(
+        "--parties",
+        type=str,
+        nargs="+",
+        help="parties to plot side by side",
+        default=["alice", "bob", "carol"],
+    )
+    parser.add_argument(
+        "--op_file",
+        type=str,
+        help="op csv file name in every query dir",
+        default="{party}_op.csv",
+    )
+    parser.add_argument(
+        "--stats_file",
+        type=str,
+        help="docker stats csv file name (or glob) in every query dir",
+        default="*engine-{party}-*.csv",
+    )
+    parser.add_argument(
+        "--output", "-o", type=str, help="default logs_dir/report.html", default=None
+    )
+    parser.add_argument(
+        "--max_points",
+        type=int,
+        help="downsample longer series to this many points",
+        default=1000,
+    )
+    parser.add_argument(
+        "--max_bands",
+        type=int,
+        help="collapse the ops of a party into about this many bands",
+        default=40,
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, help="worker processes, default cpu count", default=0
+    )
+    main(parser.parse_args())
@@ -0,0 +1,388 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import csv
+import glob
+import json
+import os
+import pathlib
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from critical_path import load_spans
+from op_resources import load_stats
+
+CUR_PATH = pathlib.Path(__file__).parent.resolve()
+DEFAULT_DB = os.path.join(CUR_PATH, "..", "results", "results.db")
+PARTIES = ["alice", "bob", "carol"]
+PERCENTILES = [50, 95, 99]
+# op name under which the wall-clock time of a whole query is stored
+WALL = "(wall)"
+SECRET_KEYS = ("PASSWORD", "TOKEN", "SECRET")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    git_rev TEXT NOT NULL,
+    dirty INTEGER NOT NULL,
+    label TEXT,
+    params TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    run_id INTEGER NOT NULL,
+    query INTEGER NOT NULL,
+    repeat INTEGER NOT NULL,
+    session TEXT NOT NULL,
+    issuer TEXT,
+    sql TEXT,
+    wall_ms REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spans (
+    run_id INTEGER NOT NULL,
+    query INTEGER NOT NULL,
+    repeat INTEGER NOT NULL,
+    party TEXT NOT NULL,
+    node TEXT NOT NULL,
+    op TEXT NOT NULL,
+    pipeline INTEGER NOT NULL,
+    batch INTEGER NOT NULL,
+    duration_ms REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resources (
+    run_id INTEGER NOT NULL,
+    query INTEGER NOT NULL,
+    repeat INTEGER NOT NULL,
+    party TEXT NOT NULL,
+    cpu_peak REAL,
+    mem_peak_mb REAL,
+    net_tx_bytes INTEGER,
+    net_rx_bytes INTEGER
+);
+-- google benchmark results of the engine's micro benchmarks, see engine_bench.py
+CREATE TABLE IF NOT EXISTS micro (
+    run_id INTEGER NOT NULL,
+    target TEXT NOT NULL,
+    name TEXT NOT NULL,
+    repetition INTEGER NOT NULL,
+    iterations INTEGER NOT NULL,
+    real_time_ns REAL NOT NULL,
+    cpu_time_ns REAL NOT NULL,
+    counters TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS spans_run ON spans (run_id);
+CREATE INDEX IF NOT EXISTS micro_run ON micro (run_id);
+CREATE INDEX IF NOT EXISTS runs_rev ON runs (git_rev);
+"""
+
+
+def connect(db_path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def git_revision():
+    try:
+        rev = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=CUR_PATH, text=True
+        ).strip()
+        dirty = subprocess.check_output(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=CUR_PATH,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return rev, bool(dirty)
+
+
+def read_env(env_path: str):
+    params = {}
+    if not env_path or not os.path.exists(env_path):
+        return params
+    with open(env_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            if not any(secret in key for secret in SECRET_KEYS):
+                params[key.strip()] = value.strip()
+    return params
+
+
+def resource_usage(stats_dir: str, party: str):
+    # the stats hold cpu in percent, memory in MB and the network in b/s,
+    # load_stats turns the network columns into bytes
+    files = glob.glob(os.path.join(stats_dir, f"*engine-{party}-*.csv"))
+    if not files:
+        return None
+    cpu, mem = [], []
+    with open(files[0], newline="") as f:
+        for row in csv.DictReader(f):
+            cpu.append(float(row["cpu_usage"]))
+            mem.append(float(row["mem_usage"]))
+    intervals = load_stats(files[:1])
+    return (
+        max(cpu, default=None),
+        max(mem, default=None),
+        int(intervals["tx_bytes"].sum()),
+        int(intervals["rx_bytes"].sum()),
+    )
+
+
+def record(args):
+    with open(args.queries) as f:
+        queries = json.load(f)["queries"]
+    spans = []
+    for party in args.parties:
+        path = os.path.join(args.logs_dir, f"{party}_spans.parquet")
+        if os.path.exists(path):
+            spans += load_spans(party, path)
+    if not spans:
+        raise Exception(f"no span tables found in {args.logs_dir}")
+    # sessions are shared by all parties, the benchmark runs the queries in
+    # order and writes the stats of the n-th one to query_{n}, like get_op.py
+    # numbers it, which is query n % len(queries) of repeat n // len(queries)
+    sessions = defaultdict(list)
+    for span in spans:
+        sessions[span.session].append(span)
+    ordered = sorted(sessions, key=lambda s: min(x.start_s for x in sessions[s]))
+    rev, dirty = git_revision()
+    rev = args.rev or rev
+    params = read_env(args.env)
+    params.update(dict(p.split("=", 1) for p in args.param))
+    conn = connect(args.db)
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (created_at, git_rev, dirty, label, params) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (time.time(), rev, int(dirty), args.label, json.dumps(params)),
+        )
+        run_id = cur.lastrowid
+        for index, session in enumerate(ordered):
+            query, repeat = index % len(queries), index // len(queries)
+            session_spans = sessions[session]
+            wall_ms = (
+                max(s.end_s for s in session_spans)
+                - min(s.start_s for s in session_spans)
+            ) * 1000
+            conn.execute(
+                "INSERT INTO queries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    query,
+                    repeat,
+                    session,
+                    queries[query].get("issuer"),
+                    queries[query].get("query"),
+                    wall_ms,
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        query,
+                        repeat,
+                        s.party,
+                        s.node,
+                        s.op,
+                        s.pipeline,
+                        s.batch,
+                        s.duration_ms,
+                    )
+                    for s in session_spans
+                ],
+            )
+            stats_dir = os.path.join(args.logs_dir, f"query_{index}")
+            for party in args.parties:
+                usage = resource_usage(stats_dir, party)
+                if usage is not None:
+                    conn.execute(
+                        "INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (run_id, query, repeat, party) + usage,
+                    )
+    print(
+        f"recorded run {run_id}: {len(ordered)} sessions at {rev[:12]}"
+        f"{' (dirty)' if dirty else ''}"
+    )
+
+
+def select_runs(conn, rev: str = None, run_id: int = None):
+    """Run ids of a revision (prefixes work) or a single run, default the
+    latest benchmark run. All runs of a revision are pooled as repeats."""
+    if run_id is not None:
+        return [run_id]
+    if rev is None:
+        row = conn.execute(
+            "SELECT git_rev FROM runs WHERE run_id IN (SELECT run_id FROM queries) "
+            "ORDER BY run_id DESC"
+        ).fetchone()
+        if row is None:
+            raise Exception("the result store is empty")
+        rev = row[0]
+    ids = [
+        r[0]
+        for r in conn.execute(
+            "SELECT run_id FROM runs WHERE git_rev LIKE ? || '%'", (rev,)
+        )
+    ]
+    if not ids:
+        raise Exception(f"no runs recorded for revision {rev}")
+    return ids
+
+
+def samples(conn, run_ids: list):
+    """{(query, party, op): [ms per repeat]}, an op's sample is the total time
+    of that op type in one execution of the query."""
+    marks = ",".join("?" * len(run_ids))
+    result = defaultdict(list)
+    for query, party, op, total in conn.execute(
+        f"SELECT query, party, op, SUM(duration_ms) FROM spans "
+        f"WHERE run_id IN ({marks}) GROUP BY run_id, query, repeat, party, op",
+        run_ids,
+    ):
+        result[(query, party, op)].append(total)
+    for query, wall_ms in conn.execute(
+        f"SELECT query, wall_ms FROM queries WHERE run_id IN ({marks})", run_ids
+    ):
+        result[(query, "", WALL)].append(wall_ms)
+    return result
+
+
+def percentiles(values: list):
+    return dict(zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+
+
+def report(args):
+    conn = connect(args.db)
+    run_ids = select_runs(conn, args.rev, args.run)
+    rows = []
+    for (query, party, op), values in sorted(samples(conn, run_ids).items()):
+        p = percentiles(values)
+        rows.append([query, party, op, len(values)] + [p[q] for q in PERCENTILES])
+    header = ["query", "party", "op", "n"] + [f"p{q}_ms" for q in PERCENTILES]
+    print(f"runs {run_ids}")
+    print(
+        f"{header[0]:>5} {header[1]:<8} {header[2]:<28} {header[3]:>4}"
+        + "".join(f"{h:>12}" for h in header[4:])
+    )
+    for row in rows:
+        print(
+            f"{row[0]:>5} {row[1]:<8} {row[2]:<28} {row[3]:>4}"
+            + "".join(f"{v:>12.1f}" for v in row[4:])
+        )
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+def compare(args):
+    # an empty prefix would match every run, the candidate's included
+    if not args.baseline:
+        raise Exception("--baseline must name a git revision")
+    conn = connect(args.db)
+    cand_ids = select_runs(conn, args.candidate, args.run)
+    base_ids = [i for i in select_runs(conn, args.baseline) if i not in cand_ids]
+    if not base_ids:
+        raise Exception(f"no baseline runs of {args.baseline} besides the candidate")
+    base = samples(conn, base_ids)
+    cand = samples(conn, cand_ids)
+    regressions = []
+    for key in sorted(base.keys() & cand.keys()):
+        base_ms = np.percentile(base[key], args.percentile)
+        cand_ms = np.percentile(cand[key], args.percentile)
+        delta = cand_ms - base_ms
+        if delta > args.min_ms and delta > base_ms * args.threshold:
+            regressions.append((key, base_ms, cand_ms))
+    for (query, party, op), base_ms, cand_ms in regressions:
+        print(
+            f"REGRESSION query {query} {party or '-'} {op}: p{args.percentile} "
+            f"{base_ms:.1f}ms -> {cand_ms:.1f}ms (+{(cand_ms / base_ms - 1) * 100:.0f}%)"
+        )
+    print(
+        f"{len(regressions)} regression(s) in {len(base.keys() & cand.keys())} "
+        f"compared series, threshold {args.threshold * 100:.0f}% and {args.min_ms}ms"
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark result store")
+    parser.add_argument("--db", type=str, help="sqlite file", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="append the results in a logs dir")
+    rec.add_argument("--logs_dir", type=str, required=True)
+    rec.add_argument(
+        "--queries", type=str, help="query.json the benchmark ran", required=True
+    )
+    rec.add_argument("--env", type=str, help=".env stored as run params")
+    rec.add_argument(
+        "--param", type=str, action="append", default=[], help="extra key=value"
+    )
+    rec.add_argument("--label", type=str, default=None)
+    rec.add_argument(
+        "--rev", type=str, help="override the detected git revision", default=None
+    )
+    rec.add_argument("--parties", type=str, nargs="+", default=PARTIES)
+
+    rep = sub.add_parser("report", help="p50/p95/p99 per query and op type")
+    rep.add_argument("--rev", type=str, help="git revision or prefix", default=None)
+    rep.add_argument("--run", type=int, help="a single run id", default=None)
+    rep.add_argument("--csv", type=str, help="also write the table here")
+
+    cmp = sub.add_parser(
+        "compare", help="exit non-zero if an op regressed against a baseline"
+    )
+    cmp.add_argument(
+        "--baseline", type=str, help="baseline git revision", required=True
+    )
+    cmp.add_argument(
+        "--candidate", type=str, help="candidate revision, default the latest run"
+    )
+    cmp.add_argument("--run", type=int, help="a single candidate run id")
+    cmp.add_argument(
+        "--threshold",
+        type=float,
+        help="relative slowdown that counts as a regression",
+        default=0.1,
+    )
+    cmp.add_argument(
+        "--min_ms",
+        type=float,
+        help="ignore slowdowns smaller than this, they are noise",
+        default=50,
+    )
+    cmp.add_argument("--percentile", type=float, default=50)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args)
+    elif args.command == "report":
+        report(args)
+    else:
+        sys.exit(compare(args))
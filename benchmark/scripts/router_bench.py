@@ -0,0 +1,313 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+DS_ID = "router_bench"
+HISTOGRAM = "mock_router_request_duration_seconds"
+
+
+def make_rules(count: int, dbs: int):
+    """count rules over dbs databases and a table routed by each: mostly exact
+    rules, every 4th a prefix rule and every 16th a glob"""
+    rules = []
+    tables = []
+    for i in range(count):
+        db = f"bench_db_{i % dbs}"
+        if i % 16 == 15:
+            table, hit = f"t_{i}_[0-9]*", f"t_{i}_7x"
+        elif i % 4 == 3:
+            table, hit = f"t_{i}_*", f"t_{i}_2024"
+        else:
+            table = hit = f"t_{i}"
+        rules.append({"db": db, "table": table, "datasource_id": DS_ID})
+        tables.append({"db": db, "table": hit})
+    return rules, tables
+
+
+def base_url(url: str):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def seed(url: str, rules: list):
+    """adds the rules and a default rule to the rule set of the mock router,
+    the rules of earlier runs are kept"""
+    conf = {
+        "datasources": [
+            {"id": DS_ID, "name": DS_ID, "kind": "mysql", "connection_str": "none"}
+        ],
+        "rules": rules + [{"db": "*", "table": "*", "datasource_id": DS_ID}],
+    }
+    req = urllib.request.Request(
+        base_url(url) + "/datasource/import",
+        data=json.dumps(conf).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    start = time.time()
+    with urllib.request.urlopen(req) as res:
+        result = json.load(res)
+    print(f"seeded {result['rules']} rules in {time.time() - start:.2f}s")
+
+
+def scrape(url: str):
+    """(le, cumulative count) of the mock router's latency histogram of the
+    path of url, None if it has no /metrics"""
+    try:
+        with urllib.request.urlopen(base_url(url) + "/metrics") as res:
+            text = res.read().decode()
+    except urllib.error.URLError:
+        return None
+    pattern = re.compile(
+        HISTOGRAM
+        + r'_bucket\{path="'
+        + re.escape(urlsplit(url).path)
+        + r'",le="([^"]+)"\} (\d+)'
+    )
+    return [(float(le), int(n)) for le, n in pattern.findall(text)]
+
+
+def bucket_quantiles(before: list, after: list, quantiles: list):
+    """upper bound of the histogram bucket holding each quantile of the
+    requests counted between two scrapes"""
+    les = [le for le, _ in after]
+    counts = np.array([n for _, n in after]) - np.array(
+        [n for _, n in before] if before else 0
+    )
+    if len(counts) == 0 or counts[-1] == 0:
+        return None
+    return [les[int(np.searchsorted(counts, q * counts[-1]))] for q in quantiles]
+
+
+async def post(reader, writer, request: bytes):
+    """sends one request on a keep-alive connection, returns the status and
+    body of the response"""
+    writer.write(request)
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by the router")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        name = name.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"transfer-encoding":
+            raise Exception("chunked responses are not supported")
+    body = await reader.readexactly(length) if length else b""
+    return status, body
+
+
+async def worker(url: str, bodies: list, warmup_end: float, deadline: float):
+    parts = urlsplit(url)
+    head = (
+        f"POST {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        "Content-Type: application/json\r\n"
+    )
+    latencies = []
+    ok = errors = 0
+    i = random.randrange(len(bodies))
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    while time.time() < deadline:
+        body = bodies[i % len(bodies)]
+        i += 1
+        request = (head + f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+        measured = time.time() >= warmup_end
+        start = time.perf_counter()
+        try:
+            status, payload = await post(reader, writer, request)
+            success = status == 200 and json.loads(payload)["status"]["code"] == 0
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer.close()
+            reader, writer = await asyncio.open_connection(
+                parts.hostname, parts.port or 80
+            )
+            success = False
+        end = time.perf_counter()
+        if not measured:
+            continue
+        latencies.append(end - start)
+        ok += success
+        errors += not success
+    writer.close()
+    return latencies, ok, errors
+
+
+async def run_workers(
+    url: str, bodies: list, concurrency: int, warmup_end: float, duration: float
+):
+    deadline = warmup_end + duration
+    results = await asyncio.gather(
+        *[worker(url, bodies, warmup_end, deadline) for _ in range(concurrency)]
+    )
+    latencies = np.concatenate([np.array(r[0]) for r in results])
+    return latencies, sum(r[1] for r in results), sum(r[2] for r in results)
+
+
+def run_process(
+    url: str, bodies: list, concurrency: int, warmup_end: float, duration: float
+):
+    return asyncio.run(run_workers(url, bodies, concurrency, warmup_end, duration))
+
+
+def make_bodies(tables: list, args):
+    """request bodies of random tables, built before the run so that the
+    client spends its time on sending them"""
+    rng = random.Random(args.seed)
+    return [
+        json.dumps(
+            {"tables": rng.sample(tables, min(args.tables, len(tables)))}
+        ).encode()
+        for _ in range(args.bodies)
+    ]
+
+
+def main(args):
+    rules, tables = make_rules(max(args.rules, args.table_count), args.dbs)
+    if args.rules:
+        seed(args.url, rules[: args.rules])
+    bodies = make_bodies(tables[: args.table_count], args)
+
+    # every process drives its share of the connections
+    shares = [
+        args.concurrency // args.processes + (i < args.concurrency % args.processes)
+        for i in range(args.processes)
+    ]
+    shares = [n for n in shares if n > 0]
+    # all processes measure from the same wall clock time, the histogram is
+    # scraped then so that it doesn't count the warmup requests
+    warmup_end = time.time() + args.warmup
+    with ProcessPoolExecutor(len(shares)) as pool:
+        futures = [
+            pool.submit(run_process, args.url, bodies, n, warmup_end, args.duration)
+            for n in shares
+        ]
+        time.sleep(max(warmup_end - time.time(), 0))
+        before = scrape(args.url)
+        results = [future.result() for future in futures]
+    after = scrape(args.url)
+
+    latencies = np.concatenate([r[0] for r in results]) * 1e3
+    ok = sum(r[1] for r in results)
+    errors = sum(r[2] for r in results)
+    count = ok + errors
+    if count == 0:
+        raise Exception("no request finished, check the url")
+    percentiles = np.percentile(latencies, [50, 99, 99.9])
+    result = {
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "processes": len(shares),
+        "rules": args.rules,
+        "table_count": args.table_count,
+        "tables_per_request": args.tables,
+        "duration_s": args.duration,
+        "requests": count,
+        "errors": errors,
+        "requests_per_s": count / args.duration,
+        "tables_per_s": count * args.tables / args.duration,
+        "p50_ms": percentiles[0],
+        "p99_ms": percentiles[1],
+        "p999_ms": percentiles[2],
+        "max_ms": latencies.max(),
+    }
+    print(
+        f"{count} requests ({errors} errors) in {args.duration}s: "
+        f"{result['requests_per_s']:.0f} req/s, {result['tables_per_s']:.0f} tables/s"
+    )
+    print(
+        f"latency ms p50 {percentiles[0]:.3f}  p99 {percentiles[1]:.3f}  "
+        f"p999 {percentiles[2]:.3f}  max {result['max_ms']:.3f}"
+    )
+    if after:
+        server = bucket_quantiles(before, after, [0.5, 0.99, 0.999])
+        if server:
+            result["server_le_ms"] = [le * 1e3 for le in server]
+            print(
+                "server side, upper bound of the histogram bucket ms: "
+                + "  ".join(
+                    f"{name} {le * 1e3:g}"
+                    for name, le in zip(["p50", "p99", "p999"], server)
+                )
+            )
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="load test a datasource router like mock_router_server.py"
+    )
+    parser.add_argument(
+        "--url",
+        type=str,
+        help="route endpoint, as the engine's --http_router_endpoint",
+        default="http://127.0.0.1:8000/datasource/route",
+    )
+    parser.add_argument(
+        "--concurrency", "-c", type=int, help="open connections", default=16
+    )
+    parser.add_argument(
+        "--processes",
+        "-p",
+        type=int,
+        help="client processes sharing the connections",
+        default=1,
+    )
+    parser.add_argument(
+        "--rules",
+        type=int,
+        help="rules added to the mock router before the run, 0 to route "
+        "bench_db_*.t_* tables with the rules the router has",
+        default=10000,
+    )
+    parser.add_argument(
+        "--dbs", type=int, help="databases the rules are spread over", default=10
+    )
+    parser.add_argument(
+        "--table_count",
+        type=int,
+        help="distinct bench_db_*.t_* tables the requests pick from, the ones "
+        "beyond --rules are routed by the rules the router has",
+        default=10000,
+    )
+    parser.add_argument("--tables", type=int, help="tables per request", default=4)
+    parser.add_argument(
+        "--bodies", type=int, help="distinct request bodies", default=1000
+    )
+    parser.add_argument("--duration", type=float, help="seconds measured", default=10)
+    parser.add_argument(
+        "--warmup", type=float, help="seconds run before measuring", default=1
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", "-o", type=str, help="append the result as a json line"
+    )
+    main(parser.parse_args())
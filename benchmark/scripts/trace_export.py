@@ -0,0 +1,247 @@
+# Copyright 2025 Ant Group Co., Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import csv
+import glob
+import gzip
+import json
+import os
+from collections import defaultdict
+
+from critical_path import estimate_offsets, load_spans, parse_input
+
+# docker stats columns written by GetDockerStats in benchmark_test.go
+COUNTERS = {
+    "cpu_usage": ("cpu", "cpu_usage"),
+    "mem_usage": ("mem MB", "mem_usage"),
+    "network": ("network b/s", "network_tx", "network_rx"),
+    # only sampled from cgroups
+    "io": ("io B", "io_read", "io_write"),
+}
+
+
+def to_us(seconds: float):
+    return round(seconds * 1e6)
+
+
+class TraceWriter:
+    """Streams Chrome trace events (the JSON object format) to a file,
+    .gz paths are compressed. Load it in chrome://tracing or ui.perfetto.dev."""
+
+    def __init__(self, file_path: str):
+        if file_path.endswith(".gz"):
+            self.f = gzip.open(file_path, "wt")
+        else:
+            self.f = open(file_path, "w")
+        self.f.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+        self.first = True
+
+    def write(self, event: dict):
+        if not self.first:
+            self.f.write(",\n")
+        self.f.write(json.dumps(event, separators=(",", ":")))
+        self.first = False
+
+    def metadata(self, event: str, pid: int, tid: int = 0, **args):
+        self.write({"ph": "M", "name": event, "pid": pid, "tid": tid, "args": args})
+
+    def slice(
+        self, name: str, pid: int, tid: int, start_s: float, end_s: float, **args
+    ):
+        self.write(
+            {
+                "ph": "X",
+                "name": name,
+                "cat": args.pop("cat", "node"),
+                "pid": pid,
+                "tid": tid,
+                "ts": to_us(start_s),
+                "dur": max(to_us(end_s) - to_us(start_s), 0),
+                "args": args,
+            }
+        )
+
+    def counter(self, name: str, pid: int, ts_s: float, **values):
+        self.write(
+            {"ph": "C", "name": name, "pid": pid, "ts": to_us(ts_s), "args": values}
+        )
+
+    def close(self):
+        self.f.write("\n]}\n")
+        self.f.close()
+
+
+def write_session(writer: TraceWriter, pid: int, tid: int, spans: list):
+    # pipeline and batch slices enclose the nodes they ran, so trace viewers
+    # nest them as pipeline > batch > node on the session's track
+    batches = defaultdict(list)
+    for span in spans:
+        batches[(span.pipeline, span.batch)].append(span)
+    pipelines = defaultdict(list)
+    for (pipeline, batch), batch_spans in batches.items():
+        start_s = min(s.start_s for s in batch_spans)
+        end_s = max(s.end_s for s in batch_spans)
+        pipelines[pipeline].append((start_s, end_s))
+        if pipeline >= 0:
+            writer.slice(
+                f"batch {batch}",
+                pid,
+                tid,
+                start_s,
+                end_s,
+                cat="batch",
+                pipeline=pipeline,
+                batch=batch,
+                nodes=len(batch_spans),
+            )
+    for pipeline, ranges in pipelines.items():
+        if pipeline >= 0:
+            writer.slice(
+                f"pipeline {pipeline}",
+                pid,
+                tid,
+                min(r[0] for r in ranges),
+                max(r[1] for r in ranges),
+                cat="pipeline",
+                pipeline=pipeline,
+                batches=len(ranges),
+            )
+    for span in spans:
+        writer.slice(
+            f"{span.op} {span.node}",
+            pid,
+            tid,
+            span.start_s,
+            span.end_s,
+            node=span.node,
+            op=span.op,
+            pipeline=span.pipeline,
+            batch=span.batch,
+            cost_ms=span.cost_ms,
+            session=span.session,
+            query=span.query,
+        )
+
+
+def find_stats(stats_dir: str, party: str):
+    # GetDockerStats writes {stats_dir}/query_{i}/{container}.csv and the
+    # benchmark names containers like {project}-engine-{party}-1
+    return sorted(
+        glob.glob(os.path.join(stats_dir, "query_*", f"*engine-{party}-*.csv"))
+    )
+
+
+def write_stats(writer: TraceWriter, pid: int, file_path: str, offset: float):
+    with open(file_path, newline="") as f:
+        for row in csv.DictReader(f):
+            ts = float(row["timestamp"]) - offset
+            for name, (unit, *columns) in COUNTERS.items():
+                if all(c in row for c in columns):
+                    writer.counter(
+                        f"{name} ({unit})",
+                        pid,
+                        ts,
+                        **{c: float(row[c]) for c in columns},
+                    )
+
+
+def main(
+    inputs: dict,
+    output: str,
+    stats_dir: str = None,
+    align: bool = False,
+    tz_offset_hours: float = 0,
+):
+    spans_by_party = {
+        party: load_spans(party, path, tz_offset_hours)
+        for party, path in inputs.items()
+    }
+    offsets = (
+        estimate_offsets(spans_by_party, next(iter(inputs)))
+        if align
+        else {party: 0 for party in inputs}
+    )
+    writer = TraceWriter(output)
+    try:
+        for pid, (party, spans) in enumerate(spans_by_party.items(), start=1):
+            offset = offsets[party]
+            writer.metadata("process_name", pid, name=party)
+            writer.metadata("process_sort_index", pid, sort_index=pid)
+            sessions = defaultdict(list)
+            for span in spans:
+                sessions[(span.query, span.session)].append(
+                    span._replace(
+                        start_s=span.start_s - offset, end_s=span.end_s - offset
+                    )
+                )
+            # one thread track per session keeps concurrent queries apart
+            for tid, ((query, session), session_spans) in enumerate(
+                sorted(sessions.items()), start=1
+            ):
+                writer.metadata(
+                    "thread_name", pid, tid, name=f"query_{query} {session}"
+                )
+                writer.metadata("thread_sort_index", pid, tid, sort_index=tid)
+                write_session(writer, pid, tid, session_spans)
+            if stats_dir:
+                for file_path in find_stats(stats_dir, party):
+                    write_stats(writer, pid, file_path, offset)
+    finally:
+        writer.close()
+    print(f"save to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="export engine spans and docker stats as a chrome trace"
+    )
+    parser.add_argument(
+        "inputs",
+        type=parse_input,
+        nargs="+",
+        help="party=path of a span table (.parquet/.arrow) or scqlengine.log",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        help="trace file, .json or .json.gz",
+        default="trace.json",
+    )
+    parser.add_argument(
+        "--stats_dir",
+        type=str,
+        help="benchmark output dir holding query_*/ docker stats csv files",
+        default=None,
+    )
+    parser.add_argument(
+        "--align",
+        action="store_true",
+        help="shift every party by the clock offset estimated from shared nodes",
+    )
+    parser.add_argument(
+        "--tz_offset_hours",
+        type=float,
+        help="hours the log timestamps are ahead of UTC, only used for .log inputs",
+        default=0,
+    )
+    args = parser.parse_args()
+    main(
+        dict(args.inputs),
+        args.output,
+        args.stats_dir,
+        args.align,
+        args.tz_offset_hours,
+    )
@@ -137,6 +137,13 @@ static duckdb::unique_ptr<duckdb::TableRef> CSVTableReplacementScan(
   children.emplace_back(
       duckdb::make_uniq<duckdb::ConstantExpression>(duckdb::Value(data_path)));
 
+  if (csv_tbl->format() == csv::CsvTableConf::PARQUET) {
+    // parquet files are typed, scan them with the builtin parquet extension
+    table_function->function = duckdb::make_uniq<duckdb::FunctionExpression>(
+        "read_parquet", std::move(children));
+    return table_function;
+  }
+
   {
     std::vector<duckdb::Value> names;
     std::vector<duckdb::Value> types;
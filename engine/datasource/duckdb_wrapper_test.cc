@@ -14,6 +14,11 @@
 
 #include "engine/datasource/duckdb_wrapper.h"
 
+#include <unistd.h>
+
+#include <filesystem>
+#include <fstream>
+
 #include "butil/files/temp_file.h"
 #include "fmt/format.h"
 #include "gflags/gflags.h"
@@ -153,6 +158,78 @@ TEST_F(DuckdbWrapperTest, IgnoringColumnCase) {
   EXPECT_TRUE(ColumnEquals(*conn.context, *data_chunk, 0, {25, 30, 42, 18}));
 }
 
+TEST_F(DuckdbWrapperTest, ParquetTable) {
+  FLAGS_restricted_read_path = "./";
+  butil::TempFile parquet_file("parquet");
+  {
+    // convert the csv table to parquet with a plain duckdb instance
+    duckdb::DuckDB db(nullptr);
+    duckdb::Connection conn(db);
+    auto result = conn.Query(fmt::format(
+        "COPY (SELECT * FROM read_csv_auto('{}')) TO '{}' (FORMAT PARQUET)",
+        temp_file_->fname(), parquet_file.fname()));
+    ASSERT_FALSE(result->HasError()) << result->GetError();
+  }
+  csv::CsvdbConf csvdb_conf;
+  csvdb_conf.set_db_name("csvdb");
+  auto table = csvdb_conf.add_tables();
+  table->set_table_name("staff");
+  table->set_data_path(parquet_file.fname());
+  table->set_format(csv::CsvTableConf::PARQUET);
+
+  duckdb::DuckDB db = DuckDBWrapper::CreateDB(&csvdb_conf);
+  duckdb::Connection conn(db);
+
+  conn.BeginTransaction();
+  DuckDBWrapper::CreateCSVScanFunction(conn);
+  conn.Commit();
+
+  auto result = conn.Query("select age from csvdb.staff where income > 40000");
+  EXPECT_FALSE(result->HasError()) << result->GetError();
+  ASSERT_EQ(result->RowCount(), 3);
+  ASSERT_EQ(result->ColumnCount(), 1);
+  auto data_chunk = result->Fetch();
+
+  EXPECT_TRUE(ColumnEquals(*conn.context, *data_chunk, 0, {30, 42, 18}));
+}
+
+TEST_F(DuckdbWrapperTest, GlobDataPath) {
+  FLAGS_restricted_read_path = "./";
+  // a table split into part files, each with its own header
+  std::filesystem::path dir =
+      fmt::format("duckdb_wrapper_test_{}", ::getpid());
+  std::filesystem::create_directories(dir);
+  {
+    std::ofstream part0(dir / "part-00000.csv");
+    part0 << "id,age\n1,25\n2,30\n";
+    std::ofstream part1(dir / "part-00001.csv");
+    part1 << "id,age\n3,42\n";
+  }
+  csv::CsvdbConf csvdb_conf;
+  csvdb_conf.set_db_name("csvdb");
+  auto table = csvdb_conf.add_tables();
+  table->set_table_name("staff");
+  table->set_data_path((dir / "*.csv").string());
+  auto column = table->add_columns();
+  column->set_column_name("id");
+  column->set_column_type("string");
+
+  duckdb::DuckDB db = DuckDBWrapper::CreateDB(&csvdb_conf);
+  duckdb::Connection conn(db);
+
+  conn.BeginTransaction();
+  DuckDBWrapper::CreateCSVScanFunction(conn);
+  conn.Commit();
+
+  auto result = conn.Query("select id from csvdb.staff order by id");
+  EXPECT_FALSE(result->HasError()) << result->GetError();
+  ASSERT_EQ(result->RowCount(), 3);
+  auto data_chunk = result->Fetch();
+
+  EXPECT_TRUE(ColumnEquals(*conn.context, *data_chunk, 0, {"1", "2", "3"}));
+  std::filesystem::remove_all(dir);
+}
+
 TEST_F(DuckdbWrapperTest, DISABLED_ComplexQueryWithBigDataset) {
   // test with dataset download from kaggle:
   // https://www.kaggle.com/datasets/luiscorter/netflix-original-films-imdb-scores
@@ -14,15 +14,38 @@
 
 #include "engine/datasource/http_router.h"
 
+#include "absl/strings/numbers.h"
 #include "absl/strings/str_split.h"
+#include "absl/strings/strip.h"
 #include "brpc/channel.h"
 #include "google/protobuf/util/json_util.h"
 #include "yacl/base/exception.h"
 
 #include "engine/datasource/http_router.pb.h"
+#include "engine/util/prometheus_monitor.h"
 
 namespace scql::engine {
 
+namespace {
+
+// the router sends its rule set version as ETag, e.g. "42"
+int64_t ParseVersion(const std::string* etag) {
+  if (etag == nullptr) {
+    return -1;
+  }
+  absl::string_view value = *etag;
+  absl::ConsumePrefix(&value, "W/");
+  absl::ConsumePrefix(&value, "\"");
+  absl::ConsumeSuffix(&value, "\"");
+  int64_t version;
+  if (!absl::SimpleAtoi(value, &version) || version < 0) {
+    return -1;
+  }
+  return version;
+}
+
+}  // namespace
+
 HttpRouter::HttpRouter(const HttpRouterOptions& options) : options_(options) {
   if (options_.endpoint.empty()) {
     throw std::invalid_argument("endpoint field of options cannot be empty");
@@ -31,6 +54,113 @@ HttpRouter::HttpRouter(const HttpRouterOptions& options) : options_(options) {
 
 std::vector<DataSource> HttpRouter::Route(
     const std::vector<std::string>& table_refs) {
+  int64_t version = -1;
+  if (options_.cache_capacity == 0) {
+    return RequestRoute(table_refs, &version);
+  }
+
+  std::vector<DataSource> result(table_refs.size());
+  auto missed = LookupCache(table_refs, &result);
+  auto* monitor = util::PrometheusMonitor::GetInstance();
+  monitor->IncRouterCacheHit(table_refs.size() - missed.size());
+  monitor->IncRouterCacheMiss(missed.size());
+  if (missed.empty()) {
+    return result;
+  }
+
+  // only route the tables missed
+  std::vector<std::string> missed_refs;
+  missed_refs.reserve(missed.size());
+  for (size_t i : missed) {
+    missed_refs.push_back(table_refs[i]);
+  }
+  auto datasources = RequestRoute(missed_refs, &version);
+  for (size_t i = 0; i < missed.size(); i++) {
+    result[missed[i]].CopyFrom(datasources[i]);
+  }
+  if (!UpdateCache(missed_refs, datasources, version) ||
+      missed.size() == table_refs.size()) {
+    return result;
+  }
+
+  // the rule set changed, the routes served from the cache belong to the
+  // previous one
+  std::vector<size_t> hits;
+  std::vector<std::string> hit_refs;
+  for (size_t i = 0, j = 0; i < table_refs.size(); i++) {
+    if (j < missed.size() && missed[j] == i) {
+      j++;
+      continue;
+    }
+    hits.push_back(i);
+    hit_refs.push_back(table_refs[i]);
+  }
+  datasources = RequestRoute(hit_refs, &version);
+  for (size_t i = 0; i < hits.size(); i++) {
+    result[hits[i]].CopyFrom(datasources[i]);
+  }
+  UpdateCache(hit_refs, datasources, version);
+  return result;
+}
+
+std::vector<size_t> HttpRouter::LookupCache(
+    const std::vector<std::string>& table_refs,
+    std::vector<DataSource>* result) {
+  std::vector<size_t> missed;
+  auto now = std::chrono::steady_clock::now();
+  std::lock_guard<std::mutex> lock(mu_);
+  for (size_t i = 0; i < table_refs.size(); i++) {
+    auto iter = cache_.find(table_refs[i]);
+    if (iter == cache_.end()) {
+      missed.push_back(i);
+      continue;
+    }
+    auto entry = iter->second;
+    if (entry->expire_at <= now) {
+      lru_.erase(entry);
+      cache_.erase(iter);
+      missed.push_back(i);
+      continue;
+    }
+    lru_.splice(lru_.begin(), lru_, entry);
+    (*result)[i].CopyFrom(entry->datasource);
+  }
+  return missed;
+}
+
+bool HttpRouter::UpdateCache(const std::vector<std::string>& table_refs,
+                             const std::vector<DataSource>& datasources,
+                             int64_t version) {
+  auto expire_at = std::chrono::steady_clock::now() +
+                   std::chrono::milliseconds(options_.cache_ttl_ms);
+  std::lock_guard<std::mutex> lock(mu_);
+  bool changed = version >= 0 && version != version_;
+  if (changed) {
+    // rules changed, none of the cached routes can be trusted. A lower
+    // version is taken as a new rule set too, e.g. after the router lost its
+    // rules in a restart
+    lru_.clear();
+    cache_.clear();
+    version_ = version;
+  }
+  for (size_t i = 0; i < table_refs.size(); i++) {
+    auto iter = cache_.find(table_refs[i]);
+    if (iter != cache_.end()) {
+      lru_.erase(iter->second);
+      cache_.erase(iter);
+    }
+    lru_.push_front(CacheEntry{table_refs[i], datasources[i], expire_at});
+    cache_.emplace(table_refs[i], lru_.begin());
+    if (lru_.size() > options_.cache_capacity) {
+      cache_.erase(lru_.back().table_ref);
+      lru_.pop_back();
+    }
+  }
+  return changed;
+}
+
+std::vector<DataSource> HttpRouter::RequestRoute(
+    const std::vector<std::string>& table_refs, int64_t* version) {
   // 1. build request
   ::router::RouteRequest request;
 
@@ -108,6 +238,7 @@ std::vector<DataSource> HttpRouter::Route(
         "{}, but got {}",
         table_refs.size(), response.datasource_ids_size());
   }
+  *version = ParseVersion(cntl.http_response().GetHeader("ETag"));
 
   std::vector<DataSource> result(table_refs.size());
   for (size_t i = 0; i < table_refs.size(); i++) {
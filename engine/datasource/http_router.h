@@ -14,6 +14,12 @@
 
 #pragma once
 
+#include <chrono>
+#include <list>
+#include <mutex>
+
+#include "absl/container/flat_hash_map.h"
+
 #include "engine/datasource/router.h"
 
 namespace scql::engine {
@@ -22,6 +28,11 @@ struct HttpRouterOptions {
   std::string endpoint;
   int32_t timeout_ms = 3000;
   int max_retry = 3;
+  // max number of `$db.$table` routes cached, 0 disables the cache
+  size_t cache_capacity = 0;
+  // a cached route is used for at most this long, however the router's rule
+  // set version changes
+  int64_t cache_ttl_ms = 60 * 1000;
 };
 
 class HttpRouter final : public Router {
@@ -32,7 +43,34 @@ class HttpRouter final : public Router {
       const std::vector<std::string>& table_refs) override;
 
  private:
+  struct CacheEntry {
+    std::string table_ref;
+    DataSource datasource;
+    std::chrono::steady_clock::time_point expire_at;
+  };
+
+  // fills the cached routes into result, returns the indexes of table_refs
+  // not cached
+  std::vector<size_t> LookupCache(const std::vector<std::string>& table_refs,
+                                  std::vector<DataSource>* result);
+
+  // version is the rule set version the datasources are routed at, -1 if the
+  // router didn't send one. Returns true if the version differs from the one
+  // of the cached routes, which are dropped then
+  bool UpdateCache(const std::vector<std::string>& table_refs,
+                   const std::vector<DataSource>& datasources, int64_t version);
+
+  std::vector<DataSource> RequestRoute(
+      const std::vector<std::string>& table_refs, int64_t* version);
+
   const HttpRouterOptions options_;
+
+  std::mutex mu_;
+  // most recently used first
+  std::list<CacheEntry> lru_;
+  absl::flat_hash_map<std::string, std::list<CacheEntry>::iterator> cache_;
+  // rule set version of the cached routes
+  int64_t version_ = -1;
 };
 
 }  // namespace scql::engine
\ No newline at end of file
@@ -0,0 +1,180 @@
+// Copyright 2025 Ant Group Co., Ltd.
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//   http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "engine/datasource/http_router.h"
+
+#include <atomic>
+#include <thread>
+
+#include "brpc/server.h"
+#include "gtest/gtest.h"
+#include "yacl/base/exception.h"
+
+#include "engine/datasource/http_router.pb.h"
+
+namespace scql::engine {
+
+// routes every table to the datasource of its db, named after the db and the
+// rule set version, and sends the version as ETag like mock_router_server.py
+class FakeRouterService : public ::router::RouterService {
+ public:
+  void Route(::google::protobuf::RpcController* controller,
+             const ::router::RouteRequest* request,
+             ::router::RouteResponse* response,
+             ::google::protobuf::Closure* done) override {
+    brpc::ClosureGuard done_guard(done);
+    auto* cntl = static_cast<brpc::Controller*>(controller);
+    cntl->http_response().SetHeader("ETag",
+                                    fmt::format("\"{}\"", version.load()));
+    requests++;
+    tables_routed += request->tables_size();
+    for (const auto& table : request->tables()) {
+      response->add_datasource_ids(table.db());
+      auto& ds = (*response->mutable_datasources())[table.db()];
+      ds.set_id(table.db());
+      ds.set_name(fmt::format("{}@{}", table.db(), version.load()));
+      ds.set_kind(DataSourceKind::MYSQL);
+    }
+  }
+
+  std::atomic<int64_t> version{0};
+  std::atomic<int> requests{0};
+  std::atomic<int> tables_routed{0};
+};
+
+class HttpRouterTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    ASSERT_EQ(0, server_.AddService(&service_, brpc::SERVER_DOESNT_OWN_SERVICE,
+                                    "/datasource/route => Route"));
+    brpc::ServerOptions options;
+    ASSERT_EQ(0, server_.Start("127.0.0.1:0", &options));
+  }
+
+  void TearDown() override {
+    server_.Stop(0);
+    server_.Join();
+  }
+
+  HttpRouterOptions Options(size_t cache_capacity, int64_t cache_ttl_ms) {
+    HttpRouterOptions options;
+    options.endpoint =
+        fmt::format("http://{}/datasource/route",
+                    butil::endpoint2str(server_.listen_address()).c_str());
+    options.cache_capacity = cache_capacity;
+    options.cache_ttl_ms = cache_ttl_ms;
+    return options;
+  }
+
+  FakeRouterService service_;
+  brpc::Server server_;
+};
+
+TEST_F(HttpRouterTest, NoCache) {
+  HttpRouter router(Options(0, 60000));
+
+  for (int i = 0; i < 2; i++) {
+    auto result = router.Route({"db1.t1", "db2.t2"});
+    ASSERT_EQ(2, result.size());
+    EXPECT_EQ("db1", result[0].id());
+    EXPECT_EQ("db2", result[1].id());
+    EXPECT_EQ(DataSourceKind::MYSQL, result[1].kind());
+  }
+  EXPECT_EQ(2, service_.requests);
+}
+
+TEST_F(HttpRouterTest, CachesRoutes) {
+  HttpRouter router(Options(16, 60000));
+
+  auto result = router.Route({"db1.t1", "db2.t2"});
+  EXPECT_EQ(1, service_.requests);
+
+  // all cached
+  result = router.Route({"db2.t2", "db1.t1"});
+  ASSERT_EQ(2, result.size());
+  EXPECT_EQ("db2", result[0].id());
+  EXPECT_EQ("db1", result[1].id());
+  EXPECT_EQ(1, service_.requests);
+
+  // only the table missed is sent
+  result = router.Route({"db1.t1", "db3.t3"});
+  ASSERT_EQ(2, result.size());
+  EXPECT_EQ("db1", result[0].id());
+  EXPECT_EQ("db3", result[1].id());
+  EXPECT_EQ(2, service_.requests);
+  EXPECT_EQ(3, service_.tables_routed);
+
+  EXPECT_THROW(router.Route({"invalid"}), yacl::Exception);
+}
+
+TEST_F(HttpRouterTest, NewVersionDropsCache) {
+  HttpRouter router(Options(16, 60000));
+
+  router.Route({"db1.t1", "db2.t2"});
+  service_.version = 1;
+  // db3.t3 brings the new version, so db1.t1 found in the cache is routed
+  // again instead of served from the old rule set
+  auto result = router.Route({"db1.t1", "db3.t3"});
+  ASSERT_EQ(2, result.size());
+  EXPECT_EQ("db1@1", result[0].name());
+  EXPECT_EQ("db3@1", result[1].name());
+  EXPECT_EQ(3, service_.requests);
+  EXPECT_EQ(4, service_.tables_routed);
+
+  // db2.t2 was dropped with the old rule set
+  result = router.Route({"db2.t2", "db3.t3"});
+  EXPECT_EQ("db2@1", result[0].name());
+  EXPECT_EQ(4, service_.requests);
+  EXPECT_EQ(5, service_.tables_routed);
+}
+
+TEST_F(HttpRouterTest, LowerVersionIsNewRuleSet) {
+  HttpRouter router(Options(16, 60000));
+
+  service_.version = 5;
+  router.Route({"db1.t1", "db2.t2"});
+  // e.g. the router restarted without its rules
+  service_.version = 0;
+  auto result = router.Route({"db1.t1", "db3.t3"});
+  EXPECT_EQ("db1@0", result[0].name());
+  EXPECT_EQ(3, service_.requests);
+
+  // the routes of version 0 are cached
+  result = router.Route({"db1.t1", "db3.t3"});
+  EXPECT_EQ("db1@0", result[0].name());
+  EXPECT_EQ("db3@0", result[1].name());
+  EXPECT_EQ(3, service_.requests);
+}
+
+TEST_F(HttpRouterTest, ExpiresAndEvicts) {
+  HttpRouter router(Options(2, 50));
+
+  router.Route({"db1.t1"});
+  std::this_thread::sleep_for(std::chrono::milliseconds(100));
+  router.Route({"db1.t1"});
+  EXPECT_EQ(2, service_.requests);
+
+  HttpRouter lru_router(Options(2, 60000));
+  lru_router.Route({"db1.t1", "db2.t2"});
+  // db1.t1 is used more recently than db2.t2, which is evicted by db3.t3
+  lru_router.Route({"db1.t1"});
+  lru_router.Route({"db3.t3"});
+  EXPECT_EQ(4, service_.requests);
+  lru_router.Route({"db1.t1", "db3.t3"});
+  EXPECT_EQ(4, service_.requests);
+  lru_router.Route({"db2.t2"});
+  EXPECT_EQ(5, service_.requests);
+}
+
+}  // namespace scql::engine
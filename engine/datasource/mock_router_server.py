@@ -13,10 +13,23 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from fastapi import FastAPI
+import argparse
+import bisect
+import csv
+import fnmatch
+import heapq
+import io
+import os
+import re
+import sqlite3
+import time
+import urllib.request
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
 from jinja2 import Template
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 
 
 class Table(BaseModel):
@@ -25,7 +38,7 @@ class Table(BaseModel):
 
 
 class RouteRequest(BaseModel):
-    header: dict[str, str] | None
+    header: dict[str, str] | None = None
     tables: list[Table]
 
 
@@ -35,7 +48,7 @@ class Status(BaseModel):
 
 
 class DataSource(BaseModel):
-    id: str | None
+    id: str | None = None
     name: str
     kind: str
     connection_str: str
@@ -43,8 +56,28 @@ class DataSource(BaseModel):
 
 class RouteResponse(BaseModel):
     status: Status = Status()
-    datasource_ids: list[str]
-    datasources: dict[str, DataSource]
+    datasource_ids: list[str] = []
+    datasources: dict[str, DataSource] = {}
+
+
+class BatchRouteRequest(BaseModel):
+    requests: list[RouteRequest]
+
+
+class BatchRouteResult(BaseModel):
+    status: Status = Status()
+    # empty if status is not ok
+    datasource_ids: list[str] = []
+
+
+class BatchRouteResponse(BaseModel):
+    status: Status = Status()
+    # rule set version the tables were routed at, also sent as ETag
+    version: int
+    # one per request, in order
+    responses: list[BatchRouteResult] = []
+    # datasources of all responses
+    datasources: dict[str, DataSource] = {}
 
 
 class RouteRule(BaseModel):
@@ -53,89 +86,636 @@ class RouteRule(BaseModel):
     datasource_id: str
 
 
-class MyStore:
+class RouteConf(BaseModel):
+    """datasources and rules, in the format of the engine's embed_router_conf"""
+
+    datasources: list[DataSource] = []
+    rules: list[RouteRule] = []
+
+
+GLOB_CHARS = re.compile(r"[*?\[]")
+# joins the db and the table in the keys of RuleIndex, a "." would let
+# route("a.b", "c") match the rule `a.*`
+KEY_SEPARATOR = "\0"
+
+
+def literal_prefix(pattern):
+    m = GLOB_CHARS.search(pattern)
+    return pattern[: m.start()] if m else pattern
+
+
+class Glob:
+    """fnmatch pattern compiled on its first use, which keeps loading many
+    rules fast"""
+
+    __slots__ = ("pattern", "regex")
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.regex = None
+
+    def match(self, name):
+        if self.regex is None:
+            self.regex = re.compile(fnmatch.translate(self.pattern))
+        return self.regex.match(name) is not None
+
+
+def glob_matcher(pattern):
+    prefix = literal_prefix(pattern)
+    if prefix == pattern:
+        return pattern.__eq__
+    if prefix == pattern[:-1] and pattern[-1] == "*":
+        return lambda name: name.startswith(prefix)
+    return Glob(pattern).match
+
+
+class PrefixTrie:
+    """Radix tree over strings. Edges hold whole substrings, so it needs about
+    two nodes per key and a lookup walks each character of the key once."""
+
+    class Node:
+        __slots__ = ("edges", "value")
+
+        def __init__(self, value=None):
+            # first character of the edge label -> (label, child)
+            self.edges = dict()
+            self.value = value
+
+    def __init__(self):
+        self.root = PrefixTrie.Node()
+
+    def _node(self, key):
+        node, pos = self.root, 0
+        while pos < len(key):
+            edge = node.edges.get(key[pos])
+            if edge is None:
+                child = PrefixTrie.Node()
+                node.edges[key[pos]] = (key[pos:], child)
+                return child
+            label, child = edge
+            common = len(label)
+            if not key.startswith(label, pos):
+                common = len(os.path.commonprefix([label, key[pos:]]))
+                # split the edge at the end of the common part
+                mid = PrefixTrie.Node()
+                mid.edges[label[common]] = (label[common:], child)
+                node.edges[key[pos]] = (label[:common], mid)
+                child = mid
+            node, pos = child, pos + common
+        return node
+
+    def set(self, key, value):
+        self._node(key).value = value
+
+    def setdefault(self, key, default):
+        node = self._node(key)
+        if node.value is None:
+            node.value = default
+        return node.value
+
+    def prefixes(self, key):
+        """(length, value) of all keys that are prefixes of key, longest first"""
+        node, pos = self.root, 0
+        values = [(0, node.value)] if node.value is not None else []
+        while pos < len(key):
+            edge = node.edges.get(key[pos])
+            if edge is None or not key.startswith(edge[0], pos):
+                break
+            pos += len(edge[0])
+            node = edge[1]
+            if node.value is not None:
+                values.append((pos, node.value))
+        values.reverse()
+        return values
+
+
+class GlobRules:
+    """Glob rules sharing a literal part. Rules with a literal table, like
+    `*.orders`, are kept by their table, so a lookup only matches the ones of
+    its own table besides the rules with a wildcard table."""
+
+    __slots__ = ("globs", "byTable")
+
+    def __init__(self):
+        # (dbName, tableName) -> (db matcher, table matcher, datasource ID,
+        # order of the rule)
+        self.globs = dict()
+        self.byTable = dict()
+
+    def add(self, dbName, tableName, dsID, order):
+        rules = self.globs
+        if literal_prefix(tableName) == tableName:
+            rules = self.byTable.setdefault(tableName, dict())
+        # adding a rule again replaces its datasource but keeps its order
+        old = rules.get((dbName, tableName))
+        rules[(dbName, tableName)] = (
+            glob_matcher(dbName),
+            glob_matcher(tableName),
+            dsID,
+            order if old is None else old[3],
+        )
+
+    def candidates(self, tableName):
+        """rules that may match tableName, in the order they were added"""
+        tableRules = self.byTable.get(tableName)
+        if not tableRules:
+            return self.globs.values()
+        if not self.globs:
+            return tableRules.values()
+        return heapq.merge(
+            self.globs.values(), tableRules.values(), key=lambda rule: rule[3]
+        )
+
+
+class RuleIndex:
+    """Compiled route rules, a table is routed by
+
+    1. the exact rule `db.table`
+    2. otherwise the most specific wildcard rule, the one with the longest
+       literal part before its first wildcard. Prefix rules, whose only
+       wildcard is a trailing `*` like `db.tbl_2024_*` or `db.*`, go before
+       glob rules (`*`, `?` and `[...]` like fnmatch) with a literal part of
+       the same length, and glob rules of the same literal part are tried in
+       the order they were added
+    3. the default rule `*.*`
+
+    Exact and prefix rules are found in O(key length) however many rules
+    there are, only glob rules sharing their literal part with the key are
+    matched against it, see GlobRules. Keys join the db and the table with
+    KEY_SEPARATOR, which can't be part of a name."""
+
     def __init__(self):
+        self.exact = dict()
+        self.prefixRules = PrefixTrie()
+        # literal part -> GlobRules
+        self.globRules = PrefixTrie()
+        self.globNum = 0
+        self.defaultDataSourceID = None
+
+    def add(self, dbName, tableName, dsID):
+        if dbName == "*" and tableName == "*":
+            self.defaultDataSourceID = dsID
+            return
+        dbPrefix = literal_prefix(dbName)
+        tablePrefix = literal_prefix(tableName)
+        if dbPrefix == dbName and tablePrefix == tableName:
+            self.exact[(dbName, tableName)] = dsID
+        elif dbPrefix == dbName and tablePrefix + "*" == tableName:
+            self.prefixRules.set(dbName + KEY_SEPARATOR + tablePrefix, dsID)
+        else:
+            prefix = dbPrefix
+            if dbPrefix == dbName:
+                prefix = dbName + KEY_SEPARATOR + tablePrefix
+            globs = self.globRules.setdefault(prefix, GlobRules())
+            globs.add(dbName, tableName, dsID, self.globNum)
+            self.globNum += 1
+
+    def route(self, dbName, tableName):
+        dsID = self.exact.get((dbName, tableName))
+        if dsID is not None:
+            return dsID
+        key = dbName + KEY_SEPARATOR + tableName
+        prefixes = self.prefixRules.prefixes(key)
+        prefixLength, prefixDsID = prefixes[0] if prefixes else (-1, None)
+        for length, globs in self.globRules.prefixes(key):
+            if length <= prefixLength:
+                break
+            for matchDb, matchTable, dsID, _ in globs.candidates(tableName):
+                if matchDb(dbName) and matchTable(tableName):
+                    return dsID
+        if prefixDsID is not None:
+            return prefixDsID
+        return self.defaultDataSourceID
+
+
+class SqliteBackend:
+    """Keeps datasources and rules in a sqlite file, in WAL mode so that a
+    reader like the sqlite3 shell doesn't block the server"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS datasources ("
+                "id TEXT PRIMARY KEY, name TEXT, kind TEXT, connection_str TEXT)"
+            )
+            # rules are routed in rowid order, which an upsert keeps
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS route_rules ("
+                "db TEXT, tbl TEXT, datasource_id TEXT, PRIMARY KEY (db, tbl))"
+            )
+            # the rule set version, which keeps increasing across restarts
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)"
+            )
+
+    def load(self):
+        datasources = [
+            DataSource(id=id, name=name, kind=kind, connection_str=connStr)
+            for id, name, kind, connStr in self.conn.execute(
+                "SELECT id, name, kind, connection_str FROM datasources"
+            )
+        ]
+        rules = self.conn.execute(
+            "SELECT db, tbl, datasource_id FROM route_rules ORDER BY rowid"
+        ).fetchall()
+        row = self.conn.execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()
+        return datasources, rules, row[0] if row else 0
+
+    def save(self, datasources, rules, version):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,)
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO datasources VALUES (?, ?, ?, ?)",
+                [(ds.id, ds.name, ds.kind, ds.connection_str) for ds in datasources],
+            )
+            self.conn.executemany(
+                "INSERT INTO route_rules VALUES (?, ?, ?) ON CONFLICT (db, tbl) "
+                "DO UPDATE SET datasource_id = excluded.datasource_id",
+                rules,
+            )
+
+
+class MyStore:
+    def __init__(self, backend=None):
         self.ds = dict()
-        # mapping `dbName.tableName` to datasource ID
+        # datasources as sent in responses, serialized once
+        self.dsJson = dict()
+        # mapping (dbName, tableName) patterns to datasource IDs, as added
         self.routeRules = dict()
-        # mapping `dbName.*` to datasource IDs
-        self.databaseRouteRules = dict()
-        self.defaultDataSourceID = ""
+        self.index = RuleIndex()
         self.idx = 0
+        # version of the rule set, bumped by every datasource or rule change
+        self.version = 0
+        # (dbName, tableName) -> datasource ID routed at the current version
+        self.resolved = dict()
+        self.backend = backend
+        if backend is not None:
+            datasources, rules, self.version = backend.load()
+            self.put(datasources, rules)
+
+    @property
+    def etag(self):
+        return f'"{self.version}"'
+
+    def changed(self):
+        self.version += 1
+        self.resolved.clear()
+
+    def put(self, datasources, rules):
+        for ds in datasources:
+            if ds.id is None:
+                ds.id = "ds_{id}".format(id=self.idx)
+            m = DS_ID.fullmatch(ds.id)
+            if m:
+                # ids given to later datasources don't clash with this one
+                self.idx = max(self.idx, int(m.group(1)) + 1)
+            self.ds[ds.id] = ds
+            self.dsJson[ds.id] = ds.model_dump()
+        for dbName, tableName, dsID in rules:
+            # a rule added again overwrites the existing one
+            self.routeRules[(dbName, tableName)] = dsID
+            self.index.add(dbName, tableName, dsID)
+
+    def add(self, datasources, rules):
+        """Adds datasources and (dbName, tableName, dsID) rules, a datasource
+        without id gets a new one"""
+        self.put(datasources, rules)
+        self.changed()
+        if self.backend is not None:
+            self.backend.save(datasources, rules, self.version)
 
     # return added datasource with new id
     def add_datasource(self, ds):
-        ds.id = "ds_{id}".format(id=self.idx)
-        self.idx += 1
-        self.ds[ds.id] = ds
+        ds.id = None
+        self.add([ds], [])
         return ds
 
     def add_route_rule(self, dbName, tableName, dsID):
-        if dbName == "*" and tableName == "*":
-            # overwrite default datasource if exists
-            self.defaultDataSourceID = dsID
-        elif tableName == "*":
-            self.databaseRouteRules[dbName] = dsID
-        else:
-            self.routeRules["{}.{}".format(dbName, tableName)] = dsID
+        self.add([], [(dbName, tableName, dsID)])
 
     def route(self, dbName, tableName):
-        if f"{dbName}.{tableName}" in self.routeRules.keys():
-            return self.routeRules[f"{dbName}.{tableName}"]
-        elif dbName in self.databaseRouteRules.keys():
-            return self.databaseRouteRules[dbName]
-        elif self.defaultDataSourceID != "":
-            return self.defaultDataSourceID
-        return None
+        key = (dbName, tableName)
+        try:
+            return self.resolved[key]
+        except KeyError:
+            pass
+        if len(self.resolved) >= MAX_RESOLVED:
+            self.resolved.clear()
+        dsID = self.resolved[key] = self.index.route(dbName, tableName)
+        return dsID
+
+    def route_tables(self, tables, datasources):
+        """datasource ids of tables, each given as {"db": ..., "table": ...},
+        adding the datasources they use to datasources. Returns the status
+        and the ids, which are None on errors."""
+        if not isinstance(tables, list):
+            return TABLES_NOT_LIST, None
+        if len(tables) == 0:
+            return EMPTY_TABLES, None
+        dsList = list()
+        for i, tbl in enumerate(tables):
+            try:
+                dbName, tableName = tbl["db"], tbl["table"]
+            except (KeyError, TypeError):
+                dbName = tableName = None
+            if not isinstance(dbName, str) or not isinstance(tableName, str):
+                return (
+                    bad_request(
+                        f"tables[{i}] is not a table ref like "
+                        '{"db": "...", "table": "..."}'
+                    ),
+                    None,
+                )
+            dsID = self.route(dbName, tableName)
+            if dsID is None:
+                return RULE_NOT_FOUND, None
+            if dsID not in datasources:
+                if dsID not in self.dsJson:
+                    return DATASOURCE_NOT_FOUND, None
+                datasources[dsID] = self.dsJson[dsID]
+            dsList.append(dsID)
+        return OK, dsList
+
+
+DS_ID = re.compile(r"ds_(\d+)")
+# routed tables kept per rule set version
+MAX_RESOLVED = 1 << 20
+OK = Status().model_dump()
+
+
+def bad_request(message):
+    return Status(code=100, message=f"bad request: {message}").model_dump()
+
+
+NOT_JSON_OBJECT = bad_request("body is not a json object")
+TABLES_NOT_LIST = bad_request("tables is missing or not a list")
+EMPTY_TABLES = bad_request("empty tables in request")
+RULE_NOT_FOUND = Status(code=140, message="route rule not found").model_dump()
+DATASOURCE_NOT_FOUND = Status(code=141, message="datasource not found").model_dump()
+
+
+def parse_conf(content, isCsv):
+    """datasources and (dbName, tableName, dsID) rules of a RouteConf json, or
+    of a csv with the columns db, table and datasource_id"""
+    if isCsv:
+        reader = csv.DictReader(io.StringIO(content))
+        return [], [(r["db"], r["table"], r["datasource_id"]) for r in reader]
+    conf = RouteConf.model_validate_json(content)
+    return conf.datasources, [(r.db, r.table, r.datasource_id) for r in conf.rules]
+
+
+def read_conf(path):
+    with open(path, newline="") as f:
+        return parse_conf(f.read(), path.endswith(".csv"))
+
+
+def open_store():
+    """MOCK_ROUTER_DB keeps the rules in a sqlite file, MOCK_ROUTER_SNAPSHOT
+    lists json or csv files, separated by commas, added at startup"""
+    dbPath = os.environ.get("MOCK_ROUTER_DB")
+    s = MyStore(SqliteBackend(dbPath) if dbPath else None)
+    snapshot = os.environ.get("MOCK_ROUTER_SNAPSHOT")
+    if snapshot:
+        datasources, rules = [], []
+        for path in snapshot.split(","):
+            fileDatasources, fileRules = read_conf(path)
+            datasources += fileDatasources
+            rules += fileRules
+        s.add(datasources, rules)
+    return s
+
+
+class LatencyHistogram:
+    """Request latencies per path in the prometheus histogram format"""
+
+    # seconds
+    BUCKETS = [
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+    ]
 
+    def __init__(self):
+        # path -> [count per bucket, the last one is +Inf], sum of seconds
+        self.paths = dict()
+
+    def observe(self, path, seconds):
+        h = self.paths.get(path)
+        if h is None:
+            h = self.paths[path] = [[0] * (len(self.BUCKETS) + 1), 0.0]
+        h[0][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        h[1] += seconds
+
+    def render(self, name):
+        lines = [
+            f"# HELP {name} Time from receiving a request to sending its response.",
+            f"# TYPE {name} histogram",
+        ]
+        for path, (counts, total) in sorted(self.paths.items()):
+            count = 0
+            for le, n in zip(self.BUCKETS + ["+Inf"], counts):
+                count += n
+                lines.append(f'{name}_bucket{{path="{path}",le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{path="{path}"}} {total}')
+            lines.append(f'{name}_count{{path="{path}"}} {count}')
+        return lines
+
+
+class LatencyMiddleware:
+    """ASGI middleware timing every http request, requests to unknown paths
+    share one label to keep the number of series bounded"""
+
+    def __init__(self, app, histogram, paths):
+        self.app = app
+        self.histogram = histogram
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            path = scope["path"]
+            self.histogram.observe(
+                path if path in self.paths else "other",
+                time.perf_counter() - start,
+            )
 
-store = MyStore()
-app = FastAPI()
 
+# opened when the server starts, so that the import tool below doesn't touch
+# the MOCK_ROUTER_DB and MOCK_ROUTER_SNAPSHOT of its environment
+store = None
 
-@app.post("/datasource/route")
-def route(req: RouteRequest) -> RouteResponse:
-    if req.tables is None or len(req.tables) == 0:
-        return RouteResponse(
-            status=Status(code=100, message="bad request: empty tables in request")
-        )
 
-    dsList = list()
-    for tbl in req.tables:
-        dsID = store.route(tbl.db, tbl.table)
-        if dsID is None:
-            return RouteResponse(
-                status=Status(code=140, message="route rule not found")
-            )
-        else:
-            dsList.append(dsID)
+@asynccontextmanager
+async def lifespan(app):
+    global store
+    store = open_store()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+latency = LatencyHistogram()
 
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+# the request is parsed by hand and the response serialized from cached
+# dicts, which spares a pydantic model per table on this hot path
+@app.post("/datasource/route", response_model=RouteResponse)
+async def route(request: Request):
+    req = await read_json(request)
+    if not isinstance(req, dict):
+        return JSONResponse({"status": NOT_JSON_OBJECT}, headers={"ETag": store.etag})
+    datasources = dict()
+    status, dsList = store.route_tables(req.get("tables"), datasources)
+    content = {"status": status}
+    if dsList is not None:
+        content["datasource_ids"] = dsList
+        content["datasources"] = datasources
+    return JSONResponse(content, headers={"ETag": store.etag})
+
+
+@app.post("/datasource/route_batch", response_model=BatchRouteResponse)
+async def route_batch(request: Request):
+    req = await read_json(request)
+    if not isinstance(req, dict):
+        status = NOT_JSON_OBJECT
+    elif not isinstance(req.get("requests"), list):
+        status = bad_request("requests is missing or not a list")
+    elif len(req["requests"]) == 0:
+        status = bad_request("empty requests in batch")
+    else:
+        status = None
+    if status is not None:
+        content = {"status": status, "version": store.version}
+        return JSONResponse(content, headers={"ETag": store.etag})
+    requests = req["requests"]
     datasources = dict()
-    for dsID in dsList:
-        if dsID in store.ds.keys():
-            datasources[dsID] = store.ds[dsID]
+    responses = list()
+    for i, r in enumerate(requests):
+        if isinstance(r, dict):
+            status, dsList = store.route_tables(r.get("tables"), datasources)
         else:
-            return RouteResponse(
-                status=Status(code=141, message="datasource not found")
-            )
-
-    return RouteResponse(
-        status=Status(code=0, message="ok"),
-        datasource_ids=dsList,
-        datasources=datasources,
-    )
+            status, dsList = bad_request(f"requests[{i}] is not a json object"), None
+        responses.append({"status": status, "datasource_ids": dsList or []})
+    content = {
+        "status": OK,
+        "version": store.version,
+        "responses": responses,
+        "datasources": datasources,
+    }
+    return JSONResponse(content, headers={"ETag": store.etag})
+
+
+# route responses carry the rule set version as ETag but are not conditional,
+# it only validates this resource: a client polls it with If-None-Match to
+# learn whether the routes it got are still current
+@app.get("/datasource/version")
+async def version(request: Request):
+    tags = request.headers.get("if-none-match")
+    if tags is not None and (
+        tags.strip() == "*" or store.etag in (t.strip() for t in tags.split(","))
+    ):
+        return Response(status_code=304, headers={"ETag": store.etag})
+    return JSONResponse({"version": store.version}, headers={"ETag": store.etag})
 
 
 @app.post("/datasource/register")
-def register(ds: DataSource):
+async def register(ds: DataSource):
     return store.add_datasource(ds)
 
 
 @app.post("/datasource/route_rule")
-def add_route_rule(rule: RouteRule):
+async def add_route_rule(rule: RouteRule):
     return store.add_route_rule(rule.db, rule.table, rule.datasource_id)
 
 
+@app.post("/datasource/import")
+async def import_conf(request: Request):
+    """adds a RouteConf json or a csv of rules (Content-Type: text/csv) at once"""
+    content = (await request.body()).decode()
+    isCsv = request.headers.get("content-type", "").startswith("text/csv")
+    try:
+        datasources, rules = parse_conf(content, isCsv)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"bad rule file: {e}")
+    store.add(datasources, rules)
+    return {
+        "datasources": len(datasources),
+        "rules": len(rules),
+        "version": store.version,
+    }
+
+
+@app.get("/datasource/export")
+async def export_conf():
+    """all datasources and rules as RouteConf, which can be imported again"""
+    return {
+        "datasources": list(store.dsJson.values()),
+        "rules": [
+            {"db": db, "table": table, "datasource_id": dsID}
+            for (db, table), dsID in store.routeRules.items()
+        ],
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    lines = latency.render("mock_router_request_duration_seconds")
+    for name, kind, helpText, value in [
+        (
+            "mock_router_rule_set_version",
+            "gauge",
+            "Version of the rule set.",
+            store.version,
+        ),
+        (
+            "mock_router_route_rules",
+            "gauge",
+            "Route rules added.",
+            len(store.routeRules),
+        ),
+        ("mock_router_datasources", "gauge", "Datasources registered.", len(store.ds)),
+        (
+            "mock_router_resolved_tables",
+            "gauge",
+            "Tables routed at this rule set version.",
+            len(store.resolved),
+        ),
+    ]:
+        lines += [
+            f"# HELP {name} {helpText}",
+            f"# TYPE {name} {kind}",
+            f"{name} {value}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
 indexTemplateContent = """
 <html>
 <head>
@@ -170,24 +750,12 @@ indexTemplateContent = """
       <td> rule </td>
       <td> datasource id </td>
     </tr>
-    {% for key, value in tableRoutingRules.items() %}
-     <tr>
-        <td> {{ key }} </td>
-        <td> {{ value }} </td>
-      </tr>
-    {% endfor %}
-    {% for key, value in dbRoutingRules.items() %}
+    {% for (db, table), value in routingRules.items() %}
      <tr>
-        <td> {{ key }}.* </td>
+        <td> {{ db }}.{{ table }} </td>
         <td> {{ value }} </td>
       </tr>
     {% endfor %}
-    {% if defaultRoutingRule != "" %}
-      <tr>
-        <td> *.* </td>
-        <td> {{ defaultRoutingRule }} </td>
-      </tr>
-    {% endif %}
     </table>
   </div>
 </body>
@@ -198,10 +766,55 @@ indexTemplate = Template(indexTemplateContent)
 
 
 @app.get("/", response_class=HTMLResponse)
-def index():
+async def index():
     return indexTemplate.render(
         datasources=store.ds,
-        tableRoutingRules=store.routeRules,
-        dbRoutingRules=store.databaseRouteRules,
-        defaultRoutingRule=store.defaultDataSourceID,
+        routingRules=store.routeRules,
+    )
+
+
+app.add_middleware(
+    LatencyMiddleware,
+    histogram=latency,
+    paths={route.path for route in app.routes},
+)
+
+
+def import_files(args):
+    if args.db:
+        s = MyStore(SqliteBackend(args.db))
+        for path in args.files:
+            datasources, rules = read_conf(path)
+            s.add(datasources, rules)
+            print(f"{path}: {len(datasources)} datasources, {len(rules)} rules")
+        return
+    for path in args.files:
+        with open(path, "rb") as f:
+            req = urllib.request.Request(
+                args.url.rstrip("/") + "/datasource/import",
+                data=f.read(),
+                headers={
+                    "Content-Type": (
+                        "text/csv" if path.endswith(".csv") else "application/json"
+                    )
+                },
+            )
+        with urllib.request.urlopen(req) as res:
+            print(f"{path}: {res.read().decode()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mock router tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    importParser = sub.add_parser(
+        "import", help="add json or csv rule files to a running router or its db"
+    )
+    importParser.add_argument("files", type=str, nargs="+")
+    importParser.add_argument(
+        "--url", type=str, help="router to post to", default="http://127.0.0.1:8000"
+    )
+    importParser.add_argument(
+        "--db", type=str, help="write into this sqlite file instead of posting"
     )
+    args = parser.parse_args()
+    import_files(args)
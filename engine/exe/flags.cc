@@ -104,6 +104,11 @@ DEFINE_string(
     embed_router_conf, "",
     R"text(configuration for embed router in json format. For example: --embed_router_conf={"datasources":[{"id":"ds001","name":"mysql db","kind":"MYSQL","connection_str":"host=127.0.0.1 db=test user=root password='qwerty'"}],"rules":[{"db":"*","table":"*","datasource_id":"ds001"}]} )text");
 DEFINE_string(http_router_endpoint, "", "http datasource router endpoint url");
+DEFINE_int32(http_router_cache_capacity, 0,
+             "max number of tables whose routes the http router caches, 0 "
+             "disables the cache");
+DEFINE_int32(http_router_cache_ttl_s, 60,
+             "seconds a route cached by the http router is used for");
 DEFINE_string(kuscia_datamesh_endpoint, "datamesh:8071",
               "kuscia datamesh grpc endpoint");
 DEFINE_string(kuscia_datamesh_client_key_path, "",
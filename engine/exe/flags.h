@@ -74,6 +74,8 @@ DECLARE_string(spu_allowed_protocols);
 DECLARE_string(datasource_router);
 DECLARE_string(embed_router_conf);
 DECLARE_string(http_router_endpoint);
+DECLARE_int32(http_router_cache_capacity);
+DECLARE_int32(http_router_cache_ttl_s);
 DECLARE_string(kuscia_datamesh_endpoint);
 DECLARE_string(kuscia_datamesh_client_key_path);
 DECLARE_string(kuscia_datamesh_client_cert_path);
@@ -14,6 +14,7 @@
 
 #include <signal.h>
 
+#include <algorithm>
 #include <memory>
 
 #include "absl/debugging/failure_signal_handler.h"
@@ -139,6 +140,9 @@ std::unique_ptr<scql::engine::Router> BuildRouter() {
   } else if (FLAGS_datasource_router == "http") {
     scql::engine::HttpRouterOptions options;
     options.endpoint = FLAGS_http_router_endpoint;
+    options.cache_capacity = std::max(FLAGS_http_router_cache_capacity, 0);
+    options.cache_ttl_ms =
+        static_cast<int64_t>(FLAGS_http_router_cache_ttl_s) * 1000;
     return std::make_unique<scql::engine::HttpRouter>(options);
   } else if (FLAGS_datasource_router == "kusciadatamesh") {
     auto ssl_opts =
@@ -31,6 +31,17 @@ PrometheusMonitor::Stats::Stats(prometheus::Registry& registry)
               .Name("engine_concurrent_session_total")
               .Help("The concurrent session nums running in engine")
               .Register(registry)
+              .Add({})),
+      router_cache_hit(::prometheus::BuildCounter()
+                           .Name("engine_router_cache_hit_total")
+                           .Help("Tables routed from the http router cache")
+                           .Register(registry)
+                           .Add({})),
+      router_cache_miss(
+          ::prometheus::BuildCounter()
+              .Name("engine_router_cache_miss_total")
+              .Help("Tables the http router cache had to ask the router for")
+              .Register(registry)
               .Add({})) {}
 
 }  // namespace scql::engine::util
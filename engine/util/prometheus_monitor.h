@@ -16,6 +16,7 @@
 
 #include <memory>
 
+#include "prometheus/counter.h"
 #include "prometheus/gauge.h"
 #include "prometheus/registry.h"
 
@@ -36,12 +37,16 @@ class PrometheusMonitor {
   // Metrics funcs
   void IncSessionNumberTotal() { stats_->session_number_total.Increment(); }
   void DecSessionNumberTotal() { stats_->session_number_total.Decrement(); }
+  void IncRouterCacheHit(double n) { stats_->router_cache_hit.Increment(n); }
+  void IncRouterCacheMiss(double n) { stats_->router_cache_miss.Increment(n); }
 
  private:
   PrometheusMonitor();
 
   struct Stats {
     prometheus::Gauge& session_number_total;
+    prometheus::Counter& router_cache_hit;
+    prometheus::Counter& router_cache_miss;
 
     explicit Stats(prometheus::Registry& registry);
   };
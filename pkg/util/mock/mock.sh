@@ -27,10 +27,17 @@ WORK_DIR=$(
 )
 
 cd ${SCRIPT_DIR}
-python mock_from_testdata.py -dd=testdata -s="testdata/db.json"
+# extra arguments are passed through, e.g. `bash mock.sh -r=1000000 -f=bulk`
+python mock_from_testdata.py -dd=testdata -s="testdata/db.json" "$@"
 
+# drop bulk payloads left by a previous run
+rm -f ${WORK_DIR}/.ci/test-data/mysql/*.tsv ${WORK_DIR}/.ci/test-data/postgres/*.tsv
 mv testdata/mysql_*_init.sql ${WORK_DIR}/.ci/test-data/mysql/
 mv testdata/postgres_*_init.sql ${WORK_DIR}/.ci/test-data/postgres
 mv testdata/*.csv ${WORK_DIR}/.ci/test-data/csv
+if ls testdata/*.tsv >/dev/null 2>&1; then
+  mv testdata/mysql_*.tsv ${WORK_DIR}/.ci/test-data/mysql/
+  mv testdata/postgres_*.tsv ${WORK_DIR}/.ci/test-data/postgres/
+fi
 
 find . -type f -name '*.py' -print0 | xargs -0 black
\ No newline at end of file
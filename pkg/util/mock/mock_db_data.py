@@ -12,11 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import csv
+import os
 import random
-import datetime
 
 DEFAULT_MAX_STR_LEN = 10
 POOL_SIZE = 50
+INSERT_BATCH_SIZE = 50
+BULK_BATCH_SIZE = 1000000
+GENERATE_BATCH_SIZE = 4096
 DB_TYPES = ["postgres", "mysql"]
 DROP_TABLE = """DROP TABLE IF EXISTS {};"""
 CREATE_TABLE_STR = """
@@ -51,6 +55,21 @@ REPLACE_MAP = {
 
 INSERT_STR = """
 INSERT INTO {} VALUES {};"""
+QUOTED_TYPES = {"string", "datetime", "timestamp"}
+# both LOAD DATA and COPY default to tab separated text with backslash escapes
+LOAD_DATA_STR = {
+    "postgres": """
+COPY {0} FROM '{1}';""",
+    "mysql": """
+LOAD DATA INFILE '{1}' INTO TABLE {0} CHARACTER SET utf8mb4;""",
+}
+# where the payload directory is mounted inside the database container,
+# mysql only reads server side files under secure_file_priv
+BULK_DATA_DIR = {
+    "postgres": "/var/lib/postgresql/test-data",
+    "mysql": "/var/lib/mysql-files",
+}
+TSV_ESCAPES = [("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")]
 SQL_FILE_LIST = {
     "alice": "alice_init.sql",
     "bob": "bob_init.sql",
@@ -75,37 +94,49 @@ def create_str_pool(pool_size, min_num=97, max_num=115):
         chr_list = []
         for i in range(str_len):
             chr_list.append(chr(random.randint(min_num, max_num)))
-        pool.append("'" + "".join(chr_list) + "'")
+        pool.append("".join(chr_list))
     return pool
 
 
-def create_random_datatime():
-    year = random.randint(1971, 2030)
-    month = random.randint(1, 12)
-    day = random.randint(1, 28)
+def create_datetime_pools():
+    dates = [
+        f"{year}-{month:02d}-{day:02d}"
+        for year in range(1971, 2031)
+        for month in range(1, 13)
+        for day in range(1, 29)
+    ]
     # avoid DST problem
-    hour = random.randint(0, 23)
-    while hour == 2:
-        hour = random.randint(0, 23)
+    times = [
+        f"{hour:02d}:{minute:02d}:{second:02d}"
+        for hour in range(24)
+        if hour != 2
+        for minute in range(60)
+        for second in range(60)
+    ]
+    return dates, times
+
 
-    minute = random.randint(0, 59)
-    second = random.randint(0, 59)
-    ds = datetime.datetime(year, month, day, hour, minute, second)
-    str_ds = "'" + ds.strftime("%Y-%m-%d %H:%M:%S") + "'"
-    return str_ds
+INT_POOL = range(-100, 101)
+FLOAT_POOL = [i / 100 for i in range(-10000, 10001)]
+DATE_POOL, TIME_POOL = create_datetime_pools()
 
 
-def create_data(data_type, str_pool):
+def create_column_data(data_type, str_pool, rows):
     if data_type == "int":
-        return random.randint(-100, 100)
+        return random.choices(INT_POOL, k=rows)
     elif data_type == "float":
-        return random.randint(-10000, 10000) / 100
+        return random.choices(FLOAT_POOL, k=rows)
     elif data_type == "string":
-        return str_pool[random.randint(0, POOL_SIZE - 1)]
+        return random.choices(str_pool, k=rows)
     elif data_type == "datetime" or data_type == "timestamp":
-        return create_random_datatime()
+        return [
+            date + " " + time
+            for date, time in zip(
+                random.choices(DATE_POOL, k=rows), random.choices(TIME_POOL, k=rows)
+            )
+        ]
     else:
-        return 0
+        return [0] * rows
 
 
 def fill_column_name(columns):
@@ -127,21 +158,177 @@ def create_table(table_name, columns):
     return str
 
 
-def create_insert(table_name, columns, str_pool, rows):
-    batch_size = 50
+def create_table_for_db_type(table_name, columns, db_type):
+    table_str = create_table(table_name, columns)
+    for key, value in REPLACE_MAP[db_type].items():
+        table_str = table_str.replace(key, value)
+    return table_str
+
+
+def create_batches(columns, str_pool, rows, batch_size=GENERATE_BATCH_SIZE):
+    # data is generated column by column in fixed size batches, every sink
+    # sees the same values without the whole table ever being held in memory
+    _, data_types = fill_column_name(columns)
+    while rows > 0:
+        batch_rows = min(batch_size, rows)
+        yield [create_column_data(dt, str_pool, batch_rows) for dt in data_types]
+        rows -= batch_rows
+
+
+def quote_sql_str(value, db_type):
+    value = value.replace("'", "''")
+    if db_type == "mysql":
+        value = value.replace("\\", "\\\\")
+    return "'" + value + "'"
+
+
+class SqlSink:
+    """Writes tables as DDL plus batched multi-value INSERT statements."""
+
+    def __init__(self, f, db_type, batch_size=INSERT_BATCH_SIZE):
+        self.f = f
+        self.db_type = db_type
+        self.batch_size = batch_size
+        self.table_name = None
+        self.data_types = []
+        self.pending = []
+
+    def begin_table(self, table_name, columns):
+        self.f.write(create_table_for_db_type(table_name, columns, self.db_type))
+        self.f.write("START TRANSACTION;\n")
+        self.table_name = table_name
+        _, self.data_types = fill_column_name(columns)
+
+    def write_batch(self, batch):
+        rendered = [
+            self._render(dt, values) for dt, values in zip(self.data_types, batch)
+        ]
+        self.pending.extend("(" + ", ".join(row) + ")" for row in zip(*rendered))
+        start = 0
+        while len(self.pending) - start >= self.batch_size:
+            self._write_insert(self.pending[start : start + self.batch_size])
+            start += self.batch_size
+        del self.pending[:start]
+
+    def end_table(self):
+        if self.pending:
+            self._write_insert(self.pending)
+            self.pending = []
+        self.f.write("\nCOMMIT;\n\n\n\n")
+
+    def _write_insert(self, rows):
+        self.f.write(INSERT_STR.format(self.table_name, ", ".join(rows)))
+
+    def _render(self, data_type, values):
+        if data_type in QUOTED_TYPES:
+            joined = "".join(values)
+            if "'" in joined or "\\" in joined:
+                return [quote_sql_str(value, self.db_type) for value in values]
+            return ["'" + value + "'" for value in values]
+        return list(map(str, values))
+
+
+def escape_tsv_str(value):
+    for old, new in TSV_ESCAPES:
+        value = value.replace(old, new)
+    return value
 
-    insert_str = "START TRANSACTION;\n"
-    for _ in range((rows + batch_size - 1) // batch_size):
-        _, data_types = fill_column_name(columns)
-        batch_insert = []
-        for _ in range(min(batch_size, rows)):
-            column_datas = []
-            for dt in data_types:
-                column_datas.append(str(create_data(dt, str_pool)))
-            batch_insert.append("({})".format(", ".join(column_datas)))
 
-        insert_str += INSERT_STR.format(table_name, ", ".join(batch_insert))
-        rows -= batch_size
-    insert_str += "\nCOMMIT;"
+class BulkSink:
+    """Writes tables as DDL plus LOAD DATA / COPY statements, the rows go to
+    {db_type}_{db_name}_{table_name}_{i}.tsv payloads of batch_size rows."""
+
+    def __init__(self, f, dest_dir, db_type, db_name, batch_size=BULK_BATCH_SIZE):
+        self.f = f
+        self.dest_dir = dest_dir
+        self.db_type = db_type
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.table_name = None
+        self.data_types = []
+        self.payload = None
+        self.payload_num = 0
+        self.payload_rows = 0
+
+    def begin_table(self, table_name, columns):
+        self.f.write(create_table_for_db_type(table_name, columns, self.db_type))
+        self.table_name = table_name
+        _, self.data_types = fill_column_name(columns)
+        self.payload_num = 0
+
+    def write_batch(self, batch):
+        rendered = [
+            self._render(dt, values) for dt, values in zip(self.data_types, batch)
+        ]
+        lines = ["\t".join(row) + "\n" for row in zip(*rendered)]
+        start = 0
+        while start < len(lines):
+            if self.payload is None:
+                self._open_payload()
+            end = min(len(lines), start + self.batch_size - self.payload_rows)
+            self.payload.writelines(lines[start:end])
+            self.payload_rows += end - start
+            start = end
+            if self.payload_rows >= self.batch_size:
+                self._close_payload()
+
+    def end_table(self):
+        self._close_payload()
+        self.f.write("\n\n\n\n")
+
+    def _open_payload(self):
+        file_name = (
+            f"{self.db_type}_{self.db_name}_{self.table_name}_"
+            f"{self.payload_num:05d}.tsv"
+        )
+        self.payload = open(os.path.join(self.dest_dir, file_name), "w", newline="\n")
+        self.payload_num += 1
+        self.payload_rows = 0
+        self.f.write(
+            LOAD_DATA_STR[self.db_type].format(
+                self.table_name, f"{BULK_DATA_DIR[self.db_type]}/{file_name}"
+            )
+        )
+
+    def _close_payload(self):
+        if self.payload is not None:
+            self.payload.close()
+            self.payload = None
+
+    def _render(self, data_type, values):
+        if data_type in QUOTED_TYPES:
+            joined = "".join(values)
+            if any(old in joined for old, _ in TSV_ESCAPES):
+                return [escape_tsv_str(value) for value in values]
+            return values
+        return list(map(str, values))
+
+
+class CsvSink:
+    """Writes every table to its own {db_name}_{table_name}.csv file."""
+
+    def __init__(self, dest_dir, db_name):
+        self.dest_dir = dest_dir
+        self.db_name = db_name
+        self.f = None
+        self.writer = None
+
+    def begin_table(self, table_name, columns):
+        self.f = open(
+            os.path.join(self.dest_dir, f"{self.db_name}_{table_name}.csv"),
+            "w",
+            newline="",
+        )
+        self.f.write(", ".join(column["column_name"] for column in columns) + "\n")
+        # numbers stay bare, strings and datetimes are double quoted
+        self.writer = csv.writer(
+            self.f, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n"
+        )
+
+    def write_batch(self, batch):
+        self.writer.writerows(zip(*batch))
 
-    return insert_str
+    def end_table(self):
+        self.f.close()
+        self.f = None
+        self.writer = None
@@ -12,72 +12,69 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import argparse
+import contextlib
 import json
 import os
-import re
-import argparse
 from mock_schema import CUR_PATH
 from mock_db_data import *
 
 BACKEND_TYPE = {"alice": "MYSQL", "bob": "CSVDB", "carol": "POSTGRESQL"}
+INSERT_FORMAT = "insert"
+BULK_FORMAT = "bulk"
 
 
 # create mock xxx.sql used in mysql initiating
-def create_mock_data(source: dict, rows: int, dest_dir: str):
+def create_mock_data(
+    source: dict,
+    rows: int,
+    dest_dir: str,
+    batch_size: int = None,
+    sql_format: str = INSERT_FORMAT,
+):
     db_infos = get_db_from_json(source)
     str_pool = create_str_pool(POOL_SIZE)
+    dest_path = os.path.join(CUR_PATH, dest_dir)
     for db_name in db_infos:
         schema_info = db_infos.get(db_name)
         tables = schema_info.get("table_info")
-        contents = [""] * len(DB_TYPES)
-        for table_name in tables:
-            table = tables.get(table_name)
-            columns = table.get("columns")
-            table_str = create_table(table_name, columns)
-            insert_str = create_insert(table_name, columns, str_pool, rows)
+        with contextlib.ExitStack() as stack:
+            sinks = []
             for i, db_type in enumerate(DB_TYPES):
-                contents[i] += table_str
-                contents[i] += insert_str
-                contents[i] += "\n\n\n\n"
-            if IS_DB_USE_FILE["csv"][db_name]:
-                column_strs = []
-                for column in columns:
-                    column_strs.append(column["column_name"])
-                csv_contents = ", ".join(column_strs)
-                csv_contents += (
-                    insert_str.replace("START TRANSACTION;\n", "")
-                    .replace("\nCOMMIT;", "")
-                    .replace("INSERT INTO " + table_name + " VALUES ", "")
-                    .replace(";", "")
-                    .replace(", ", ",")
-                    .replace("'", '"')
-                    .replace("(", "")
-                    .replace("),", "\n")
-                    .replace(")", "")
+                if not IS_DB_USE_FILE[db_type][db_name]:
+                    continue
+                f = stack.enter_context(
+                    open(
+                        os.path.join(dest_path, f"{db_type}_{SQL_FILE_LIST[db_name]}"),
+                        "w",
+                    )
                 )
-                with open(
-                    os.path.join(CUR_PATH, dest_dir, f"{db_name}_{table_name}.csv"),
-                    "w",
-                ) as f:
-                    f.write(csv_contents)
-        for i, db_type in enumerate(DB_TYPES):
-            # replace float type in content
-            # postgres use numeric, mysql use float
-            contents[i] = (
-                contents[i]
-                .replace("FLOAT_TYPE", REPLACE_MAP[db_type]["FLOAT_TYPE"])
-                .replace("DATETIME_TYPE", REPLACE_MAP[db_type]["DATETIME_TYPE"])
-            )
-            if IS_DB_USE_FILE[db_type][db_name]:
-                with open(
-                    os.path.join(
-                        CUR_PATH, dest_dir, f"{db_type}_{SQL_FILE_LIST[db_name]}"
-                    ),
-                    "w",
-                ) as f:
-                    f.write(CREATE_DB_STR[i].format(db_name))
-                    f.write(contents[i])
-            contents[i] = ""
+                f.write(CREATE_DB_STR[i].format(db_name))
+                if sql_format == BULK_FORMAT:
+                    sinks.append(
+                        BulkSink(
+                            f,
+                            dest_path,
+                            db_type,
+                            db_name,
+                            batch_size or BULK_BATCH_SIZE,
+                        )
+                    )
+                else:
+                    sinks.append(SqlSink(f, db_type, batch_size or INSERT_BATCH_SIZE))
+            if IS_DB_USE_FILE["csv"][db_name]:
+                sinks.append(CsvSink(dest_path, db_name))
+            # every batch is generated once and handed to all sinks, so mysql,
+            # postgres and csv always hold identical data
+            for table_name in tables:
+                columns = tables.get(table_name).get("columns")
+                for sink in sinks:
+                    sink.begin_table(table_name, columns)
+                for batch in create_batches(columns, str_pool, rows):
+                    for sink in sinks:
+                        sink.write_batch(batch)
+                for sink in sinks:
+                    sink.end_table()
 
 
 def get_db_from_json(source_file: str):
@@ -120,8 +117,23 @@ if __name__ == "__main__":
         default="testdata/db.json",
     )
     parser.add_argument("--rows", "-r", type=int, help="rows of table", default=600)
+    parser.add_argument(
+        "--format",
+        "-f",
+        type=str,
+        choices=[INSERT_FORMAT, BULK_FORMAT],
+        help="insert: multi-value INSERT statements, bulk: tsv payloads loaded by LOAD DATA INFILE / COPY",
+        default=INSERT_FORMAT,
+    )
+    parser.add_argument(
+        "--batch_size",
+        "-b",
+        type=int,
+        help=f"rows per INSERT statement (default {INSERT_BATCH_SIZE}) or per bulk tsv payload (default {BULK_BATCH_SIZE})",
+        default=None,
+    )
     args = vars(parser.parse_args())
     source = args["source"]
     rows = args["rows"]
     data_dest = args["dest_data"]
-    create_mock_data(source, rows, data_dest)
+    create_mock_data(source, rows, data_dest, args["batch_size"], args["format"])
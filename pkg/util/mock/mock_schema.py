@@ -13,7 +13,10 @@
 # limitations under the License.
 
 
+import argparse
+import itertools
 import json
+import math
 import os
 from pathlib import Path
 from typing import List
@@ -33,61 +36,169 @@ CCL_LEVEL = [
 ]
 CUR_PATH = Path(__file__).parent.resolve()
 DATABASES = ["alice", "bob", "carol"]
+DB_TYPES = {"alice": "MYSQL", "bob": "CSVDB", "carol": "POSTGRESQL"}
+DEFAULT_DEST_DIR = "testdata"
 
 
-def create_table_for_db(db_name: str):
-    tables = dict()
-    for i in range(TABLE_COPY_NUM):
-        name, table_info = create_table(i, db_name)
-        tables[name] = table_info
-    return tables
+def party_names(party_num: int):
+    # extra parties beyond alice, bob and carol are named party_3, party_4...
+    return DATABASES[:party_num] + [
+        f"party_{i}" for i in range(len(DATABASES), party_num)
+    ]
 
 
-def create_table(pos, db_name: str):
-    table_name_prefix = "tbl"
-    table = dict()
-    table_name = f"{table_name_prefix}_{pos}"
-    table["columns"] = list()
-    table["db_name"] = db_name
-    for i in range(COLUMN_COPY_NUM):
-        for dtype in DATA_TYPE:
-            for level in CCL_LEVEL:
-                table["columns"].append(create_column(dtype, [level], i))
-    return table_name, table
+def ccl_combos(parties: List[str], self_pos: int, levels: List[str], combo_num: int):
+    # every combo holds one level per party, the owner always sees plain.
+    # combos are picked with a stride coprime to the number of candidates so
+    # that even a handful of them varies the level seen by every party
+    total = len(levels) ** (len(parties) - 1)
+    combo_num = min(combo_num, total)
+    stride = max(total // max(combo_num, 1), 1)
+    while math.gcd(stride, total) != 1:
+        stride += 1
+    for i in range(combo_num):
+        index = i * stride % total
+        combo = []
+        for pos in range(len(parties)):
+            if pos == self_pos:
+                combo.append("plain")
+            else:
+                combo.append(levels[index % len(levels)])
+                index //= len(levels)
+        yield combo
+
+
+def create_columns(
+    db_name: str,
+    parties: List[str],
+    column_copy_num: int = COLUMN_COPY_NUM,
+    data_types: List[str] = DATA_TYPE,
+    levels: List[str] = CCL_LEVEL,
+    combo_num: int = 0,
+):
+    self_pos = parties.index(db_name)
+    for i in range(column_copy_num):
+        for dtype in data_types:
+            for level in levels:
+                yield create_column(dtype, [level], i)
+            for combo in ccl_combos(parties, self_pos, levels, combo_num):
+                yield create_column(dtype, combo, i)
 
 
 def create_column(data_type: str, levels: List[str], pos: int):
     column = dict()
-    level_strs = "-".join(levels)
+    level_strs = "_".join(levels)
     column["column_name"] = f"{level_strs}_{data_type}_{pos}"
     column["dtype"] = data_type
     column["ccl"] = levels
     return column
 
 
-def write_table(file_name):
-    path = os.path.join(CUR_PATH, f"testdata")
-    if not os.path.exists(path):
-        os.system(f"mkdir {path}")
-    file = os.path.join(path, f"{file_name}.json")
-    with open(file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, separators=(",", ": "), ensure_ascii=False)
-    print("write success")
+def indent_json(obj, level: int):
+    return json.dumps(obj, indent=2, ensure_ascii=False).replace(
+        "\n", "\n" + "  " * level
+    )
+
+
+def write_tables(f, db_name: str, table_num: int, columns_factory):
+    # tables are written column by column in the layout of json.dump(indent=2),
+    # so the size of the schema never has to fit in memory
+    f.write("{")
+    for i in range(table_num):
+        if i > 0:
+            f.write(",")
+        f.write(f"\n  {json.dumps(f'tbl_{i}')}: {{\n    \"columns\": [")
+        empty = True
+        for column in columns_factory():
+            f.write(("\n" if empty else ",\n") + "      " + indent_json(column, 3))
+            empty = False
+        f.write("]," if empty else "\n    ],")
+        f.write(f'\n    "db_name": {json.dumps(db_name)}\n  }}')
+    f.write("}" if table_num == 0 else "\n}")
+
+
+def write_db_conf(path: str, parties: List[str]):
+    db_info = {
+        party: {"party_code": party, "db_type": DB_TYPES.get(party, "MYSQL")}
+        for party in parties
+    }
+    table_files = [f"generated_table_{party}.json" for party in parties]
+    with open(os.path.join(path, "db.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {"db_info": db_info, "table_files": table_files},
+            f,
+            indent=2,
+            ensure_ascii=False,
+        )
 
 
 if __name__ == "__main__":
-    for db_name in DATABASES:
+    parser = argparse.ArgumentParser(description="parameters")
+    parser.add_argument(
+        "--dest_dir",
+        "-dd",
+        type=str,
+        help="destination dir, a db.json referencing the generated tables is written unless it is testdata",
+        default=DEFAULT_DEST_DIR,
+    )
+    parser.add_argument(
+        "--tables", "-t", type=int, help="tables per party", default=TABLE_COPY_NUM
+    )
+    parser.add_argument(
+        "--columns",
+        "-c",
+        type=int,
+        help="copies of every (data type, ccl) column",
+        default=COLUMN_COPY_NUM,
+    )
+    parser.add_argument(
+        "--parties", "-p", type=int, help="number of parties", default=len(DATABASES)
+    )
+    parser.add_argument(
+        "--ccl_combos",
+        "-k",
+        type=int,
+        help="extra columns per data type whose ccl differs for every party",
+        default=0,
+    )
+    parser.add_argument(
+        "--data_types",
+        type=str,
+        help="comma separated data types",
+        default=",".join(DATA_TYPE),
+    )
+    parser.add_argument(
+        "--ccl_levels",
+        type=str,
+        help="comma separated ccl levels",
+        default=",".join(CCL_LEVEL),
+    )
+    args = parser.parse_args()
+    data_types = args.data_types.split(",")
+    levels = args.ccl_levels.split(",")
+    for value in data_types:
+        if value not in DATA_TYPE:
+            raise Exception(f"unknown data type {value}, expect one of {DATA_TYPE}")
+    for value in levels:
+        if value not in CCL_LEVEL:
+            raise Exception(f"unknown ccl level {value}, expect one of {CCL_LEVEL}")
+    parties = party_names(args.parties)
+    path = os.path.join(CUR_PATH, args.dest_dir)
+    os.makedirs(path, exist_ok=True)
+    for db_name in parties:
         file_name = f"generated_table_{db_name}.json"
-        path = os.path.join(CUR_PATH, f"testdata")
         file = os.path.join(path, file_name)
-        if os.path.exists(file):
-            os.remove(file)
         with open(file, "w", encoding="utf-8") as f:
-            json.dump(
-                create_table_for_db(db_name),
+            write_tables(
                 f,
-                indent=2,
-                separators=(",", ": "),
-                ensure_ascii=False,
+                db_name,
+                args.tables,
+                lambda: create_columns(
+                    db_name, parties, args.columns, data_types, levels, args.ccl_combos
+                ),
             )
         print("write success")
+    if os.path.realpath(path) != os.path.realpath(
+        os.path.join(CUR_PATH, DEFAULT_DEST_DIR)
+    ):
+        write_db_conf(path, parties)